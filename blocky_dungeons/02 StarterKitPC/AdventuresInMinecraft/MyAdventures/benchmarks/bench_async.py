@@ -0,0 +1,67 @@
+'''
+Compare le client bloquant mcpi.minecraft.Minecraft au client asyncio AsyncMinecraft.
+
+Usage : python benchmarks/bench_async.py [adresse] [port] [nombre_de_requetes]
+Un serveur RaspberryJuice doit écouter sur l'adresse donnée (python -m mcpi.fakeserver peut le remplacer).
+'''
+
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mcpi.minecraft import Minecraft
+from mcpi.asyncminecraft import AsyncMinecraft
+import mcpi.block as block
+
+
+def bench_blocking(address, port, count):
+    """requêtes getBlock puis setBlock avec le client bloquant"""
+    mc = Minecraft.create(address, port)
+    start = time.perf_counter()
+    for i in range(count):
+        mc.getBlock(i, 0, 0)
+    queries = time.perf_counter() - start
+    start = time.perf_counter()
+    for i in range(count):
+        mc.setBlock(i, 0, 0, block.STONE)
+    mc.getBlock(0, 0, 0) # attend que le serveur ait tout reçu
+    writes = time.perf_counter() - start
+    mc.conn.close()
+    return queries, writes
+
+
+async def bench_async(address, port, count):
+    """mêmes requêtes avec AsyncMinecraft, toutes en vol en même temps"""
+    mc = await AsyncMinecraft.create(address, port)
+    start = time.perf_counter()
+    await asyncio.gather(*(mc.getBlock(i, 0, 0) for i in range(count)))
+    queries = time.perf_counter() - start
+    start = time.perf_counter()
+    for i in range(count):
+        await mc.setBlock(i, 0, 0, block.STONE)
+    await mc.getBlock(0, 0, 0)
+    writes = time.perf_counter() - start
+    await mc.close()
+    return queries, writes
+
+
+def main():
+    address = sys.argv[1] if len(sys.argv) > 1 else "localhost"
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 4711
+    count = int(sys.argv[3]) if len(sys.argv) > 3 else 2000
+
+    results = {
+        'blocking': bench_blocking(address, port, count),
+        'asyncio': asyncio.run(bench_async(address, port, count)),
+    }
+    print(f'{count} requêtes par mesure')
+    print(f'{"client":<10} {"getBlock (s)":>14} {"setBlock (s)":>14}')
+    for name, (queries, writes) in results.items():
+        print(f'{name:<10} {queries:>14.4f} {writes:>14.4f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+'''
+Chronomètre la génération complète d'un donjon (blocky_dungeon_v1.main) contre le faux serveur mcpi.fakeserver.
+Aucun serveur Bukkit n'est nécessaire.
+
+Usage : python benchmarks/bench_dungeon.py [--size 10] [--latency 0.001] [--seed 1] [--connections 4] [--cache] [--plan-cache DOSSIER]
+'''
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dungeons_settings
+from mcpi.fakeserver import FakeServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=dungeons_settings.DUNGEON_SIZE, help='DUNGEON_SIZE')
+    parser.add_argument('--latency', type=float, default=0.001, help='latence ajoutée à chaque réponse du serveur (s)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--connections', type=int, default=dungeons_settings.CONNECTIONS, help='CONNECTIONS')
+    parser.add_argument('--cache', action='store_true', help='WORLD_CACHE')
+    parser.add_argument('--plan-cache', default=None, help='PLAN_CACHE_DIR (désactivé par défaut : chaque mesure recalcule le donjon)')
+    args = parser.parse_args()
+
+    server = FakeServer(port=0, latency=args.latency).start()
+
+    # les paramètres sont lus à l'import du générateur
+    dungeons_settings.SERVER_PORT = server.port
+    dungeons_settings.SKIP_MONOLOGUE = True
+    dungeons_settings.DUNGEON_SIZE = args.size
+    dungeons_settings.CONNECTIONS = args.connections
+    dungeons_settings.STATS_FILE = None
+    dungeons_settings.RECORD_FILE = None
+    dungeons_settings.WORLD_CACHE = args.cache
+    dungeons_settings.PLAN_CACHE_DIR = args.plan_cache
+    dungeons_settings.DUNGEON_SEED = args.seed
+    import blocky_dungeon_v1
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        blocky_dungeon_v1.main()
+    elapsed = time.perf_counter() - start
+    server.stop()
+
+    print(f'DUNGEON_SIZE={args.size} latence={args.latency * 1000:g} ms connexions={args.connections} cache={args.cache} plans={args.plan_cache} graine={args.seed}')
+    print(f'{server.commandCount} commandes reçues par le serveur en {elapsed:.3f} s')
+
+
+if __name__ == '__main__':
+    main()
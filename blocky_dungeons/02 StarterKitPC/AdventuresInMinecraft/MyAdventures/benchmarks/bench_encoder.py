@@ -0,0 +1,68 @@
+'''
+Micro-benchmark de l'encodage des paramètres des commandes mcpi.
+
+Compare l'encodeur actuel (mcpi.util / mcpi.minecraft.intFloor) à l'implémentation
+d'origine (générateur récursif, un encode par paramètre) sur les formes d'arguments
+les plus fréquentes, et vérifie que les octets produits sont identiques.
+
+Usage : python benchmarks/bench_encoder.py [nombre_d_iterations]
+'''
+
+import collections.abc
+import math
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mcpi.block as block
+from mcpi.minecraft import intFloor
+from mcpi.util import flatten_parameters_to_bytestring
+from mcpi.vec3 import Vec3
+
+
+def reference_flatten(l):
+    for e in l:
+        if isinstance(e, collections.abc.Iterable) and not isinstance(e, str):
+            for ee in reference_flatten(e): yield ee
+        else: yield e
+
+def reference_encode(l):
+    return b",".join(map(lambda m: str(m).encode("UTF-8"), reference_flatten(l)))
+
+def reference_intFloor(*args):
+    return [int(math.floor(x)) for x in reference_flatten(args)]
+
+
+# (nom, arguments passés à Minecraft.setBlock/setBlocks ou à Connection.send)
+SHAPES = (
+    ('setBlock ints', (10, 64, -3, 4, 0)),
+    ('setBlock Block', (10, 64, -3, block.STONE_BRICK)),
+    ('setBlock Block + data', (10, 64, -3, block.STONE_BRICK, 3)),
+    ('setBlocks ints + Block', (-10, 53, -10, 10, 71, 10, block.AIR)),
+    ('setBlocks tuple + Block', ((-10, 53, -10), 10, 64, 10, block.COBBLESTONE)),
+    ('setPos Vec3 floats', (Vec3(10.5, 64.0, -3.25),)),
+    ('chat.post str', ("Vous etes toujours vivant ??",)),
+)
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print(f'{"forme":<26} {"origine (µs)":>13} {"actuel (µs)":>12} {"gain":>6}')
+    for name, args in SHAPES:
+        # commande telle que l'envoie Minecraft : intFloor puis encodage
+        if name.startswith(('setPos', 'chat')):
+            old = lambda: reference_encode((args,))
+            new = lambda: flatten_parameters_to_bytestring((args,))
+        else:
+            old = lambda: reference_encode((reference_intFloor(args),))
+            new = lambda: flatten_parameters_to_bytestring((intFloor(args),))
+        assert old() == new(), (name, old(), new())
+        old_time = min(timeit.repeat(old, number=number, repeat=3)) / number * 1e6
+        new_time = min(timeit.repeat(new, number=number, repeat=3)) / number * 1e6
+        print(f'{name:<26} {old_time:>13.3f} {new_time:>12.3f} {old_time / new_time:>5.1f}x')
+
+
+if __name__ == '__main__':
+    main()
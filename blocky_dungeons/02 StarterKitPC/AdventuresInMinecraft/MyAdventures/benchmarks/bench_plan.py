@@ -0,0 +1,45 @@
+'''
+Chronomètre le calcul du plan d'un donjon (DungeonPlan), seul, sans connexion au serveur.
+
+Usage : python benchmarks/bench_plan.py [--size 10] [--seeds 20] [--order dfs]
+'''
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dungeons_settings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=dungeons_settings.DUNGEON_SIZE, help='DUNGEON_SIZE')
+    parser.add_argument('--seeds', type=int, default=20, help='nombre de donjons planifiés (graines 0, 1, 2...)')
+    parser.add_argument('--order', default=dungeons_settings.DUNGEON_ORDER, help='DUNGEON_ORDER')
+    args = parser.parse_args()
+
+    from blocky_dungeon_v1 import DungeonPlan
+
+    rooms = steps = ops = 0
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for seed in range(args.seeds):
+            plan = DungeonPlan(0, 64, 0, args.size, seed=seed, order=args.order)
+            plan.generate()
+            rooms += len(plan.rooms)
+            steps += len(plan.steps)
+            ops += sum(len(step[1]) for step in plan.steps)
+    elapsed = time.perf_counter() - start
+
+    print(f'DUNGEON_SIZE={args.size} ordre={args.order} graines=0..{args.seeds - 1}')
+    print(f'{rooms} salles, {steps} étapes, {ops} écritures planifiées en {elapsed:.3f} s '
+          f'({elapsed / args.seeds * 1000:.1f} ms par donjon)')
+
+
+if __name__ == '__main__':
+    main()
@@ -11,12 +11,45 @@ Creation : 03/01/2025
 import mcpi.minecraft as minecraft
 import mcpi.block as block
 import mcpi.entity as entity
+from mcpi.connection import Connection, RequestError
+from mcpi.pool import ConnectionPool
+from mcpi.record import RecordingConnection
+from mcpi.cache import CachedMinecraft
+from mcpi.anvil import AnvilWorld, AnvilReader
+from mcpi.voxel import VoxelBuffer, commandSize
+import plan_cache
+import dungeon_save
+from scheduler import TimerWheel, Timeline
+from monologue import EVIL_MONOLOGUE
+from prefabs import get_prefab
+from collections import deque
+import argparse
+import heapq
+import os
 import random
-import time
+import threading
 
 from dungeons_settings import *
 
-mc = minecraft.Minecraft.create()
+def connect():
+    """Ouvre la connexion au serveur selon les paramètres de dungeons_settings.py"""
+    if RECORD_FILE:
+        # l'enregistrement se fait sur une seule connexion pour pouvoir être rejoué tel quel
+        connection = RecordingConnection(RECORD_FILE, SERVER_ADDRESS, SERVER_PORT)
+    elif CONNECTIONS > 1:
+        connection = ConnectionPool(SERVER_ADDRESS, SERVER_PORT, size=CONNECTIONS)
+    else:
+        connection = Connection(SERVER_ADDRESS, SERVER_PORT)
+    if WORLD_CACHE:
+        # les blocs posés par le générateur sont relus en mémoire au lieu de les redemander au serveur
+        return CachedMinecraft(connection)
+    return minecraft.Minecraft(connection)
+
+def save_stats(mc):
+    """Enregistre les statistiques de la connexion dans STATS_FILE, si elles sont activées"""
+    if STATS_FILE and mc.stats() is not None:
+        mc.stats().dump(STATS_FILE)
+        print('Statistics saved in', STATS_FILE)
 
 DONJON_NAME_LIST = ("les caves d'Akandar",
                     "la forteresse de Dar-Kerand",
@@ -29,7 +62,6 @@ DONJON_NAME_LIST = ("les caves d'Akandar",
                     "le fort des Soldats D'ombres",
                     "l'Antre de la Wyvern",
                     "les oubliettes d'Isline")
-DONJON_NAME = random.choice(DONJON_NAME_LIST)
 
 ENTITY_BOSS_LIST = (entity.WITHER_SKELETON, entity.ILLUSIONER, entity.ENDERMAN, entity.EVOKER)
 ENTITY_MONSTER_LVL1_LIST = (entity.ZOMBIE, entity.SKELETON, entity.SLIME, entity.SPIDER)
@@ -48,13 +80,15 @@ class Room:
     - depth (int) : profondeur de la salle
     - entrance (tuple[int, int, int]) : coordonnées de l'entrée de la salle par laquelle elle a été générée. Précisée car cette porte DOIS exister. Elle DOIT IMPERATIVEMENT être l'une des 4 coordonnées possibles.
     - is_spawn (bool) : indique si la salle est la salle de départ du donjon.
+    - rng : générateur aléatoire utilisé pour tirer la salle (le module random par défaut)
     '''
     ROOM_THEMES = ('winter', 'hell', 'forest')
     ROOM_TYPES = ('normal', 'normal', 'normal', 'bridge', 'bridge', 'boss') # kewords repeated for probabilities
     ROOM_TAGS = ('monster', 'trap', 'treasure', 'locked', 'one exit')
     ROOM_LEVELS = (1, 2, 3)
 
-    def __init__(self, pos, width, height, depth, entrance, is_spawn=False):
+    def __init__(self, pos, width, height, depth, entrance, is_spawn=False, rng=random):
+        self.random = rng
         self.center = pos
         self.width = width
         self.height = height
@@ -79,10 +113,10 @@ class Room:
             (x-width//2+5, y+1, z-depth//2+5)
         )
 
-        self.theme = random.choice(self.ROOM_THEMES)
-        self.type = 'spawn' if is_spawn else random.choice(self.ROOM_TYPES)
-        self.tags = 'special' if self.type in ('boss', 'spawn') else random.sample(self.ROOM_TAGS, random.randint(1, 3))
-        self.level = random.choice(self.ROOM_LEVELS)
+        self.theme = self.random.choice(self.ROOM_THEMES)
+        self.type = 'spawn' if is_spawn else self.random.choice(self.ROOM_TYPES)
+        self.tags = 'special' if self.type in ('boss', 'spawn') else self.random.sample(self.ROOM_TAGS, self.random.randint(1, 3))
+        self.level = self.random.choice(self.ROOM_LEVELS)
         self.orientation = None # l'orientation n'a d'importance que pour bridge
         if self.type == 'bridge':
             if self.pos_entrance[0] == x:
@@ -94,15 +128,18 @@ class Room:
                 self.orientation = 'x'
 
         self.liquid_block = block.ICE if self.theme == 'winter' else block.LAVA if self.theme == 'hell' else block.WATER
+        self.world = VoxelBuffer() # les blocs posés sont enregistrés, puis envoyés par un Builder
+        self.steps = [] # étapes de construction : (blocs, délai en secondes avant leur envoi, voir defer)
     
-    def yield_generation_point(self):
+    def yield_generation_point(self, points=None):
         """
         Renvoie un point de la pièce à partir duquel une autre pièce se générer.
         Sous forme de tuple ((x, y, z), 'direction')
+        points : portes de la pièce à considérer (par défaut, celles qui ont été ouvertes)
 
         ATTENTION : Ce tuple donne la position de la porte pour la nouvelle pièce, pas la porte de la pièce actuelle.
         """
-        for point in self.generation_points:
+        for point in (self.generation_points if points is None else points):
             if point[0] < self.center[0]:
                 yield ((point[0]-1, point[1], point[2]), '+x')
             elif point[0] > self.center[0]:
@@ -112,8 +149,43 @@ class Room:
             elif point[2] > self.center[2]:
                 yield ((point[0], point[1], point[2]+1), '-z')
 
+    @staticmethod
+    def box(center, width, height, depth):
+        """
+        Boîte (x0, y0, z0, x1, y1, z1) que peut occuper une salle de ces dimensions :
+        des fondations du sol (11 blocs sous le centre) jusqu'au dessus du plafond.
+        """
+        x, y, z = center
+        return (x-width//2, y-11, z-depth//2, x+width//2, y+height+2, z+depth//2)
+
+    def bounds(self):
+        """Boîte englobante de la salle et de tous les blocs qu'elle a posés"""
+        x0, y0, z0, x1, y1, z1 = self.box(self.center, self.width, self.height, self.depth)
+        for ops, _ in self.steps:
+            for op in ops:
+                x0, y0, z0 = min(x0, op[0]), min(y0, op[1]), min(z0, op[2])
+                x1, y1, z1 = max(x1, op[3]), max(y1, op[4]), max(z1, op[5])
+        return (x0, y0, z0, x1, y1, z1)
+
+    def end_step(self):
+        """Termine l'étape de construction en cours"""
+        self.steps.append((self.world.ops, 0))
+        self.world = VoxelBuffer()
+
+    def defer(self, seconds):
+        """
+        Renvoie un VoxelBuffer dont les blocs seront posés <seconds> secondes après ceux déjà prévus.
+        Le Builder n'attend pas : les étapes suivantes, de cette salle comme des autres, sont envoyées entre-temps.
+        """
+        self.end_step()
+        later = VoxelBuffer()
+        self.steps.append((later.ops, seconds))
+        return later
+
     def generate(self):
-        """Créé la salle"""
+        """Prépare tous les blocs de la salle, sans rien envoyer au serveur (voir Builder)"""
+        self.steps = []
+        self.world = VoxelBuffer()
         self.clear_area()
         self.generate_floor()
         self.generate_walls()
@@ -126,25 +198,26 @@ class Room:
             self.summon_monsters()
         self.generate_enhancements()
         self.generate_doors()
+        self.end_step()
         # mc.player.setPos(*self.pos_entrance)
         print('room generated.')
 
     def clear_area(self):
         """Vide l'espace où la pièce va être créée"""
         x, y, z = self.center
-        mc.setBlocks(x-self.width//2, y, z-self.depth//2,
+        self.world.setBlocks(x-self.width//2, y, z-self.depth//2,
                      x+self.width//2, y+self.height, z+self.depth//2,
                      block.AIR)
         
     def place_ground_safe(self, x, y, z):
         """Génère une zone de blocs pour servir de bases aux objets potentiellement générés au dessus des lacs"""
-        mc.setBlocks(x-1, y, z-1, x+1, y, z+1, block.STONE_BRICK)
-        mc.setBlocks(x-1, y-10, z-1, x+1, y-1, z+1, block.MOSS_STONE)
+        self.world.setBlocks(x-1, y, z-1, x+1, y, z+1, block.STONE_BRICK)
+        self.world.setBlocks(x-1, y-10, z-1, x+1, y-1, z+1, block.MOSS_STONE)
         
     def generate_roof(self):
         """Génère le plafond de la pièce"""
         x, y, z = self.center
-        mc.setBlocks(x-self.width//2, y+self.height, z-self.depth//2,
+        self.world.setBlocks(x-self.width//2, y+self.height, z-self.depth//2,
                      x+self.width//2, y+self.height+1, z+self.depth//2,
                      ROOF_BLOCK)
 
@@ -152,85 +225,85 @@ class Room:
         """Génère le sol de la pièce"""
         x, y, z = self.center
         if self.type == "bridge":
-            mc.setBlocks(x-self.width//2, y-2, z-self.depth//2,
+            self.world.setBlocks(x-self.width//2, y-2, z-self.depth//2,
                          x+self.width//2, y, z+self.depth//2,
                          block.AIR)
-            mc.setBlocks(x-self.width//2, y-2, z-self.depth//2,
+            self.world.setBlocks(x-self.width//2, y-2, z-self.depth//2,
                          x+self.width//2, y-1, z+self.depth//2,
                          self.liquid_block)
             bridge_block = block.STONE if self.theme == 'hell' else WOOD_BLOCK
             i, j, k = self.pos_entrance
             if self.orientation == 'x':
-                mc.setBlocks(*self.pos_doors[0],
+                self.world.setBlocks(*self.pos_doors[0],
                              i, j, k+1,
                              bridge_block)
             else:
-                mc.setBlocks(*self.pos_doors[2],
+                self.world.setBlocks(*self.pos_doors[2],
                              i+1, j, k,
                              bridge_block)
         elif self.type == 'normal':
-            mc.setBlocks(x-self.width//2, y-11, z-self.depth//2,
+            self.world.setBlocks(x-self.width//2, y-11, z-self.depth//2,
                          x+self.width//2, y, z+self.depth//2,
                          FLOOR_BLOCK)
             for quart in range(4):
-                if random.randint(0, 100) < 20:
+                if self.random.randint(0, 100) < 20:
                     self.generate_lake(quart)
         else:
-            mc.setBlocks(x-self.width//2, y, z-self.depth//2,
+            self.world.setBlocks(x-self.width//2, y, z-self.depth//2,
                          x+self.width//2, y, z+self.depth//2,
                          FLOOR_BLOCK)
             if self.type == 'spawn':
-                mc.setBlock(x, y, z, block.GLOWSTONE_BLOCK)
+                self.world.setBlock(x, y, z, block.GLOWSTONE_BLOCK)
             
     def generate_lake(self, quart):
         """Génère un lac sur le quart <quart> du sol"""
         x, y, z = self.center
 
-        liquid = self.liquid_block if random.randint(1, 100) < 25 else block.AIR
+        liquid = self.liquid_block if self.random.randint(1, 100) < 25 else block.AIR
         # probabilité d'avoir une fosse très profonde plutôt qu'un lac
 
         if quart == 0:
-            mc.setBlocks(x-self.width//2, y-10, z-self.depth//2,
+            self.world.setBlocks(x-self.width//2, y-10, z-self.depth//2,
                          x-2, y, z-2,
                          block.AIR)
-            mc.setBlocks(x-self.width//2, y-2, z-self.depth//2,
+            self.world.setBlocks(x-self.width//2, y-2, z-self.depth//2,
                          x-2, y-1, z-2,
                          liquid)
         elif quart == 1:
-            mc.setBlocks(x-self.width//2, y-10, z+self.depth//2,
+            self.world.setBlocks(x-self.width//2, y-10, z+self.depth//2,
                          x-2, y, z+2,
                          block.AIR)
-            mc.setBlocks(x-self.width//2, y-2, z+self.depth//2,
+            self.world.setBlocks(x-self.width//2, y-2, z+self.depth//2,
                          x-2, y-1, z+2,
                          liquid)
         elif quart == 2:
-            mc.setBlocks(x+self.width//2, y-10, z-self.depth//2,
+            self.world.setBlocks(x+self.width//2, y-10, z-self.depth//2,
                          x+2, y, z-2,
                          block.AIR)
-            mc.setBlocks(x+self.width//2, y-2, z-self.depth//2,
+            self.world.setBlocks(x+self.width//2, y-2, z-self.depth//2,
                          x+2, y-1, z-2,
                          liquid)
         elif quart == 3:
-            mc.setBlocks(x+self.width//2, y-10, z+self.depth//2,
+            self.world.setBlocks(x+self.width//2, y-10, z+self.depth//2,
                          x+2, y, z+2,
                          block.AIR)
-            mc.setBlocks(x+self.width//2, y-2, z+self.depth//2,
+            self.world.setBlocks(x+self.width//2, y-2, z+self.depth//2,
                          x+2, y-1, z+2,
                          liquid)
         
     def generate_walls(self):
         """Génère les murs de la pièce"""
         x, y, z = self.center
-        mc.setBlocks(x-self.width//2, y-10, z-self.depth//2,
+        self.world.setBlocks(x-self.width//2, y-10, z-self.depth//2,
                      x+self.width//2, y+self.height, z-self.depth//2,
                      WALL_BLOCK)
-        mc.setBlocks(x-self.width//2, y-10, z-self.depth//2,
+        self.world.setBlocks(x-self.width//2, y-10, z-self.depth//2,
                      x-self.width//2, y+self.height, z+self.depth//2,
                      WALL_BLOCK)
-        mc.setBlocks(x+self.width//2, y-10, z-self.depth//2,
+        self.world.setBlocks(x+self.width//2, y-10, z-self.depth//2,
                      x+self.width//2, y+self.height, z+self.depth//2,
                      WALL_BLOCK)
-        mc.setBlocks(x-self.width//2, y-10, z+self.depth//2,
+        self.world.setBlocks(x-self.width//2, y-10, z+self.depth//2,
                      x+self.width//2, y+self.height, z+self.depth//2,
                      WALL_BLOCK)
         
@@ -247,13 +320,13 @@ class Room:
             else:
                 self.place_door(*self.pos_doors[2])
         elif 'one exit' in self.tags:
-            self.place_door(*self.pos_doors[random.randint(0, 2)])
+            self.place_door(*self.pos_doors[self.random.randint(0, 2)])
         elif self.type == 'spawn':
             for door in self.pos_doors:
                 self.place_door(*door)
         else:
             for door in self.pos_doors:
-                if random.randint(1, 100) < 50:
+                if self.random.randint(1, 100) < 50:
                     self.place_door(*door)
             
     def place_door(self, x, y, z, is_entrance=False):
@@ -264,32 +337,32 @@ class Room:
         print('door opened')
         if z == self.center[2]:
             # orienté z
-            mc.setBlocks(x, y+1, z, x, y+2, z+1, block.AIR)
+            self.world.setBlocks(x, y+1, z, x, y+2, z+1, block.AIR)
             if not is_entrance:
                 if 'locked' in self.tags:
-                    mc.setBlock(x, y+1, z, block.DOOR_IRON.id, 2) # left close
-                    mc.setBlock(x, y+2, z, block.DOOR_IRON.id, 10)
-                    mc.setBlock(x, y+1, z+1, block.DOOR_IRON.id, 2)
-                    mc.setBlock(x, y+2, z+1, block.DOOR_IRON.id, 10)
+                    self.world.setBlock(x, y+1, z, block.DOOR_IRON.id, 2) # left close
+                    self.world.setBlock(x, y+2, z, block.DOOR_IRON.id, 10)
+                    self.world.setBlock(x, y+1, z+1, block.DOOR_IRON.id, 2)
+                    self.world.setBlock(x, y+2, z+1, block.DOOR_IRON.id, 10)
                 else:
-                    mc.setBlock(x, y+1, z, block.DOOR_WOOD.id, 2) # left close
-                    mc.setBlock(x, y+2, z, block.DOOR_WOOD.id, 10)
-                    mc.setBlock(x, y+1, z+1, block.DOOR_WOOD.id, 2)
-                    mc.setBlock(x, y+2, z+1, block.DOOR_WOOD.id, 10)
+                    self.world.setBlock(x, y+1, z, block.DOOR_WOOD.id, 2) # left close
+                    self.world.setBlock(x, y+2, z, block.DOOR_WOOD.id, 10)
+                    self.world.setBlock(x, y+1, z+1, block.DOOR_WOOD.id, 2)
+                    self.world.setBlock(x, y+2, z+1, block.DOOR_WOOD.id, 10)
         else:
             # orienté x
-            mc.setBlocks(x, y+1, z, x+1, y+2, z, block.AIR)
+            self.world.setBlocks(x, y+1, z, x+1, y+2, z, block.AIR)
             if not is_entrance:
                 if 'locked' in self.tags:
-                    mc.setBlock(x, y+1, z, block.DOOR_IRON.id, 1) # left close
-                    mc.setBlock(x, y+2, z, block.DOOR_IRON.id, 9)
-                    mc.setBlock(x+1, y+1, z, block.DOOR_IRON.id, 1)
-                    mc.setBlock(x+1, y+2, z, block.DOOR_IRON.id, 9)
+                    self.world.setBlock(x, y+1, z, block.DOOR_IRON.id, 1) # left close
+                    self.world.setBlock(x, y+2, z, block.DOOR_IRON.id, 9)
+                    self.world.setBlock(x+1, y+1, z, block.DOOR_IRON.id, 1)
+                    self.world.setBlock(x+1, y+2, z, block.DOOR_IRON.id, 9)
                 else:
-                    mc.setBlock(x, y+1, z, block.DOOR_WOOD.id, 1) # left close
-                    mc.setBlock(x, y+2, z, block.DOOR_WOOD.id, 9)
-                    mc.setBlock(x+1, y+1, z, block.DOOR_WOOD.id, 1)
-                    mc.setBlock(x+1, y+2, z, block.DOOR_WOOD.id, 9)
+                    self.world.setBlock(x, y+1, z, block.DOOR_WOOD.id, 1) # left close
+                    self.world.setBlock(x, y+2, z, block.DOOR_WOOD.id, 9)
+                    self.world.setBlock(x+1, y+1, z, block.DOOR_WOOD.id, 1)
+                    self.world.setBlock(x+1, y+2, z, block.DOOR_WOOD.id, 9)
 
     def generate_treasures(self):
         """Génère des trésors dans la pièce"""
@@ -297,10 +370,10 @@ class Room:
         for place in self.pos_stuff:
             x, y, z = place
             if not ((x, y-1, z) == self.center and self.type == 'bridge'): # pas de coffre au milieu du pont
-                if random.randint(0, 100) < 50:
+                if self.random.randint(0, 100) < 50:
                     self.place_chest_with_stuff(x, y, z)
-                elif random.randint(0, 100) < 75:
-                    mc.setBlock(x, y, z, random.choice(block_treasure_list))
+                elif self.random.randint(0, 100) < 75:
+                    self.world.setBlock(x, y, z, self.random.choice(block_treasure_list))
                     self.place_ground_safe(x, y-1, z)
 
     def place_chest_with_stuff(self, x, y ,z):
@@ -310,7 +383,7 @@ class Room:
         Place un coffre avec des trésors dedans.
         """
         # pas de méthode permettant de remplir le coffre. Pas de hopper ni spawn item pour les remplir en trichant un peu.
-        mc.setBlock(x, y, z, block.CHEST)
+        self.world.setBlock(x, y, z, block.CHEST)
         self.place_ground_safe(x, y-1, z)
 
     def generate_traps(self):
@@ -321,7 +394,7 @@ class Room:
         """
         trap_list = ('cobweb', 'pit', 'pit', 'lava fall', 'lava fall') # reduced probability for cobweb because worst one.
         # abandonné : anvil (no entity falling anvil), tnt floor (no block pressure plate), tnt chest (no trapped chest), shulker (mc.spawnEntity doesn't work)
-        type_piege = random.sample(trap_list, random.randint(1, 2))
+        type_piege = self.random.sample(trap_list, self.random.randint(1, 2))
         if 'cobweb' in type_piege:
             self.place_cobweb_trap()
         if 'pit' in type_piege:
@@ -336,6 +409,7 @@ class Room:
         Place des toiles d'araignées dans la pièce (le piège le plus insuportable)
         """
         # spawnEntity ne fonctionne pas...
+        # toiles tirées au hasard : même regroupées (voir mcpi/voxel.py), elles coûtent quelques centaines de commandes
         x, y, z = self.center
         x -= self.width//2-1
         y += 1
@@ -343,8 +417,8 @@ class Room:
         for i in range(self.width-2):
             for j in range(self.depth-2):
                 for k in range(self.height-1):
-                    if random.randint(0, 100) < 25:
-                        mc.setBlock(x+i, y+k, z+j, block.COBWEB)
+                    if self.random.randint(0, 100) < 25:
+                        self.world.setBlock(x+i, y+k, z+j, block.COBWEB)
         # mc.spawnEntity(x, y+2*(self.height//3), z, entity.CAVE_SPIDER)
 
     def place_pit_trap(self):
@@ -352,42 +426,40 @@ class Room:
         for door in self.pos_doors:
             x, y, z = door
             if x < self.center[0]:
-                mc.setBlocks(x+1, y, z, x+1, y-5, z+1, block.AIR)
-                mc.setBlocks(x+1, y-6, z, x+1, y-6, z+1, block.NETHERRACK)
-                mc.setBlocks(x+1, y-5, z, x+1, y-5, z+1, block.FIRE)
+                self.world.setBlocks(x+1, y, z, x+1, y-5, z+1, block.AIR)
+                self.world.setBlocks(x+1, y-6, z, x+1, y-6, z+1, block.NETHERRACK)
+                self.world.setBlocks(x+1, y-5, z, x+1, y-5, z+1, block.FIRE)
             elif x > self.center[0]:
-                mc.setBlocks(x-1, y, z, x-1, y-5, z+1, block.AIR)
-                mc.setBlocks(x-1, y-6, z, x-1, y-6, z+1, block.NETHERRACK)
-                mc.setBlocks(x-1, y-5, z, x-1, y-5, z+1, block.FIRE)
+                self.world.setBlocks(x-1, y, z, x-1, y-5, z+1, block.AIR)
+                self.world.setBlocks(x-1, y-6, z, x-1, y-6, z+1, block.NETHERRACK)
+                self.world.setBlocks(x-1, y-5, z, x-1, y-5, z+1, block.FIRE)
             elif z < self.center[2]:
-                mc.setBlocks(x, y, z+1, x+1, y-5, z+1, block.AIR)
-                mc.setBlocks(x, y-6, z+1, x+1, y-6, z+1, block.NETHERRACK)
-                mc.setBlocks(x, y-5, z+1, x+1, y-5, z+1, block.FIRE)
+                self.world.setBlocks(x, y, z+1, x+1, y-5, z+1, block.AIR)
+                self.world.setBlocks(x, y-6, z+1, x+1, y-6, z+1, block.NETHERRACK)
+                self.world.setBlocks(x, y-5, z+1, x+1, y-5, z+1, block.FIRE)
             elif z > self.center[2]:
-                mc.setBlocks(x, y, z-1, x+1, y-5, z-1, block.AIR)
-                mc.setBlocks(x, y-6, z-1, x+1, y-6, z-1, block.NETHERRACK)
-                mc.setBlocks(x, y-5, z-1, x+1, y-5, z-1, block.FIRE)
+                self.world.setBlocks(x, y, z-1, x+1, y-5, z-1, block.AIR)
+                self.world.setBlocks(x, y-6, z-1, x+1, y-6, z-1, block.NETHERRACK)
+                self.world.setBlocks(x, y-5, z-1, x+1, y-5, z-1, block.FIRE)
 
     def place_lavafall_trap(self):
         """pose des chutes de lave dans la pièce devant les portes"""
         for door in self.pos_doors:
             x, y, z = door
             if x < self.center[0]:
-                mc.setBlocks(x+1, y+self.height, z, x+1, y+self.height, z+1, block.LAVA)
-                time.sleep(1.5) # pour laisser à la lave le temps de s'écouler
-                mc.setBlocks(x+1, y+self.height, z, x+1, y+self.height, z+1, ROOF_BLOCK)
+                self.world.setBlocks(x+1, y+self.height, z, x+1, y+self.height, z+1, block.LAVA)
+                # le plafond est refermé une fois que la lave a eu le temps de s'écouler
+                self.defer(1.5).setBlocks(x+1, y+self.height, z, x+1, y+self.height, z+1, ROOF_BLOCK)
             elif x > self.center[0]:
-                mc.setBlocks(x-1, y+self.height, z, x-1, y+self.height, z+1, block.LAVA)
-                time.sleep(1.5)
-                mc.setBlocks(x-1, y+self.height, z, x-1, y+self.height, z+1, ROOF_BLOCK)
+                self.world.setBlocks(x-1, y+self.height, z, x-1, y+self.height, z+1, block.LAVA)
+                # le plafond est refermé une fois que la lave a eu le temps de s'écouler
+                self.defer(1.5).setBlocks(x-1, y+self.height, z, x-1, y+self.height, z+1, ROOF_BLOCK)
             elif z < self.center[2]:
-                mc.setBlocks(x, y+self.height, z+1, x+1, y+self.height, z+1, block.LAVA)
-                time.sleep(1.5)
-                mc.setBlocks(x, y+self.height, z+1, x+1, y+self.height, z+1, ROOF_BLOCK)
+                self.world.setBlocks(x, y+self.height, z+1, x+1, y+self.height, z+1, block.LAVA)
+                self.defer(1.5).setBlocks(x, y+self.height, z+1, x+1, y+self.height, z+1, ROOF_BLOCK)
             elif z > self.center[2]:
-                mc.setBlocks(x, y+self.height, z-1, x+1, y+self.height, z-1, block.LAVA)
-                time.sleep(1.5)
-                mc.setBlocks(x, y+self.height, z-1, x+1, y+self.height, z-1, ROOF_BLOCK)
+                self.world.setBlocks(x, y+self.height, z-1, x+1, y+self.height, z-1, block.LAVA)
+                self.defer(1.5).setBlocks(x, y+self.height, z-1, x+1, y+self.height, z-1, ROOF_BLOCK)
     
     def generate_enhancements(self):
         """place des décorations dans la pièce"""
@@ -397,7 +469,7 @@ class Room:
             x, y, z = self.center
             self.place_boss_fall(x, y, z)
         if self.type == 'spawn' or self.type == 'boss':
-            generate_deco = random.choice(decor_functions_list)
+            generate_deco = self.random.choice(decor_functions_list)
             for place in self.pos_stuff:
                 x, y, z = place
                 if (x, y-1, z) != self.center:
@@ -406,95 +478,61 @@ class Room:
             for place in self.pos_stuff:
                 x, y, z = place
                 if True: #if mc.getBlock(x, y, z) == block.AIR.id: # bridge crash source
-                    if random.randint(0, 100) < 50:
+                    if self.random.randint(0, 100) < 50:
                         if self.type == 'normal':
-                            generate_deco = random.choice(decor_functions_list)
+                            generate_deco = self.random.choice(decor_functions_list)
                         else:
                             generate_deco = self.place_fall
                         generate_deco(x, y, z)
         if 'locked' in self.tags:
-            x, y, z = self.pos_stuff[random.randint(1, 4)] # centre exclu
-            mc.setBlocks(x, y+self.height-1, z, x, y+self.height+1, z, ROOF_BLOCK) # pour boucher les chutes de liquide
+            x, y, z = self.pos_stuff[self.random.randint(1, 4)] # centre exclu
+            self.world.setBlocks(x, y+self.height-1, z, x, y+self.height+1, z, ROOF_BLOCK) # pour boucher les chutes de liquide
             self.place_ground_safe(x, y-1, z)
-            mc.setBlock(x, y, z, block.TORCH_REDSTONE.id, 5) # permet d'ouvrir une porte en fer
+            self.world.setBlock(x, y, z, block.TORCH_REDSTONE.id, 5) # permet d'ouvrir une porte en fer
 
     def place_boss_fall(self, x, y, z):
         """place des chutes de liquide autour du centre de la salle"""
-        mc.setBlocks(x- self.width//3, y-1, z+self.depth//3,
+        self.world.setBlocks(x- self.width//3, y-1, z+self.depth//3,
                         x+ self.width//3, y+self.height+1, z+self.depth//3,
                         self.liquid_block)
-        mc.setBlocks(x-2, y, z+self.depth//3,
+        self.world.setBlocks(x-2, y, z+self.depth//3,
                         x+2, y+self.height+1, z+self.depth//3,
                         block.AIR)
-        mc.setBlocks(x- self.width//3, y-1, z-self.depth//3,
+        self.world.setBlocks(x- self.width//3, y-1, z-self.depth//3,
                         x+ self.width//3, y+self.height+1, z-self.depth//3,
                         self.liquid_block)
-        mc.setBlocks(x-2, y, z-self.depth//3,
+        self.world.setBlocks(x-2, y, z-self.depth//3,
                         x+2, y+self.height+1, z-self.depth//3,
                         block.AIR)
-        mc.setBlocks(x+self.width//3, y-1, z- self.depth//3,
+        self.world.setBlocks(x+self.width//3, y-1, z- self.depth//3,
                         x+self.width//3, y+self.height+1, z+ self.depth//3,
                         self.liquid_block)
-        mc.setBlocks(x+self.width//3, y, z-2,
+        self.world.setBlocks(x+self.width//3, y, z-2,
                         x+self.width//3, y+self.height+1, z+2,
                         block.AIR)
-        mc.setBlocks(x-self.width//3, y-1, z- self.depth//3,
+        self.world.setBlocks(x-self.width//3, y-1, z- self.depth//3,
                         x-self.width//3, y+self.height+1, z+ self.depth//3,
                         self.liquid_block)
-        mc.setBlocks(x-self.width//3, y, z-2,
+        self.world.setBlocks(x-self.width//3, y, z-2,
                         x-self.width//3, y+self.height+1, z+2,
                         block.AIR)
 
     def place_fire(self, x, y, z):
         """créé un pilier-flambeau avec du feu en haut"""
-        self.place_ground_safe(x, y-1, z)
-        mc.setBlock(x+1, y, z, block.STAIRS_COBBLESTONE.id, 1)
-        mc.setBlock(x-1, y, z, block.STAIRS_COBBLESTONE.id, 0)
-        mc.setBlock(x, y, z+1, block.STAIRS_COBBLESTONE.id, 3)
-        mc.setBlock(x, y, z-1, block.STAIRS_COBBLESTONE.id, 2)
-        mc.setBlock(x, y+1, z, block.STONE_BRICK, 3)
-        mc.setBlock(x, y+2, z, block.NETHERRACK)
-        mc.setBlock(x+1, y+2, z, block.STAIRS_COBBLESTONE.id, 5)
-        mc.setBlock(x-1, y+2, z, block.STAIRS_COBBLESTONE.id, 4)
-        mc.setBlock(x, y+2, z+1, block.STAIRS_COBBLESTONE.id, 7)
-        mc.setBlock(x, y+2, z-1, block.STAIRS_COBBLESTONE.id, 6)
-        mc.setBlock(x, y+3, z, block.FIRE)
+        get_prefab('fire').stamp(self.world, x, y, z)
 
     def place_pillar(self, x, y, z):
         """place un pilier de soutien du sol au plafond"""
-        self.place_ground_safe(x, y-1, z)
-        mc.setBlock(x+1, y, z, block.STAIRS_SANDSTONE.id, 1)
-        mc.setBlock(x-1, y, z, block.STAIRS_SANDSTONE.id, 0)
-        mc.setBlock(x, y, z+1, block.STAIRS_SANDSTONE.id, 3)
-        mc.setBlock(x, y, z-1, block.STAIRS_SANDSTONE.id, 2)
-        for i in range(self.height-2):
-            mc.setBlock(x, y+1+i, z, block.NETHER_BRICK)
-        mc.setBlock(x+1, y+self.height//2, z, block.TORCH.id, 1)
-        mc.setBlock(x-1, y+self.height//2, z, block.TORCH.id, 2)
-        mc.setBlock(x, y+self.height//2, z+1, block.TORCH.id, 3)
-        mc.setBlock(x, y+self.height//2, z-1, block.TORCH.id, 4)
-        mc.setBlock(x+1, y+self.height-2, z, block.STAIRS_SANDSTONE.id, 5)
-        mc.setBlock(x-1, y+self.height-2, z, block.STAIRS_SANDSTONE.id, 4)
-        mc.setBlock(x, y+self.height-2, z+1, block.STAIRS_SANDSTONE.id, 7)
-        mc.setBlock(x, y+self.height-2, z-1, block.STAIRS_SANDSTONE.id, 6)
+        get_prefab('pillar', self.height).stamp(self.world, x, y, z)
 
     def place_cuve(self, x, y, z):
         """place une cuve de liquide"""
-        self.place_ground_safe(x, y-1, z)
-        mc.setBlock(x+1, y, z, block.STAIRS_COBBLESTONE.id, 1)
-        mc.setBlock(x-1, y, z, block.STAIRS_COBBLESTONE.id, 0)
-        mc.setBlock(x, y, z+1, block.STAIRS_COBBLESTONE.id, 3)
-        mc.setBlock(x, y, z-1, block.STAIRS_COBBLESTONE.id, 2)
-        mc.setBlock(x, y, z, self.liquid_block)
-        mc.setBlock(x, y-1, z, block.GLOWSTONE_BLOCK)
+        get_prefab('cuve', self.liquid_block).stamp(self.world, x, y, z)
 
     def place_fall(self, x, y, z):
         """place une chute de liquide"""
         if not (self.type == 'bridge' and (x, y-1, z) == self.center):
-            mc.setBlocks(x, y-1, z, x, y+self.height-1, z, block.AIR)
-            mc.setBlock(x, y+self.height-1, z, self.liquid_block)
-            if self.theme == 'winter':
-                mc.setBlocks(x, y-11, z, x, y+self.height-1, z, self.liquid_block)
+            get_prefab('fall', self.height, self.liquid_block, self.theme == 'winter').stamp(self.world, x, y, z)
 
     def summon_monsters(self):
         """
@@ -507,16 +545,16 @@ class Room:
         y += 1
 
         if self.type == 'boss':
-            monster = random.choice(ENTITY_BOSS_LIST)
+            monster = self.random.choice(ENTITY_BOSS_LIST)
             nb = 1
         elif self.level == 1:
-            monster = random.choice(ENTITY_MONSTER_LVL1_LIST)
+            monster = self.random.choice(ENTITY_MONSTER_LVL1_LIST)
             nb = 4
         elif self.level == 2:
-            monster = random.choice(ENTITY_MONSTER_LVL2_LIST)
+            monster = self.random.choice(ENTITY_MONSTER_LVL2_LIST)
             nb = 3
         elif self.level == 3:
-            monster = random.choice(ENTITY_MONSTER_LVL3_LIST)
+            monster = self.random.choice(ENTITY_MONSTER_LVL3_LIST)
             nb = 2
         
         for _ in range(nb):
@@ -525,206 +563,852 @@ class Room:
         print(f'{nb} {monster.name} would have spawned if mcpi was working.')
 
 
-class Dungeon:
+class RoomGrid:
+    '''
+    Grille d'occupation des salles (hachage spatial).
+    Chaque salle est rangée dans toutes les cellules que couvre sa boîte au sol :
+    savoir si une place est libre ne regarde que les salles des cellules concernées,
+    quelle que soit la taille du donjon. Les salles peuvent avoir des dimensions différentes.
+
+    INPUT
+    - cell_size : côté d'une cellule en blocs (de l'ordre de la taille d'une salle)
+    '''
+    def __init__(self, cell_size=ROOM_SIZE):
+        self.cell_size = cell_size
+        self.cells = {} # (cx, cz) -> [(boîte, salle)]
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def _cells(self, box):
+        x0, _, z0, x1, _, z1 = box
+        size = self.cell_size
+        for cx in range(x0 // size, x1 // size + 1):
+            for cz in range(z0 // size, z1 // size + 1):
+                yield (cx, cz)
+
+    def add(self, room, box):
+        """Range la salle, qui occupe la boîte (x0, y0, z0, x1, y1, z1)"""
+        for cell in self._cells(box):
+            self.cells.setdefault(cell, []).append((box, room))
+        self.count += 1
+
+    def remove(self, room, box):
+        """Retire la salle, rangée avec la boîte (x0, y0, z0, x1, y1, z1)"""
+        for cell in self._cells(box):
+            entries = [entry for entry in self.cells.get(cell, ()) if entry[1] is not room]
+            if entries:
+                self.cells[cell] = entries
+            else:
+                self.cells.pop(cell, None)
+        self.count -= 1
+
+    def overlapping(self, box):
+        """Renvoie les salles dont la boîte chevauche la boîte donnée"""
+        x0, y0, z0, x1, y1, z1 = box
+        found = []
+        for cell in self._cells(box):
+            for other, room in self.cells.get(cell, ()):
+                if (other[0] <= x1 and x0 <= other[3] and other[1] <= y1 and y0 <= other[4]
+                        and other[2] <= z1 and z0 <= other[5] and room not in found):
+                    found.append(room)
+        return found
+
+    def is_free(self, box):
+        """Indique si aucune salle n'occupe une partie de la boîte"""
+        return not self.overlapping(box)
+
+    def rooms_at(self, x, y, z):
+        """Renvoie les salles dont la boîte contient le point (x, y, z)"""
+        return self.overlapping((x, y, z, x, y, z))
+
+
+class Frontier:
+    '''
+    Salles du donjon dont des portes restent à explorer.
+    Remplace la récursion : la taille du donjon n'est plus limitée par la pile d'appels de python.
+
+    INPUTS
+    - order : ordre d'exploration des salles
+        - 'dfs' : profondeur d'abord (même donjon que l'ancienne version récursive)
+        - 'bfs' : largeur d'abord
+        - 'nearest' : les salles les plus proches de la salle d'apparition d'abord
+    - origin : coordonnées de la salle d'apparition
+    '''
+    ORDERS = ('dfs', 'bfs', 'nearest')
+
+    def __init__(self, order, origin):
+        if order not in self.ORDERS:
+            raise ValueError(f"Ordre d'exploration inconnu : {order} (choix : {', '.join(self.ORDERS)})")
+        self.order = order
+        self.origin = origin
+        self.entries = [] if order == 'nearest' else deque()
+        self.count = 0 # départage les salles à égale distance dans l'ordre d'arrivée
+
+    def __len__(self):
+        return len(self.entries)
+
+    def push(self, entry):
+        """Ajoute une salle à explorer. entry : [salle, compteur de salles, portes restantes (None avant la première visite)]"""
+        if self.order == 'nearest':
+            x, _, z = entry[0].center
+            distance = (x - self.origin[0])**2 + (z - self.origin[2])**2
+            heapq.heappush(self.entries, (distance, self.count, entry))
+            self.count += 1
+        else:
+            self.entries.append(entry)
+
+    def pop(self):
+        """Renvoie la prochaine salle à explorer"""
+        if self.order == 'nearest':
+            return heapq.heappop(self.entries)[2]
+        if self.order == 'bfs':
+            return self.entries.popleft()
+        return self.entries.pop()
+
+
+class DungeonPlan:
     '''
     Le donjon génère plusieurs salles liées entre-elles.
     Ces salles finissent soit en cul-e-sac soit en sortie.
     Il est possible qu'un donjon n'ai aucune sortie.
     Dans ce cas, vous êtes condamnés à y périr.
 
+    Le plan est entièrement calculé en mémoire, sans connexion au serveur :
+    les salles et tous leurs blocs sont rangés dans des étapes de construction
+    que le Builder envoie ensuite.
+
     INPUTS
     - x, y, z : coordonnées du centre de la salle d'apparition
     - average_size : taille moyenne du donjon
+    - seed : graine du générateur aléatoire. Sans graine, le module random est utilisé.
+    - order : ordre dans lequel les salles sont ajoutées au plan, et donc construites (voir Frontier)
     '''
     SPAWN_ROOM_SIZE = ROOM_SIZE # la salle d'apparition est toujours carrée
+    MIN_ROOM_HEIGHT = 6
+    MAX_ROOM_HEIGHT = 10
 
-    def __init__(self, x, y, z, average_size=10):
+    def __init__(self, x, y, z, average_size=10, seed=None, order='dfs'):
         self.x = x
         self.y = y
         self.z = z
         self.average_size = average_size
-        self.generated_rooms = []
-        
+        self.order = order
+        self.seed = seed
+        self.random = random.Random(seed) if seed is not None else random
+        self.grid = RoomGrid()
+        self.rooms = []
+        self.steps = [] # étapes de construction : (nom, blocs, délai en secondes avant leur envoi)
+        self.room_steps = {} # centre d'une salle -> indices de ses étapes dans self.steps
+
     def generate(self):
-        """Créé le donjon"""
+        """Calcule le plan du donjon"""
         spawn_room = self.generate_spawn_room()
-        self.generate_random_rooms(spawn_room, 0)
-        print('DONE : Dungeon generated.')
-    
-    def generate_random_rooms(self, current_room:Room, nb_rooms):
+        self.generate_random_rooms(spawn_room)
+        print('DONE : Dungeon planned.')
+
+    def add_room(self, room:Room):
+        """Prépare les blocs d'une salle et les ajoute au plan"""
+        room.generate()
+        self.rooms.append(room)
+        self.grid.add(room, room.bounds())
+        for ops, delay in room.steps:
+            self.add_step(room, ops, delay)
+
+    def add_step(self, room:Room, ops, delay=0, name=None):
+        """Ajoute une étape de construction, rattachée à la salle dont elle modifie les blocs"""
+        self.room_steps.setdefault(room.center, []).append(len(self.steps))
+        self.steps.append((name or f'{room.type} room {room.center}', ops, delay))
+
+    def block_at(self, x, y, z):
         """
-        Génère de manière récursive des salles aléatoirement jusqu'à atteindre le nombre de salles souhaité.
+        Renvoie l'id du bloc posé en dernier en (x, y, z) par le plan jusqu'ici,
+        ou None si le plan n'y pose aucun bloc.
+        Seules les étapes des salles qui contiennent ce point sont parcourues.
         """
-        if nb_rooms >= self.average_size:
-            print('The room is an exit room')
-            self.turn_to_end_room(current_room)
-            return None # on arrête le programme
-        
-        for door in current_room.yield_generation_point():
-            door_direction = door[1]
-            door_pos = door[0]
+        indices = []
+        for room in self.grid.rooms_at(x, y, z):
+            indices.extend(self.room_steps.get(room.center, ()))
+        for i in sorted(indices, reverse=True):
+            for x0, y0, z0, x1, y1, z1, id, _ in reversed(self.steps[i][1]):
+                if x0 <= x <= x1 and y0 <= y <= y1 and z0 <= z <= z1:
+                    return id
+        return None
+
+    def generate_random_rooms(self, spawn_room:Room):
+        """
+        Génère des salles aléatoirement jusqu'à atteindre le nombre de salles souhaité.
+        Chaque visite d'une salle de la file explore une seule de ses portes.
+        """
+        frontier = Frontier(self.order, spawn_room.center)
+        frontier.push([spawn_room, 0, None])
+        while frontier:
+            entry = frontier.pop()
+            current_room, nb_rooms, doors = entry
+            if doors is None:
+                if nb_rooms >= self.average_size:
+                    print('The room is an exit room')
+                    self.turn_to_end_room(current_room)
+                    continue # cette branche du donjon s'arrête là
+                doors = entry[2] = list(current_room.yield_generation_point())
+            if not doors:
+                continue
+            door_direction = doors[0][1]
+            door_pos = doors.pop(0)[0]
+            if doors:
+                frontier.push(entry) # la salle sera revisitée pour ses autres portes
             new_room_size = ROOM_SIZE # pour l'instant toutes les salles sont pareilles (c'est plus facile pour avoir les portes au bon endroit)
-            if door_direction == '-x':
-                new_room_center = (door_pos[0] + new_room_size//2, door_pos[1], door_pos[2])
-            elif door_direction == '+x':
-                new_room_center = (door_pos[0] - new_room_size//2, door_pos[1], door_pos[2])
-            elif door_direction == '-z':
-                new_room_center = (door_pos[0], door_pos[1], door_pos[2] + new_room_size//2)
-            elif door_direction == '+z':
-                new_room_center = (door_pos[0], door_pos[1], door_pos[2] - new_room_size//2)
-            else:
-                raise ValueError("Direction de porte invalide")
-            
-            # print(self.generated_rooms, new_room_center)
-            if not new_room_center in self.generated_rooms:
-                new_room = Room(new_room_center, new_room_size, random.randint(6, 10), new_room_size, door_pos)
+            new_room_center = self.neighbour_center(door_pos, door_direction, new_room_size)
+
+            # la hauteur n'est tirée qu'une fois la place trouvée : on vérifie la place pour la plus haute salle possible
+            if self.grid.is_free(Room.box(new_room_center, new_room_size, self.MAX_ROOM_HEIGHT, new_room_size)):
+                new_room = Room(new_room_center, new_room_size, self.random.randint(self.MIN_ROOM_HEIGHT, self.MAX_ROOM_HEIGHT), new_room_size, door_pos, rng=self.random)
                 print('Generating room', new_room.type.upper(), new_room.tags, 'with theme', new_room.theme)
-                new_room.generate()
-                self.generated_rooms.append(new_room.center)
-                nb_rooms += 1
-                self.generate_random_rooms(new_room, nb_rooms+1)
+                self.add_room(new_room)
+                entry[1] += 1
+                frontier.push([new_room, entry[1]+1, None])
             else:
                 print('Room not generated : place already taken')
 
+    @staticmethod
+    def neighbour_center(door_pos, door_direction, size):
+        """Centre de la salle de côté <size> à générer derrière une porte (voir Room.yield_generation_point)"""
+        x, y, z = door_pos
+        if door_direction == '-x':
+            return (x + size//2, y, z)
+        elif door_direction == '+x':
+            return (x - size//2, y, z)
+        elif door_direction == '-z':
+            return (x, y, z + size//2)
+        elif door_direction == '+z':
+            return (x, y, z - size//2)
+        raise ValueError("Direction de porte invalide")
+
     def turn_to_end_room(self, last_room:Room):
         """Transforme la pièce en cul-de-sac et laisse potentiellement une porte ouverte vers l'extérieur."""
-        for door in last_room.yield_generation_point():
+        doors = [door for door in last_room.yield_generation_point() if self.random.randint(0, 100) < 75]
+        # on vérifie la présence de blocs de pierre pour savoir s'il y a accès à une salle ou à l'extérieur (les portes sont dans les murs et non dans le sol)
+        # le plan connaît déjà tous les murs qu'il a posés : pas besoin de demander au serveur
+        seal = VoxelBuffer()
+        for door in doors:
             x, y, z = door[0]
             door_direction = door[1]
-            if random.randint(0, 100) < 75:
-                # on vérifie la présence de blocs de pierre pour savoir s'il y a accès à une salle ou à l'extérieur (les portes sont dans les murs et non dans le sol)
-                if door_direction == '-x' and not mc.getBlock(x, y, z) == WALL_BLOCK.id:
-                    mc.setBlocks(x-1, y, z, x-1, y+2, z+1, block.STONE_BRICK)
-                elif door_direction == '+x' and not mc.getBlock(x, y, z) == WALL_BLOCK.id:
-                    mc.setBlocks(x+1, y, z, x+1, y+2, z+1, block.STONE_BRICK)
-                elif door_direction == '-z' and not mc.getBlock(x, y, z) == WALL_BLOCK.id:
-                    mc.setBlocks(x, y, z-1, x+1, y+2, z-1, block.STONE_BRICK)
-                elif door_direction == '+z' and not mc.getBlock(x, y, z) == WALL_BLOCK.id:
-                    mc.setBlocks(x, y, z+1, x+1, y+2, z+1, block.STONE_BRICK)
+            if self.block_at(x, y, z) == WALL_BLOCK.id:
+                continue
+            if door_direction == '-x':
+                seal.setBlocks(x-1, y, z, x-1, y+2, z+1, block.STONE_BRICK)
+            elif door_direction == '+x':
+                seal.setBlocks(x+1, y, z, x+1, y+2, z+1, block.STONE_BRICK)
+            elif door_direction == '-z':
+                seal.setBlocks(x, y, z-1, x+1, y+2, z-1, block.STONE_BRICK)
+            elif door_direction == '+z':
+                seal.setBlocks(x, y, z+1, x+1, y+2, z+1, block.STONE_BRICK)
+        if seal.ops:
+            self.add_step(last_room, seal.ops, name=f'end of room {last_room.center}')
         
     def generate_spawn_room(self):
         """
         Salle d'apparition. Le joueur se trouve au milieu au début.
         """
         size = self.SPAWN_ROOM_SIZE
-        spawn_room = Room((self.x, self.y, self.z), size, 6, size, (self.x-size//2, self.y, self.z), is_spawn=True)
+        spawn_room = Room((self.x, self.y, self.z), size, 6, size, (self.x-size//2, self.y, self.z), is_spawn=True, rng=self.random)
         print('Generating spawn room', spawn_room.type.upper(), spawn_room.tags, 'with theme', spawn_room.theme)
-        spawn_room.generate()
-        self.generated_rooms.append(spawn_room.center)
+        self.add_room(spawn_room)
         return spawn_room
 
 
+class Builder:
+    '''
+    Construit un DungeonPlan dans le monde.
+    Les blocs de chaque étape sont regroupés en pavés (voir mcpi/voxel.py) avant d'être envoyés.
+
+    INPUT
+    - mc : connexion au serveur (minecraft.Minecraft)
+    '''
+    def __init__(self, mc):
+        self.mc = mc
+        # avec WORLD_CACHE, les blocs déjà en place dans le monde ne sont pas renvoyés
+        self.known = mc.knownBlocks if isinstance(mc, CachedMinecraft) else None
+
+    def build(self, plan:DungeonPlan):
+        """Envoie toutes les étapes du plan, dans l'ordre"""
+        self.build_steps(plan.steps)
+        print('DONE : Dungeon generated.')
+
+    def build_room(self, room:Room):
+        """Envoie les étapes d'une salle déjà préparée (room.generate())"""
+        self.build_steps([(f'{room.type} room {room.center}', ops, delay) for ops, delay in room.steps])
+
+    def build_steps(self, steps, compiled=False):
+        """
+        Envoie des étapes (nom, blocs, délai en secondes avant leur envoi).
+        Une étape avec un délai est envoyée ce délai après l'étape qui la précède, sans bloquer les suivantes :
+        elle attend dans une roue temporelle (voir scheduler.py) que le Builder fait avancer entre deux étapes.
+        compiled : les blocs sont déjà regroupés en pavés (plan en cache, voir plan_cache.py)
+        et sont envoyés tels quels, sauf s'il reste des blocs déjà en place à retirer.
+        """
+        wheel = TimerWheel()
+        for name, ops, delay in steps:
+            if delay:
+                self.mc.conn.flush() # le délai compte à partir du moment où les blocs précédents sont posés
+                def deferred(name=name, ops=ops):
+                    self.send_step(name, ops, compiled)
+                    self.mc.conn.flush() # aucune étape ne suit forcément : les blocs partent tout de suite
+                wheel.schedule(delay, deferred)
+            else:
+                self.send_step(name, ops, compiled)
+            wheel.advance()
+        wheel.run()
+
+    def send_step(self, name, ops, compiled=False):
+        """Envoie les blocs d'une étape"""
+        buffer = VoxelBuffer(self.mc, known=self.known)
+        if compiled and self.known is None:
+            buffer.recorded += len(ops)
+            buffer.recordedBytes += sum(map(commandSize, ops))
+            buffer.send(ops)
+        else:
+            buffer.ops.extend(ops)
+            buffer.flush()
+        saved_writes, saved_bytes = buffer.saved()
+        print(f'{name} built ({buffer.recorded} writes sent as {buffer.sent} commands, ratio {buffer.ratio():.1f}, '
+              f'{saved_writes} writes and {saved_bytes} bytes saved).')
+
+
+class Streamer(threading.Thread):
+    '''
+    Construit un DungeonPlan en arrière-plan, au fur et à mesure que le joueur s'en approche.
+    Seules les salles à moins de <distance> salles du joueur sont construites. Sa position est relue
+    souvent quand il se déplace, de moins en moins souvent quand il ne bouge pas.
+
+    Les salles peuvent ainsi être construites dans n'importe quel ordre : chaque étape d'une salle
+    ne pose que les blocs qu'aucune salle planifiée après elle ne remplace (murs communs, portes).
+
+    INPUTS
+    - mc : connexion au serveur (minecraft.Minecraft)
+    - plan : DungeonPlan déjà calculé
+    - distance : nombre de salles autour du joueur à construire
+    - min_interval, max_interval : intervalle entre deux lectures de la position du joueur, en secondes
+    '''
+    def __init__(self, mc, plan:DungeonPlan, distance=1, min_interval=0.2, max_interval=2.0):
+        threading.Thread.__init__(self, name='Streamer')
+        self.mc = mc
+        self.plan = plan
+        self.builder = Builder(mc)
+        self.distance = distance
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.built = set() # centres des salles construites
+        self.stopped = threading.Event()
+
+    def steps_of(self, room:Room):
+        """Étapes d'une salle, regroupées en pavés, sans les blocs que les salles planifiées après elle remplacent"""
+        plan = self.plan
+        steps = []
+        for i in plan.room_steps[room.center]:
+            name, ops, delay = plan.steps[i]
+            if not ops:
+                continue
+            # les obturations de portes (turn_to_end_room) peuvent dépasser de la boîte de leur salle
+            box = (min(op[0] for op in ops) - 2, min(op[1] for op in ops), min(op[2] for op in ops) - 2,
+                   max(op[3] for op in ops) + 2, max(op[4] for op in ops), max(op[5] for op in ops) + 2)
+            later = [op for other in plan.grid.overlapping(box) if other is not room
+                     for j in plan.room_steps[other.center] if j > i
+                     for op in plan.steps[j][1]]
+            buffer = VoxelBuffer()
+            buffer.ops = list(ops)
+            steps.append((name, buffer.compile(hidden=later), delay))
+        return steps
+
+    def rooms_near(self, x, y, z, distance=None):
+        """Salles pas encore construites à moins de distance salles (self.distance par défaut) de (x, y, z), les plus proches d'abord"""
+        if distance is None:
+            distance = self.distance
+        reach = distance * ROOM_SIZE + ROOM_SIZE//2
+        rooms = [room for room in self.plan.grid.overlapping((x-reach, y-ROOM_SIZE, z-reach, x+reach, y+ROOM_SIZE, z+reach))
+                 if room.center not in self.built]
+        return sorted(rooms, key=lambda room: (room.center[0]-x)**2 + (room.center[2]-z)**2)
+
+    def build_near(self, x, y, z, distance=None):
+        """Construit les salles à moins de distance salles (self.distance par défaut) de (x, y, z). Renvoie le nombre de salles construites."""
+        rooms = self.rooms_near(x, y, z, distance)
+        if not rooms:
+            return 0
+        steps = []
+        for room in rooms:
+            steps.extend(self.steps_of(room))
+            self.built.add(room.center)
+        with self.mc.conn.pipeline(): # seulement pour ce fil : le monologue n'attend pas la fin de la construction
+            self.builder.build_steps(steps, compiled=True)
+        print(f'{len(rooms)} rooms streamed ({len(self.built)}/{len(self.plan.rooms)}).')
+        return len(rooms)
+
+    def run(self):
+        interval = self.min_interval
+        last = None
+        try:
+            while len(self.built) < len(self.plan.rooms) and not self.stopped.is_set():
+                pos = tuple(self.mc.player.getTilePos())
+                if self.build_near(*pos) or pos != last:
+                    interval = self.min_interval
+                else:
+                    interval = min(interval * 2, self.max_interval) # le joueur ne bouge pas : inutile de lui demander sans arrêt
+                last = pos
+                self.stopped.wait(interval)
+        except (OSError, RequestError):
+            print('Streaming stopped : connection lost.')
+        finally:
+            save_stats(self.mc) # les statistiques comptent toutes les salles construites en arrière-plan
+
+    def stop(self):
+        """Arrête la construction : les salles pas encore construites ne le seront pas"""
+        self.stopped.set()
+
+
+class EndlessDungeon(threading.Thread):
+    '''
+    Donjon sans fin, construit en arrière-plan autour des joueurs.
+
+    De nouvelles salles sont planifiées au-delà des salles construites dès qu'un joueur s'en approche, sans limite.
+    Chaque salle a sa propre graine, tirée de la graine du donjon et de sa position : elle peut donc être
+    recalculée à l'identique à tout moment. Pour que le donjon ne se referme jamais, une salle qui le
+    refermerait est retirée (avec une autre graine) jusqu'à laisser une porte vers une place libre.
+    Les salles trop loin de tous les joueurs sont effacées du monde (quelques setBlocks d'air sur les blocs
+    qu'elles ont posés) et leurs blocs oubliés : seule la salle (Room, sans ses blocs) reste en mémoire. Elle est reconstruite si un joueur revient.
+
+    Comme avec Streamer, une salle ne pose pas les blocs que remplace une salle planifiée après elle et déjà
+    construite. Effacer une salle rend aux salles voisines encore construites les blocs qu'elle leur avait pris.
+
+    INPUTS
+    - mc : connexion au serveur (minecraft.Minecraft)
+    - x, y, z : coordonnées du centre de la salle d'apparition
+    - seed : graine du donjon
+    - distance : nombre de salles construites autour de chaque joueur
+    - evict_distance : les salles à plus de <evict_distance> salles de tous les joueurs sont effacées
+    - min_interval, max_interval : intervalle entre deux lectures de la position des joueurs, en secondes
+    '''
+    def __init__(self, mc, x, y, z, seed, distance=2, evict_distance=4, min_interval=0.2, max_interval=2.0):
+        threading.Thread.__init__(self, name='EndlessDungeon')
+        if evict_distance <= distance:
+            raise ValueError("evict_distance doit être plus grande que distance")
+        self.mc = mc
+        self.seed = seed
+        self.builder = Builder(mc)
+        self.distance = distance
+        self.evict_distance = evict_distance
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.grid = RoomGrid()
+        self.rooms = {} # centre -> Room, sans ses blocs
+        self.order = {} # centre -> rang de la salle dans l'ordre de planification
+        self.boxes = {} # centre -> boîte de la salle et de tous ses blocs
+        self.attempts = {} # centre -> numéro du tirage retenu, pour les salles retirées (voir add_room)
+        self.doors = {} # centre -> portes pas encore explorées
+        self.built = {} # centre -> blocs de la salle (Room.steps), pour les salles construites
+        self.pending = [] # étapes à envoyer à la prochaine mise à jour (salles retirées, voir reopen)
+        self.stopped = threading.Event()
+        self.add_room((x, y, z), (x-ROOM_SIZE//2, y, z), is_spawn=True)
+
+    def room_seed(self, center, attempt=0):
+        """Graine d'une salle : la même salle est toujours générée à la même place"""
+        return random.Random(f'{self.seed}:{center}:{attempt}').getrandbits(32)
+
+    def make_room(self, center, entrance, is_spawn=False, attempt=0):
+        """Tire la salle de centre <center> à partir de sa graine, et prépare ses blocs"""
+        rng = random.Random(self.room_seed(center, attempt))
+        height = DungeonPlan.MIN_ROOM_HEIGHT if is_spawn else rng.randint(DungeonPlan.MIN_ROOM_HEIGHT, DungeonPlan.MAX_ROOM_HEIGHT)
+        room = Room(center, ROOM_SIZE, height, ROOM_SIZE, entrance, is_spawn=is_spawn, rng=rng)
+        room.generate()
+        return room
+
+    def is_free_door(self, door_pos, door_direction, taken=None):
+        """Indique si une nouvelle salle a la place d'être planifiée derrière cette porte, hors de la boîte <taken>"""
+        new_center = DungeonPlan.neighbour_center(door_pos, door_direction, ROOM_SIZE)
+        x0, y0, z0, x1, y1, z1 = box = Room.box(new_center, ROOM_SIZE, DungeonPlan.MAX_ROOM_HEIGHT, ROOM_SIZE)
+        if taken is not None and (taken[0] <= x1 and x0 <= taken[3] and taken[1] <= y1
+                                  and y0 <= taken[4] and taken[2] <= z1 and z0 <= taken[5]):
+            return False
+        return self.grid.is_free(box)
+
+    def is_open(self, room:Room=None):
+        """Indique si, une fois la salle ajoutée, au moins une porte pas encore explorée mène à une place libre"""
+        doors = [door for doors in self.doors.values() for door in doors]
+        if room is None:
+            return any(self.is_free_door(*door) for door in doors)
+        box = room.bounds()
+        return any(self.is_free_door(*door, taken=box) for door in doors + list(room.yield_generation_point()))
+
+    def add_room(self, center, entrance, is_spawn=False):
+        """
+        Planifie une nouvelle salle.
+        Une salle qui refermerait le donjon est retirée (16 fois au plus) jusqu'à laisser une porte vers une place libre.
+        """
+        for attempt in range(16):
+            room = self.make_room(center, entrance, is_spawn, attempt)
+            if self.is_open(room):
+                break
+        self.order[center] = len(self.order)
+        self.register(room, attempt)
+
+    def register(self, room:Room, attempt):
+        """Range une salle planifiée, sans garder ses blocs"""
+        center = room.center
+        if attempt:
+            self.attempts[center] = attempt
+        self.boxes[center] = room.bounds()
+        self.grid.add(room, self.boxes[center])
+        self.doors[center] = list(room.yield_generation_point())
+        room.steps = [] # les blocs seront recalculés s'il faut construire la salle
+        self.rooms[center] = room
+
+    def reopen(self):
+        """
+        Rouvre un donjon refermé : la dernière salle planifiée qui a une place libre derrière un de ses murs
+        est retirée jusqu'à y avoir une porte. Si elle était construite, elle est effacée puis reconstruite.
+        Renvoie False si aucune salle n'a de place libre autour d'elle.
+        """
+        for center in sorted(self.order, key=self.order.get, reverse=True):
+            room = self.rooms[center]
+            if room.type == 'spawn' or not any(self.is_free_door(*door) for door in room.yield_generation_point(room.pos_doors)):
+                continue
+            first = self.attempts.get(center, 0) + 1
+            for attempt in range(first, first + 64):
+                new_room = self.make_room(center, room.pos_entrance, attempt=attempt)
+                if any(self.is_free_door(*door) for door in new_room.yield_generation_point()):
+                    break
+            else:
+                continue
+            if center in self.built:
+                self.pending.append(self.evict_room(room))
+            self.grid.remove(room, self.boxes[center])
+            self.register(new_room, attempt)
+            print('Dungeon closed : room', center, 'redrawn.')
+            return True
+        return False
+
+    @staticmethod
+    def _near(center, positions, distance):
+        reach = distance * ROOM_SIZE + ROOM_SIZE//2
+        return any(abs(center[0]-x) <= reach and abs(center[2]-z) <= reach for x, _, z in positions)
 
-def evil_monologue():
+    def plan_near(self, positions):
+        """Planifie les salles jusqu'à une salle au-delà de celles à construire autour des joueurs"""
+        expanded = True
+        while expanded:
+            expanded = False
+            if not self.is_open():
+                expanded = self.reopen()
+            for center in list(self.doors):
+                if not self._near(center, positions, self.distance + 1):
+                    continue
+                while center in self.doors:
+                    door_pos, door_direction = self.doors[center].pop(0)
+                    if not self.doors[center]:
+                        del self.doors[center]
+                    if self.is_free_door(door_pos, door_direction):
+                        self.add_room(DungeonPlan.neighbour_center(door_pos, door_direction, ROOM_SIZE), door_pos)
+                        expanded = True
+
+    def build_room(self, room:Room):
+        """
+        Étapes de construction d'une salle, recalculée à partir de sa graine,
+        sans les blocs que remplacent les salles planifiées après elle et déjà construites.
+        """
+        steps = self.make_room(room.center, room.pos_entrance, room.type == 'spawn', self.attempts.get(room.center, 0)).steps
+        rank = self.order[room.center]
+        later = [op for other in self.grid.overlapping(self.boxes[room.center])
+                 if other.center in self.built and self.order[other.center] > rank
+                 for ops, _ in self.built[other.center] for op in ops]
+        self.built[room.center] = steps
+        compiled = []
+        for ops, delay in steps:
+            buffer = VoxelBuffer()
+            buffer.ops = list(ops)
+            compiled.append((f'{room.type} room {room.center}', buffer.compile(hidden=later), delay))
+        return compiled
+
+    def evict_room(self, room:Room):
+        """
+        Étape qui efface une salle : les blocs qu'elle a posés sont remplacés par de l'air, sauf ceux des salles
+        voisines encore construites, qui retrouvent ce qu'elles y avaient posé.
+        Le reste de sa boîte (le terrain sous ses fondations...) n'est pas touché : la salle reconstruite
+        ne repose que ses propres blocs, elle redevient donc identique. Le terrain qu'elle avait remplacé reste de l'air.
+        """
+        box = self.boxes[room.center]
+        steps = self.built.pop(room.center)
+        buffer = VoxelBuffer()
+        buffer.ops = [op[:6] + (block.AIR.id, 0) for ops, _ in steps for op in ops]
+        neighbours = sorted((other for other in self.grid.overlapping(box) if other.center in self.built),
+                            key=lambda other: self.order[other.center])
+        for other in neighbours:
+            for ops, _ in self.built[other.center]:
+                buffer.ops.extend(clip(ops, box))
+        return (f'evicted {room.type} room {room.center}', buffer.compile(), 0)
+
+    def update(self, positions):
+        """Planifie, construit et efface les salles selon la position des joueurs. Renvoie le nombre de salles modifiées."""
+        if not positions:
+            return 0
+        self.plan_near(positions)
+        steps, self.pending = self.pending, []
+        evicted = [self.rooms[center] for center in self.built if not self._near(center, positions, self.evict_distance)]
+        for room in evicted:
+            steps.append(self.evict_room(room))
+        near = [room for room in self.grid.overlapping(self.area(positions)) if room.center not in self.built
+                and self._near(room.center, positions, self.distance)]
+        for room in sorted(near, key=lambda room: self.order[room.center]):
+            steps.extend(self.build_room(room))
+        if not steps:
+            return 0
+        with self.mc.conn.pipeline(): # seulement pour ce fil : le monologue n'attend pas la fin de la construction
+            self.builder.build_steps(steps, compiled=True)
+        print(f'{len(near)} rooms built, {len(evicted)} rooms evicted ({len(self.built)} built, {len(self.rooms)} planned).')
+        return len(near) + len(evicted)
+
+    def area(self, positions):
+        """Boîte qui contient les salles à construire autour de tous les joueurs"""
+        reach = self.distance * ROOM_SIZE + ROOM_SIZE//2
+        return (min(x for x, _, _ in positions) - reach, min(y for _, y, _ in positions) - ROOM_SIZE,
+                min(z for _, _, z in positions) - reach, max(x for x, _, _ in positions) + reach,
+                max(y for _, y, _ in positions) + ROOM_SIZE, max(z for _, _, z in positions) + reach)
+
+    def player_positions(self):
+        """Position de tous les joueurs connectés, toutes les demandes envoyées d'un coup"""
+        replies = [self.mc.entity.getTilePosAsync(id) for id in self.mc.getPlayerEntityIds()]
+        return [tuple(reply.result()) for reply in replies]
+
+    def run(self):
+        interval = self.min_interval
+        last = None
+        try:
+            while not self.stopped.is_set():
+                positions = self.player_positions()
+                if self.update(positions) or positions != last:
+                    interval = self.min_interval
+                else:
+                    interval = min(interval * 2, self.max_interval)
+                last = positions
+                self.stopped.wait(interval)
+        except (OSError, RequestError):
+            print('Endless dungeon stopped : connection lost.')
+        finally:
+            save_stats(self.mc)
+
+    def stop(self):
+        """Arrête la construction du donjon"""
+        self.stopped.set()
+
+
+def clip(ops, box):
+    """Morceaux des pavés (x0, y0, z0, x1, y1, z1, id, data) qui sont dans la boîte (x0, y0, z0, x1, y1, z1)"""
+    bx0, by0, bz0, bx1, by1, bz1 = box
+    clipped = []
+    for x0, y0, z0, x1, y1, z1, id, data in ops:
+        x0, y0, z0 = max(x0, bx0), max(y0, by0), max(z0, bz0)
+        x1, y1, z1 = min(x1, bx1), min(y1, by1), min(z1, bz1)
+        if x0 <= x1 and y0 <= y1 and z0 <= z1:
+            clipped.append((x0, y0, z0, x1, y1, z1, id, data))
+    return clipped
+
+
+def evil_monologue(mc, donjon_name):
     """
     Tout bon donjon commence par un bon vieux monologue typique du maître du donjon qui se moque de ses victimes, pas vrai ?
+    Le monologue (voir monologue.py) est joué en arrière-plan : la fonction renvoie la Timeline tout de suite.
     """
     print('staring monologue')
-    mc.postToChat(f"(evil deep voice) Vous voila. pauvre mortel. enferme dans {DONJON_NAME} ! Piege dans mon terrible donjon !")
-    time.sleep(7)
-    mc.postToChat("(evil Gandalf voice) Vous. n'en. sortirez. PAAAS !")
-    time.sleep(6.5)
-    mc.postToChat("(evil laugh) MUAHAHAHAHAHAHAHAHAHAHAHAHAHAHAHAHAHAHAH !")
-    time.sleep(15)
-    mc.postToChat("(evil deep voice) Et vous savez pourquoi vous etes enferme ici, entoure de dangers ?")
-    time.sleep(8)
-    mc.postToChat(f"Parce que c'est rigolo ! C'est fun. C'est amusant. les donjons et les aventuriers qui risquent leur vie.")
-    time.sleep(7)
-    mc.postToChat("Amusez-vous bien MUAHAHAHAHAHA.")
-    time.sleep(35)
-    mc.postToChat("Vous etes toujours vivant ??")
-    time.sleep(7)
-    mc.postToChat("D'ailleurs. vous savez ce qu'il y a de bien avec ce monde ?")
-    time.sleep(8)
-    mc.postToChat("Les aventuriers comme vous reapparaissent apres leur mort.")
-    time.sleep(6.5)
-    mc.postToChat("Ce qui me permet de les tuer plein de fois et de pleins de facons differentes.")
-    time.sleep(35)
-    mc.postToChat("Au fait. desole pour les salles vides hein.")
-    time.sleep(6.5)
-    mc.postToChat("Il y a eu une greve des monstres recemment.")
-    time.sleep(6.5)
-    mc.postToChat("Ils exigent des garanties lors de blessures ou mort causees par les pieges du donjon ...")
-    time.sleep(6.5)
-    mc.postToChat("Quand meme. les propres pieges de mon donjon ! Ils pourraient faire attention a ou ils marchent.")
-    time.sleep(15)
-    mc.postToChat("Tiens. ca me fait penser que vous devez trouver les pieges un peu redondants.")
-    time.sleep(6.5)
-    mc.postToChat("Je suis d'accord. J'ai eu pleeiinns d'idees tres amusantes. mais...")
-    time.sleep(6.5)
-    mc.postToChat("Vous etes arrives avant que je finisse.")
-    time.sleep(7)
-    mc.postToChat("Dommage pour vous.")
-    time.sleep(45)
-    mc.postToChat("Vous. Vous etes pas bien bavard hein ?")
-    time.sleep(7)
-    mc.postToChat("J'en ai connu des qui criaient a la moindre occasion.")
-    time.sleep(10)
-    mc.postToChat("Enfin. vous au moins vous visitez. Ca fait plaisir de voir qu'on respecte mon travail.")
-    time.sleep(7)
-    mc.postToChat("La plupart des autres se suicident ou meurent betement sans avoir vu la moitie des salles.")
-    time.sleep(6.5)
-    mc.postToChat("Il y en a meme un qui est mort juste devant la sortie. Quel dommage MUAHAHAAHA.")
-    time.sleep(8)
-    mc.postToChat("Euh... Je veux dire. non. bien sur que non il n'y a pas de sortie.")
-    time.sleep(35)
-    mc.postToChat("Oh. je ne sais pas si vous avez ouvert un coffre ?")
-    time.sleep(6.5)
-    mc.postToChat("Vous etes decu hein ?")
-    time.sleep(6.5)
-    mc.postToChat("Vos collegues aventuriers ont tout pris.")
-    time.sleep(6.5)
-    mc.postToChat("Ca coute cher de refournir le donjon a chaque fois.")
-    time.sleep(6.5)
-    mc.postToChat("Et cette annee on est en budget limite.")
-    time.sleep(7)
-    mc.postToChat("C'est bien triste.")
-    time.sleep(40) # mauvaise blague, désolé.
-    mc.postToChat("Zut. j'ai pas scale la pression dans tout le donjon...")
-    time.sleep(6.5)
-    mc.postToChat("Certaines salles ont un peu plus de Pascales que les autres.")
-    time.sleep(9)
-    mc.postToChat("Quoi ? Pourquoi vous faites cette tete ?")
-    time.sleep(6.5)
-    mc.postToChat("Vous vous appelez Pascale peut-etre ?")
-    time.sleep(8)
-    mc.postToChat("Je... euh... desole.")
-    time.sleep(7)
-    mc.postToChat("Vous savez. j'ai pas de nom moi.")
-    time.sleep(6.5)
-    mc.postToChat("Je suis juste le mechant du donjon.")
-    time.sleep(6.5)
-    mc.postToChat("Personne ne me connais.")
-    time.sleep(7)
-    mc.postToChat("Ceux qui connaissent l'existance du donjon me craignent et font de moi un monstre sanguinaire.")
-    time.sleep(6.5)
-    mc.postToChat("Alors que je suis juste un demon.")
-    time.sleep(7)
-    mc.postToChat("Les seuls comme vous avec qui je peux discuter un peu ne ressortent jamais.")
-    time.sleep(8)
-    mc.postToChat("D'un autre cote. les pieges et les aventuriers coinces dans des donjon sont tellement amusants !")
-    time.sleep(8)
-    mc.postToChat("Le Maitre du Donjon s'amuse et amuse ses victimes... non je veux dire ses joueurs... au prix de sa solitude.")
-    time.sleep(7)
-    mc.postToChat("C'est le seul à connaitre vraiment les regles. C'est lui qui les invente. Et il les subit.")
-
-def test_room():
+    events = [(offset, message.format(donjon_name=donjon_name)) for offset, message in EVIL_MONOLOGUE]
+    timeline = Timeline(events, mc.postToChat)
+    timeline.start()
+    return timeline
+
+def test_room(mc):
     """programme de test des salles"""
     x, y, z = mc.player.getTilePos()
     y -= 1
     room = Room((x, y, z), 20, 8, 20, (x-10, y, z))
     room.generate()
+    Builder(mc).build_room(room)
     mc.setBlock(x, y, z, block.BEDROCK)
 
-def main():
-    """programme principal. Génère un donjon là où se trouve le joueur."""
+def load_or_plan(x, y, z, seed, cache=True):
+    """
+    Renvoie les étapes du donjon de graine seed autour de (x, y, z), et si elles sont déjà regroupées en pavés.
+    Avec PLAN_CACHE_DIR, un donjon déjà généré est relu sur le disque au lieu d'être recalculé.
+    cache : False pour une graine tirée au hasard, dont le donjon ne sera sans doute jamais redemandé (rien n'est lu ni écrit)
+    """
+    if not PLAN_CACHE_DIR or not cache:
+        plan = DungeonPlan(x, y, z, DUNGEON_SIZE, seed=seed, order=DUNGEON_ORDER)
+        plan.generate()
+        return plan.steps, False
+    key = plan_cache.plan_key(seed, DUNGEON_SIZE, ROOM_SIZE, DUNGEON_ORDER,
+                              (WALL_BLOCK, FLOOR_BLOCK, ROOF_BLOCK, WOOD_BLOCK))
+    steps = plan_cache.load_plan(PLAN_CACHE_DIR, key, (x, y, z))
+    if steps is not None:
+        print('DONE : Dungeon loaded from the plan cache.')
+        return steps, True
+    plan = DungeonPlan(x, y, z, DUNGEON_SIZE, seed=seed, order=DUNGEON_ORDER)
+    plan.generate()
+    buffer = VoxelBuffer()
+    steps = []
+    for name, ops, delay in plan.steps:
+        buffer.ops = list(ops)
+        steps.append((name, buffer.compile(), delay))
+    plan_cache.save_plan(PLAN_CACHE_DIR, key, (x, y, z), steps)
+    return steps, True
+
+def load_or_save(x, y, z, seed):
+    """
+    Renvoie le donjon enregistré dans DUNGEON_SAVE_FILE (voir dungeon_save.py).
+    S'il n'existe pas encore, le donjon de graine seed est planifié autour de (x, y, z) puis enregistré.
+    """
+    if os.path.exists(DUNGEON_SAVE_FILE):
+        saved = dungeon_save.load_dungeon(DUNGEON_SAVE_FILE)
+        print('DONE : Dungeon loaded from', DUNGEON_SAVE_FILE)
+        return saved
+    plan = DungeonPlan(x, y, z, DUNGEON_SIZE, seed=seed, order=DUNGEON_ORDER)
+    plan.generate()
+    dungeon_save.save_dungeon(DUNGEON_SAVE_FILE, plan)
+    print('Dungeon saved in', DUNGEON_SAVE_FILE)
+    return dungeon_save.load_dungeon(DUNGEON_SAVE_FILE)
+
+def underground_origin(x, y, z, steps):
+    """
+    Renvoie le centre de la salle d'apparition pour que le donjon (ses étapes, planifiées autour de (x, y, z))
+    soit entièrement creusé dans la roche pleine la plus proche, sans déboucher sur une grotte, de la lave ou la surface.
+    La roche est cherchée dans les fichiers de région de UNDERGROUND_WORLD (voir mcpi/anvil.py), sans interroger le serveur.
+    Renvoie (x, y, z) si aucun volume assez grand n'est trouvé à moins de UNDERGROUND_RADIUS blocs.
+    """
+    ops = [op for _, step_ops, _ in steps for op in step_ops]
+    x0, y0, z0 = min(op[0] for op in ops), min(op[1] for op in ops), min(op[2] for op in ops)
+    x1, y1, z1 = max(op[3] for op in ops), max(op[4] for op in ops), max(op[5] for op in ops)
+    with AnvilReader(UNDERGROUND_WORLD) as reader:
+        corner = reader.findSolidVolume((x1-x0+1, y1-y0+1, z1-z0+1), (x, y, z), radius=UNDERGROUND_RADIUS)
+    if corner is None:
+        print('No solid rock big enough for the dungeon : built where the player stands.')
+        return x, y, z
+    return (x + corner[0]-x0, y + corner[1]-y0, z + corner[2]-z0)
+
+def pour_lava(world, box):
+    """
+    Pose, sous chaque bloc de lave de box (x0, y0, z0, x1, y1, z1, ...), la colonne de lave tombante
+    qui s'en serait écoulée jusqu'au premier bloc qui n'est pas de l'air.
+    """
+    x0, y0, z0, x1, y1, z1 = box[:6]
+    for x in range(min(x0, x1), max(x0, x1)+1):
+        for z in range(min(z0, z1), max(z0, z1)+1):
+            for y in range(min(y0, y1), max(y0, y1)+1):
+                if world.getBlock(x, y, z) != block.LAVA.id:
+                    continue
+                bottom = y - 1
+                while world.getBlock(x, bottom, z) == block.AIR.id:
+                    bottom -= 1
+                if bottom < y - 1:
+                    world.setBlocks(x, bottom+1, z, x, y-1, z, block.LAVA.id, 8) # donnée 8 : lave qui tombe
+
+def install_offline(world_dir, seed, x, y, z, cache=True):
+    """
+    Pose le donjon de graine seed directement dans les fichiers de région d'un monde arrêté (voir mcpi/anvil.py),
+    sans passer par le serveur. Le serveur doit être éteint, puis relancé une fois le donjon posé.
+    (x, y, z) : centre de la salle d'apparition, en coordonnées mcpi (relatives au point d'apparition du monde).
+    cache : passe par le cache des plans (voir load_or_plan)
+
+    Hors ligne, rien ne coule : une étape différée (le plafond refermé au-dessus d'une chute de lave) est posée
+    tout de suite, précédée de la lave qui se serait écoulée pendant son délai (voir pour_lava).
+    Le monde reçoit donc le résultat de la construction en ligne : la chute de lave sous le plafond refermé.
+    Aucune mise à jour n'est prévue (TileTicks) : cette lave reste en place tant qu'aucun bloc voisin ne change.
+    L'étalement de la lave sur le sol n'est pas reproduit.
+    """
+    steps, _ = load_or_plan(x, y, z, seed, cache)
+    world = AnvilWorld(world_dir)
+    try:
+        for name, ops, delay in steps:
+            for op in ops:
+                if delay:
+                    pour_lava(world, op)
+                world.setBlocks(*op)
+        chunks = world.save()
+    finally:
+        world.close()
+    print(f'DONE : Dungeon installed in {world_dir} ({chunks} chunks written, {world.created} created).')
+
+def main(seed=None):
+    """
+    programme principal. Génère un donjon là où se trouve le joueur.
+    seed : graine du donjon (DUNGEON_SEED par défaut, tirée au hasard sinon). La même graine donne le même donjon.
+    Renvoie dès que le donjon est construit, avec la Timeline du monologue qui continue en arrière-plan (ou None).
+    """
+    cache = seed is not None or DUNGEON_SEED is not None # un donjon tiré au hasard n'est pas mis en cache
+    if seed is None:
+        seed = DUNGEON_SEED if DUNGEON_SEED is not None else random.randrange(2**32)
+    print('Dungeon seed :', seed)
+    donjon_name = random.Random(seed).choice(DONJON_NAME_LIST)
+    mc = connect()
+    if STATS_FILE:
+        mc.enableStats()
     x, y, z = mc.player.getTilePos()
     y -= 1
-    mc.postToChat('[INFO] The dungeon is generating. Please wait (it can take some time).')
-    dungeon = Dungeon(x, y, z, DUNGEON_SIZE)
-    dungeon.generate()
+    streamer = None
+    if ENDLESS:
+        streamer = EndlessDungeon(mc, x, y, z, seed, STREAM_DISTANCE, EVICT_DISTANCE)
+        streamer.update([(x, y, z)]) # la salle d'apparition et ses voisines, avant de rendre la main au joueur
+        streamer.start()
+        print('DONE : Endless dungeon streaming.')
+    elif STREAMING:
+        plan = DungeonPlan(x, y, z, DUNGEON_SIZE, seed=seed, order=DUNGEON_ORDER)
+        plan.generate()
+        streamer = Streamer(mc, plan, STREAM_DISTANCE)
+        # seulement la salle d'apparition et ses voisines avant de rendre la main au joueur,
+        # les autres salles jusqu'à STREAM_DISTANCE sont construites en arrière-plan
+        streamer.build_near(x, y, z, distance=min(1, STREAM_DISTANCE))
+        streamer.start()
+        print('DONE : Dungeon streaming.')
+    elif DUNGEON_SAVE_FILE:
+        mc.postToChat('[INFO] The dungeon is generating. Please wait (it can take some time).')
+        saved = load_or_save(x, y, z, seed)
+        x, y, z = saved.origin # une arène enregistrée est remise à zéro là où elle a été générée
+        if saved.seed is not None:
+            donjon_name = random.Random(saved.seed).choice(DONJON_NAME_LIST)
+        saved.rebuild(mc)
+    else:
+        mc.postToChat('[INFO] The dungeon is generating. Please wait (it can take some time).')
+        steps, compiled = load_or_plan(x, y, z, seed, cache)
+        if UNDERGROUND_WORLD:
+            position = underground_origin(x, y, z, steps)
+            if position != (x, y, z):
+                x, y, z = position
+                steps, compiled = load_or_plan(x, y, z, seed, cache) # le plan est le même, décalé
+                print('Dungeon moved underground, spawn room at', position)
+        with mc.conn.pipeline(): # les commandes sont envoyées par paquets pendant la construction
+            Builder(mc).build_steps(steps, compiled)
+        print('DONE : Dungeon generated.')
     mc.player.setPos(x, y+1, z)
-    if not SKIP_MONOLOGUE:
-        evil_monologue()
+    timeline = None if SKIP_MONOLOGUE else evil_monologue(mc, donjon_name)
+    if streamer is None:
+        save_stats(mc) # sinon, quand la construction en arrière-plan s'arrête (voir Streamer.run)
+    if RECORD_FILE:
+        if timeline is not None:
+            timeline.join() # le monologue est enregistré lui aussi
+        if streamer is not None:
+            streamer.stop() # les salles pas encore construites ne sont pas enregistrées
+            streamer.join()
+        mc.conn.close()
+        print('Session recorded in', RECORD_FILE)
+    return timeline
 
-main()
\ No newline at end of file
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Génère un donjon là où se trouve le joueur.')
+    parser.add_argument('--seed', type=int, default=None, help='graine du donjon (DUNGEON_SEED par défaut)')
+    parser.add_argument('--offline', metavar='MONDE', default=None,
+                        help='pose le donjon directement dans le dossier du monde (ex : ../Bukkit/world), serveur éteint')
+    parser.add_argument('--at', metavar=('X', 'Y', 'Z'), type=int, nargs=3, default=(0, -1, 0),
+                        help="avec --offline, centre de la salle d'apparition (0 -1 0 par défaut : au point d'apparition du monde)")
+    args = parser.parse_args()
+    if args.offline:
+        cache = args.seed is not None or DUNGEON_SEED is not None
+        seed = args.seed if args.seed is not None else DUNGEON_SEED if DUNGEON_SEED is not None else random.randrange(2**32)
+        print('Dungeon seed :', seed)
+        install_offline(args.offline, seed, *args.at, cache=cache)
+    else:
+        main(args.seed)
\ No newline at end of file
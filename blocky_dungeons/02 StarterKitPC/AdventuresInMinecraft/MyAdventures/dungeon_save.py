@@ -0,0 +1,236 @@
+'''
+Sauvegarde binaire compacte d'un donjon de BLOCKY DUNGEONS.
+
+Un donjon généré n'existe que dans le monde. Ce fichier le garde sous une forme compacte :
+- la table des salles (centre, type, thème, tags, niveau, portes ouvertes), une ligne de taille fixe par salle ;
+- en option, les blocs posés par le donjon, déjà regroupés en pavés (voir mcpi/voxel.py) et compressés.
+
+Relire un donjon ne prend que quelques millisecondes, et rebuild() le reconstruit sans le replanifier
+ni le recompiler : une arène se remet à zéro entre deux parties bien plus vite qu'en la régénérant.
+
+Exemple :
+    save_dungeon('arene.bdsave', plan)            # plan : DungeonPlan déjà généré
+    saved = load_dungeon('arene.bdsave')
+    saved.rooms[0].type                           # 'spawn'
+    saved.rebuild(mc)                             # au même endroit, ou saved.rebuild(mc, (x, y, z))
+
+Fichier (petit-boutiste) :
+    en-tête HEADER, puis une ligne ROOM par salle, relative à l'origine (centre de la salle d'apparition)
+    avec les blocs : une ligne STEP par étape, puis la longueur et les pavés compressés par zlib
+    (8 entiers de 32 bits par pavé : x0, y0, z0, x1, y1, z1 relatifs à l'origine, id, data)
+'''
+
+import array
+import os
+import struct
+import sys
+import zlib
+from mcpi.voxel import VoxelBuffer
+from scheduler import TimerWheel
+
+MAGIC = b'BDSV'
+SAVE_VERSION = 1 # à augmenter dès que le format change
+
+HAS_SEED = 1
+HAS_VOXELS = 2
+
+HEADER = struct.Struct('<4sHHiiiqII') # magic, version, drapeaux, origine, graine, nombre de salles, nombre d'étapes
+ROOM = struct.Struct('<iiiBBBBBBBBB') # centre, largeur, hauteur, profondeur, type, thème, tags, niveau, portes ouvertes, entrée
+STEP = struct.Struct('<iBfI') # salle (-1 : aucune), nature, délai, nombre de pavés
+LENGTH = struct.Struct('<I')
+
+# codes des valeurs enregistrées : l'indice dans ces tuples
+TYPES = ('spawn', 'normal', 'bridge', 'boss')
+THEMES = ('winter', 'hell', 'forest')
+TAGS = ('monster', 'trap', 'treasure', 'locked', 'one exit', 'special') # un bit par tag
+DOORS = ('+x', '-x', '+z', '-z') # un bit par porte, dans l'ordre de Room.pos_doors
+
+ROOM_STEP = 0 # blocs de la salle
+END_STEP = 1 # portes d'une salle de fin refermées (voir DungeonPlan.turn_to_end_room)
+
+
+class SavedRoom:
+    '''
+    Ligne de la table des salles.
+    center, doors et entrance sont en coordonnées absolues ; doors : portes ouvertes, entrée comprise.
+    '''
+    __slots__ = ('center', 'width', 'height', 'depth', 'type', 'theme', 'tags', 'level', 'doors', 'entrance')
+
+    def __init__(self, center, width, height, depth, type, theme, tags, level, doors, entrance):
+        self.center = center
+        self.width = width
+        self.height = height
+        self.depth = depth
+        self.type = type
+        self.theme = theme
+        self.tags = tags
+        self.level = level
+        self.doors = doors
+        self.entrance = entrance
+
+    def __repr__(self):
+        return f'SavedRoom({self.type} {self.theme} {self.tags} level {self.level} at {self.center})'
+
+
+def _door_direction(center, door):
+    """Côté de la salle où se trouve une porte"""
+    if door[0] > center[0]:
+        return '+x'
+    if door[0] < center[0]:
+        return '-x'
+    return '+z' if door[2] > center[2] else '-z'
+
+def _door_position(center, width, depth, direction):
+    x, y, z = center
+    return {'+x': (x+width//2, y, z), '-x': (x-width//2, y, z),
+            '+z': (x, y, z+depth//2), '-z': (x, y, z-depth//2)}[direction]
+
+def _pack_room(room, origin):
+    ox, oy, oz = origin
+    x, y, z = room.center
+    tags = ('special',) if room.tags == 'special' else room.tags
+    tag_bits = 0
+    for tag in tags:
+        tag_bits |= 1 << TAGS.index(tag)
+    door_bits = 0
+    for door in room.generation_points:
+        door_bits |= 1 << DOORS.index(_door_direction(room.center, door))
+    return ROOM.pack(x-ox, y-oy, z-oz, room.width, room.height, room.depth, TYPES.index(room.type),
+                     THEMES.index(room.theme), tag_bits, room.level, door_bits,
+                     DOORS.index(_door_direction(room.center, room.pos_entrance)))
+
+def _unpack_room(fields, origin):
+    dx, dy, dz, width, height, depth, type, theme, tag_bits, level, door_bits, entrance = fields
+    center = (origin[0]+dx, origin[1]+dy, origin[2]+dz)
+    tags = [tag for i, tag in enumerate(TAGS) if tag_bits >> i & 1]
+    doors = [_door_position(center, width, depth, direction) for i, direction in enumerate(DOORS) if door_bits >> i & 1]
+    return SavedRoom(center, width, height, depth, TYPES[type], THEMES[theme], 'special' if tags == ['special'] else tags,
+                     level, doors, _door_position(center, width, depth, DOORS[entrance]))
+
+
+class SavedDungeon:
+    '''
+    Donjon relu par load_dungeon.
+
+    - origin : centre de la salle d'apparition au moment de la sauvegarde
+    - seed : graine du donjon (None si elle n'a pas été enregistrée)
+    - rooms : table des salles (SavedRoom), dans l'ordre du plan
+    - steps : étapes de construction (nom, pavés relatifs à origin, délai), ou None sans les blocs
+    '''
+    def __init__(self, origin, seed, rooms, steps):
+        self.origin = origin
+        self.seed = seed
+        self.rooms = rooms
+        self.steps = steps
+
+    def steps_at(self, origin=None):
+        """Étapes de construction (nom, pavés, délai) replacées autour de origin (par défaut, l'origine sauvegardée)"""
+        if self.steps is None:
+            raise ValueError("Ce donjon a été sauvegardé sans ses blocs : il ne peut pas être reconstruit")
+        ox, oy, oz = self.origin if origin is None else origin
+        return [(name, [(x0+ox, y0+oy, z0+oz, x1+ox, y1+oy, z1+oz, id, data)
+                        for x0, y0, z0, x1, y1, z1, id, data in boxes], delay)
+                for name, boxes, delay in self.steps]
+
+    def rebuild(self, mc, origin=None):
+        """
+        Reconstruit le donjon autour de origin (par défaut, là où il a été sauvegardé).
+        Les pavés sont envoyés par paquets (mode pipeline de la connexion) ;
+        une étape avec un délai attend dans une roue temporelle sans bloquer les suivantes (voir scheduler.py).
+        Renvoie le nombre de commandes envoyées.
+        """
+        buffer = VoxelBuffer(mc)
+        wheel = TimerWheel()
+        with mc.conn.pipeline():
+            for name, boxes, delay in self.steps_at(origin):
+                if delay:
+                    mc.conn.flush() # le délai compte à partir du moment où les blocs précédents sont posés
+                    def deferred(boxes=boxes):
+                        buffer.send(boxes)
+                        mc.conn.flush() # aucune étape ne suit forcément : les blocs partent tout de suite
+                    wheel.schedule(delay, deferred)
+                else:
+                    buffer.send(boxes)
+                wheel.advance()
+            wheel.run()
+        print(f'DONE : Dungeon rebuilt ({len(self.rooms)} rooms, {buffer.sent} commands).')
+        return buffer.sent
+
+
+def save_dungeon(path, plan, seed=None, voxels=True):
+    """
+    Enregistre un DungeonPlan généré dans le fichier path.
+    seed : graine du donjon (par défaut, celle du plan)
+    voxels : enregistre aussi les blocs, regroupés en pavés, pour pouvoir reconstruire le donjon (voir SavedDungeon.rebuild)
+    """
+    origin = (plan.x, plan.y, plan.z)
+    if seed is None:
+        seed = plan.seed
+    flags = (HAS_SEED if seed is not None else 0) | (HAS_VOXELS if voxels else 0)
+    index = {room.center: i for i, room in enumerate(plan.rooms)}
+    owner = {}
+    for center, indices in plan.room_steps.items():
+        for i in indices:
+            owner[i] = index[center]
+    chunks = [HEADER.pack(MAGIC, SAVE_VERSION, flags, *origin, seed or 0,
+                          len(plan.rooms), len(plan.steps) if voxels else 0)]
+    chunks.extend(_pack_room(room, origin) for room in plan.rooms)
+    if voxels:
+        ox, oy, oz = origin
+        offset = (ox, oy, oz, ox, oy, oz, 0, 0)
+        flat = array.array('i')
+        buffer = VoxelBuffer()
+        for i, (name, ops, delay) in enumerate(plan.steps):
+            buffer.ops = list(ops)
+            boxes = buffer.compile()
+            for box in boxes:
+                flat.extend(v - o for v, o in zip(box, offset))
+            chunks.append(STEP.pack(owner.get(i, -1), END_STEP if name and name.startswith('end of room') else ROOM_STEP,
+                                    delay, len(boxes)))
+        if sys.byteorder == 'big':
+            flat.byteswap()
+        packed = zlib.compress(flat.tobytes(), 6)
+        chunks.append(LENGTH.pack(len(packed)))
+        chunks.append(packed)
+    with open(path + '.tmp', 'wb') as f:
+        f.write(b''.join(chunks))
+    os.replace(path + '.tmp', path) # une sauvegarde à moitié écrite n'est jamais relue
+
+def load_dungeon(path):
+    """Relit un donjon enregistré par save_dungeon => SavedDungeon"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic, version, flags, ox, oy, oz, seed, room_count, step_count = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"{path} n'est pas une sauvegarde de donjon")
+    if version != SAVE_VERSION:
+        raise ValueError(f"{path} : version {version} non prise en charge (attendue : {SAVE_VERSION})")
+    origin = (ox, oy, oz)
+    offset = HEADER.size
+    rooms = [_unpack_room(fields, origin) for fields in ROOM.iter_unpack(data[offset:offset + ROOM.size * room_count])]
+    offset += ROOM.size * room_count
+    steps = None
+    if flags & HAS_VOXELS:
+        table = list(STEP.iter_unpack(data[offset:offset + STEP.size * step_count]))
+        offset += STEP.size * step_count
+        length, = LENGTH.unpack_from(data, offset)
+        offset += LENGTH.size
+        flat = array.array('i')
+        flat.frombytes(zlib.decompress(data[offset:offset + length]))
+        if sys.byteorder == 'big':
+            flat.byteswap()
+        steps = []
+        start = 0
+        for room_index, kind, delay, count in table:
+            room = rooms[room_index] if room_index >= 0 else None
+            if room is None:
+                name = 'saved step'
+            elif kind == END_STEP:
+                name = f'end of room {room.center}'
+            else:
+                name = f'{room.type} room {room.center}'
+            end = start + 8 * count
+            boxes = [tuple(flat[i:i+8]) for i in range(start, end, 8)]
+            steps.append((name, boxes, delay))
+            start = end
+    return SavedDungeon(origin, seed if flags & HAS_SEED else None, rooms, steps)
@@ -6,14 +6,32 @@ import mcpi.block as block
 
 SKIP_MONOLOGUE = False
 
+SERVER_ADDRESS = "localhost"
+SERVER_PORT = 4711
+
 DUNGEON_SIZE = 10
 ROOM_SIZE = 21 # ce nombre doit être IMPAIR
+DUNGEON_ORDER = 'dfs'
+STREAMING = False # construit les salles au fur et à mesure que le joueur s'en approche, au lieu de tout construire au départ
+STREAM_DISTANCE = 2 # avec STREAMING ou ENDLESS, nombre de salles construites autour du joueur
+ENDLESS = False # donjon sans fin : les salles sont planifiées et construites autour des joueurs, sans limite de taille
+EVICT_DISTANCE = 5 # avec ENDLESS, les salles à plus de ce nombre de salles de tous les joueurs sont effacées (plus grand que STREAM_DISTANCE)
+DUNGEON_SEED = None # graine du donjon (un entier) : la même graine redonne le même donjon. None : un donjon différent à chaque fois
 
 WALL_BLOCK = block.COBBLESTONE
 FLOOR_BLOCK = block.STONE_BRICK
 ROOF_BLOCK = block.STONE
 WOOD_BLOCK = block.WOOD_PLANKS
 
+CONNECTIONS = 1 # nombre de connexions ouvertes vers le serveur. Plus de 1 (expérimental) : les salles sont construites en parallèle sur plusieurs connexions
+STATS_FILE = None # fichier .csv ou .json où enregistrer les statistiques des commandes envoyées (ex : 'stats.csv')
+RECORD_FILE = None # fichier où enregistrer toutes les commandes envoyées, pour les rejouer avec python -m mcpi.record replay <fichier>
+WORLD_CACHE = False # garde en mémoire les blocs posés pour ne pas les redemander au serveur
+DUNGEON_SAVE_FILE = None # fichier où enregistrer le donjon généré. S'il existe déjà, le donjon y est relu et reconstruit à l'identique, au même endroit (ex : 'arene.bdsave')
+UNDERGROUND_WORLD = None # dossier du monde du serveur (ex : '../Bukkit/world') : le donjon est creusé dans la roche pleine la plus proche du joueur. None : à ses pieds
+UNDERGROUND_RADIUS = 32 # avec UNDERGROUND_WORLD, distance maximale (en blocs) entre le joueur et le centre du donjon déplacé
+PLAN_CACHE_DIR = 'plan_cache' # dossier où garder les donjons déjà calculés, pour les reconstruire sans les recalculer (seulement ceux dont la graine est choisie : --seed ou DUNGEON_SEED). None : désactivé
+
 
 # DANGER ZONE : MODIFIER LES PARAMÈTRES SUIVANTS PEUT CAUSER DES BUGS (cf README.md)
 ROOM_WIDTH = ROOM_SIZE
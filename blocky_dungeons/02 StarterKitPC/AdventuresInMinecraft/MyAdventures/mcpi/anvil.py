@@ -0,0 +1,646 @@
+import array
+import mmap
+import os
+import struct
+import time
+import zlib
+from collections import OrderedDict
+from . import nbt
+from .block import Block
+from .minecraft import intFloor
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+""" Offline writer for Minecraft 1.6.4 worlds (Anvil region files)
+
+    AnvilWorld writes blocks straight into the region files of a stopped
+    world (world/region/r.X.Z.mca) instead of sending them to the server
+    one command at a time. It has the setBlock and setBlocks of
+    Minecraft, with the same coordinates as RaspberryJuice: relative to
+    the spawn point of the world. save() writes the modified chunks back.
+
+    Example:
+        world = AnvilWorld("Bukkit/world")
+        world.setBlocks(0, 0, 0, 10, 10, 10, block.STONE)
+        world.save()             # then start the server
+
+    The server must be stopped: a running server keeps the chunks it has
+    loaded in memory and would save them over the written ones. Opening
+    the world takes its session.lock, so a server still running stops
+    saving it instead of overwriting the changes.
+
+    On save, the height map and the light of the written chunks are
+    recomputed: sky light straight down from the height map (no sideways
+    spread), block light flooded from every light source of the written
+    sections. Tile entities (chest contents, signs...) and scheduled
+    block ticks inside the written cuboids are removed. Chunks that were
+    never generated are created empty: only the written blocks exist.
+
+    AnvilReader only reads: it maps the region files in memory and
+    decompresses the chunks a request touches, once. blocks() returns the
+    block ids of a cuboid as a NumPy array, findSolidVolume() the nearest
+    volume of solid rock (no cave, no liquid, no surface) of a given size.
+    It can read the world of a running server: it sees the blocks as they
+    were last saved. NumPy is only needed by AnvilReader.
+
+    Example:
+        reader = AnvilReader("Bukkit/world")
+        ids = reader.blocks(-10, 0, -10, 10, 20, 10)   # ids[y, x, z]
+        corner = reader.findSolidVolume((40, 20, 40), (0, 0, 0))
+"""
+
+SECTOR = 4096
+REGION_CHUNKS = 32
+SECTION_HEIGHT = 16
+WORLD_HEIGHT = 256
+
+# light emitted by a block id (Block.lightValue in 1.6.4)
+LIGHT_EMISSION = {10: 15, 11: 15, 39: 1, 50: 14, 51: 15, 62: 13, 74: 9, 76: 7, 89: 15, 90: 11, 91: 15,
+                  94: 9, 117: 1, 119: 15, 122: 1, 124: 15, 130: 7, 138: 15}
+# light lost when going through a block (Block.lightOpacity in 1.6.4), 255 for the other ids
+LIGHT_OPACITY = dict.fromkeys((0, 6, 20, 26, 27, 28, 29, 31, 32, 33, 34, 36, 37, 38, 39, 40, 50, 51, 52, 54, 55,
+                               59, 63, 64, 65, 66, 68, 69, 70, 71, 72, 75, 76, 77, 78, 81, 83, 85, 90, 92, 93,
+                               94, 96, 101, 102, 104, 105, 106, 107, 111, 113, 115, 116, 117, 118, 119, 120,
+                               122, 127, 130, 131, 132, 139, 140, 141, 142, 143, 144, 145, 146, 147, 148,
+                               149, 150, 151, 154, 157, 171), 0)
+LIGHT_OPACITY.update({8: 3, 9: 3, 18: 1, 30: 1, 79: 3})
+
+# light lost when entering a block, by id (at least 1, all of it for the blocks that stop light)
+_LIGHT_COST = bytes(max(1, min(LIGHT_OPACITY.get(id, 15), 15)) for id in range(256))
+_LOW = bytes(v & 15 for v in range(256))
+_HIGH = bytes(v >> 4 for v in range(256))
+_SHIFT = bytes(v << 4 & 255 for v in range(256))
+
+_HEADER = struct.Struct(">1024I")
+_CHUNK_HEADER = struct.Struct(">IB")
+ZLIB = 2
+
+def _opacity(id):
+    return LIGHT_OPACITY.get(id, 255)
+
+def _requireNumpy():
+    if numpy is None:
+        raise ImportError("numpy is required to read region files with AnvilReader")
+
+def _decodeChunk(data, path):
+    """Sectors of a chunk => root Compound"""
+    length, compression = _CHUNK_HEADER.unpack_from(data)
+    payload = data[5:4 + length]
+    if compression == ZLIB:
+        return nbt.loads(zlib.decompress(payload))
+    if compression == 1:
+        return nbt.loads(zlib.decompress(payload, 16 + zlib.MAX_WBITS))
+    raise ValueError("%s: unknown chunk compression %d" % (path, compression))
+
+def spawnPoint(worldDir):
+    """Spawn point of a world, read in its level.dat => (x, y, z): the mcpi (0, 0, 0) of RaspberryJuice"""
+    level = nbt.readFile(os.path.join(worldDir, "level.dat"))["Data"]
+    return (level["SpawnX"], level["SpawnY"], level["SpawnZ"])
+
+class Region:
+    """
+    A region file r.X.Z.mca: up to 32x32 chunks, each one stored as
+    zlib compressed NBT in whole 4 KB sectors after a two-sector header
+    """
+    def __init__(self, path, create=False):
+        self.path = path
+        if not os.path.exists(path):
+            if not create:
+                raise FileNotFoundError(path)
+            with open(path, "wb") as f:
+                f.write(bytes(2 * SECTOR))
+        self.file = open(path, "r+b")
+        header = self.file.read(2 * SECTOR)
+        if len(header) < 2 * SECTOR:
+            header += bytes(2 * SECTOR - len(header))
+        self.locations = list(_HEADER.unpack_from(header, 0))
+        self.timestamps = list(_HEADER.unpack_from(header, SECTOR))
+        self.file.seek(0, os.SEEK_END)
+        sectors = max(2, -(-self.file.tell() // SECTOR))
+        self.used = bytearray(sectors)
+        self.used[0] = self.used[1] = 1
+        for location in self.locations:
+            offset, count = location >> 8, location & 255
+            if location and offset + count <= sectors:
+                self.used[offset:offset + count] = b"\x01" * count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.file.close()
+
+    def hasChunk(self, x, z):
+        """Is the chunk x, z (0..31 inside the region) stored?"""
+        return self.locations[x + z * REGION_CHUNKS] != 0
+
+    def readChunk(self, x, z):
+        """Chunk x, z (0..31 inside the region) => root Compound, or None if it was never generated"""
+        location = self.locations[x + z * REGION_CHUNKS]
+        if not location:
+            return None
+        self.file.seek((location >> 8) * SECTOR)
+        return _decodeChunk(self.file.read((location & 255) * SECTOR), self.path)
+
+    def writeChunk(self, x, z, root):
+        """Stores the chunk x, z (0..31 inside the region), in its sectors if it still fits in them"""
+        payload = zlib.compress(nbt.dumps(root))
+        data = _CHUNK_HEADER.pack(len(payload) + 1, ZLIB) + payload
+        count = -(-len(data) // SECTOR)
+        if count > 255:
+            raise ValueError("chunk %d, %d is too large for a region file" % (x, z))
+        i = x + z * REGION_CHUNKS
+        location = self.locations[i]
+        offset, oldCount = location >> 8, location & 255
+        if not location or count > oldCount:
+            if location:
+                self.used[offset:offset + oldCount] = bytes(oldCount)
+            offset = self._allocate(count)
+        elif count < oldCount:
+            self.used[offset + count:offset + oldCount] = bytes(oldCount - count)
+        self.file.seek(offset * SECTOR)
+        self.file.write(data + bytes(count * SECTOR - len(data)))
+        self.locations[i] = offset << 8 | count
+        self.timestamps[i] = int(time.time())
+        self.file.seek(4 * i)
+        self.file.write(struct.pack(">I", self.locations[i]))
+        self.file.seek(SECTOR + 4 * i)
+        self.file.write(struct.pack(">I", self.timestamps[i]))
+
+    def _allocate(self, count):
+        """First run of count free sectors, at the end of the file if there is none"""
+        run = bytes(count)
+        offset = self.used.find(run, 2)
+        if offset < 0:
+            # the free sectors at the end of the file, if any, are reused
+            offset = len(self.used.rstrip(b"\x00"))
+        if offset + count > len(self.used):
+            self.used.extend(bytes(offset + count - len(self.used)))
+        self.used[offset:offset + count] = b"\x01" * count
+        return offset
+
+def _nibbleFill(array, start, n, value):
+    """Sets n nibbles of a nibble array from the nibble index start"""
+    end = start + n
+    if start & 1 and start < end:
+        array[start >> 1] = (array[start >> 1] & 0x0f) | value << 4
+        start += 1
+    if end & 1 and start < end:
+        array[end >> 1] = (array[end >> 1] & 0xf0) | value
+        end -= 1
+    if start < end:
+        array[start >> 1:end >> 1] = bytes((value | value << 4,)) * ((end - start) >> 1)
+
+def _nibble(array, i):
+    return array[i >> 1] >> 4 if i & 1 else array[i >> 1] & 15
+
+def _unpackNibbles(packed):
+    """2048 bytes of nibbles => bytearray of the 4096 values"""
+    values = bytearray(4096)
+    values[0::2] = packed.translate(_LOW)
+    values[1::2] = packed.translate(_HIGH)
+    return values
+
+def _packNibbles(values):
+    """bytearray of 4096 values (0..15) => 2048 bytes of nibbles"""
+    low = int.from_bytes(values[0::2], "big")
+    high = int.from_bytes(values[1::2].translate(_SHIFT), "big")
+    return (low | high).to_bytes(2048, "big")
+
+class _Chunk:
+    """A chunk being edited: its NBT and its sections by height (0..15)"""
+    def __init__(self, root, x, z):
+        self.root = root
+        self.x = x
+        self.z = z
+        self.level = root["Level"]
+        self.sections = {section["Y"]: section for section in self.level["Sections"]}
+        self.boxes = []            # written cuboids, inside this chunk
+        self.touched = set()       # heights of the written sections
+
+    @staticmethod
+    def create(x, z):
+        """Empty chunk, for a chunk that was never generated"""
+        level = nbt.Compound()
+        level.set("xPos", nbt.TAG_INT, x)
+        level.set("zPos", nbt.TAG_INT, z)
+        level.set("LastUpdate", nbt.TAG_LONG, 0)
+        level.set("TerrainPopulated", nbt.TAG_BYTE, 1)
+        level.set("InhabitedTime", nbt.TAG_LONG, 0)
+        level.set("Biomes", nbt.TAG_BYTE_ARRAY, bytearray(b"\xff" * 256)) # computed again by the server
+        level.set("HeightMap", nbt.TAG_INT_ARRAY, array.array("i", bytes(4 * 256)))
+        level.set("Sections", nbt.TAG_LIST, nbt.List(nbt.TAG_COMPOUND))
+        level.set("Entities", nbt.TAG_LIST, nbt.List(nbt.TAG_COMPOUND))
+        level.set("TileEntities", nbt.TAG_LIST, nbt.List(nbt.TAG_COMPOUND))
+        root = nbt.Compound()
+        root.set("Level", nbt.TAG_COMPOUND, level)
+        root.name = ""
+        return _Chunk(root, x, z)
+
+    def section(self, y, create=False):
+        section = self.sections.get(y)
+        if section is None and create:
+            section = nbt.Compound()
+            section.set("Y", nbt.TAG_BYTE, y)
+            section.set("Blocks", nbt.TAG_BYTE_ARRAY, bytearray(4096))
+            section.set("Data", nbt.TAG_BYTE_ARRAY, bytearray(2048))
+            section.set("BlockLight", nbt.TAG_BYTE_ARRAY, bytearray(2048))
+            section.set("SkyLight", nbt.TAG_BYTE_ARRAY, bytearray(b"\xff" * 2048))
+            self.sections[y] = section
+            self.level["Sections"].append(section)
+        return section
+
+    def fill(self, x0, y0, z0, x1, y1, z1, id, data):
+        """Sets a cuboid of blocks, in coordinates inside the chunk"""
+        n = x1 - x0 + 1
+        low = bytes((id & 255,)) * n
+        self.boxes.append((x0, y0, z0, x1, y1, z1))
+        for sy in range(y0 >> 4, (y1 >> 4) + 1):
+            section = self.section(sy, create=id != 0)
+            if section is None:
+                continue # air in a section that does not exist yet
+            self.touched.add(sy)
+            blocks, nibbles = section["Blocks"], section["Data"]
+            add = section.get("Add")
+            if add is None and id > 255:
+                add = bytearray(2048)
+                section.set("Add", nbt.TAG_BYTE_ARRAY, add)
+            for y in range(max(y0, sy * 16), min(y1, sy * 16 + 15) + 1):
+                for z in range(z0, z1 + 1):
+                    i = (y & 15) << 8 | z << 4 | x0
+                    blocks[i:i + n] = low
+                    _nibbleFill(nibbles, i, n, data)
+                    if add is not None:
+                        _nibbleFill(add, i, n, id >> 8)
+
+    def get(self, x, y, z):
+        """Block at coordinates inside the chunk => (id, data)"""
+        section = self.sections.get(y >> 4)
+        if section is None:
+            return 0, 0
+        i = (y & 15) << 8 | z << 4 | x
+        add = section.get("Add")
+        id = section["Blocks"][i] | (_nibble(add, i) << 8 if add is not None else 0)
+        return id, _nibble(section["Data"], i)
+
+    def forget(self):
+        """Removes the tile entities and scheduled ticks inside the written cuboids"""
+        bx, bz = self.x * 16, self.z * 16
+        def written(entry):
+            x, y, z = entry["x"] - bx, entry["y"], entry["z"] - bz
+            return any(x0 <= x <= x1 and y0 <= y <= y1 and z0 <= z <= z1 for x0, y0, z0, x1, y1, z1 in self.boxes)
+        for name in ("TileEntities", "TileTicks"):
+            entries = self.level.get(name)
+            if entries:
+                entries[:] = [entry for entry in entries if not written(entry)]
+
+    def updateHeightMap(self):
+        """Height map: for each column, the height above its highest block that stops light"""
+        heights = self.level["HeightMap"]
+        top = sorted(self.sections, reverse=True)
+        for column in range(256):
+            height = 0
+            for sy in top:
+                blocks = self.sections[sy]["Blocks"]
+                add = self.sections[sy].get("Add")
+                for y in range(15, -1, -1):
+                    i = y << 8 | column
+                    id = blocks[i] | (_nibble(add, i) << 8 if add is not None else 0)
+                    if id and _opacity(id):
+                        height = sy * 16 + y + 1
+                        break
+                if height:
+                    break
+            heights[column] = height
+
+    def updateSkyLight(self):
+        """Sky light of the written sections: full above the height map, none below"""
+        heights = self.level["HeightMap"]
+        for sy in self.touched:
+            skylight = self.sections[sy]["SkyLight"]
+            for y in range(16):
+                level = sy * 16 + y
+                layer = bytearray(128)
+                for column in range(0, 256, 2):
+                    low = 15 if level >= heights[column] else 0
+                    high = 15 if level >= heights[column + 1] else 0
+                    layer[column >> 1] = low | high << 4
+                skylight[y << 7:(y + 1) << 7] = layer
+
+class AnvilWorld:
+    """
+    Blocks of a stopped Minecraft 1.6.4 world, written directly in its
+    region files. origin: absolute position of the mcpi (0, 0, 0), the
+    spawn point of the world by default, like RaspberryJuice.
+    """
+    def __init__(self, worldDir, origin=None, lock=True):
+        self.worldDir = worldDir
+        self.regionDir = os.path.join(worldDir, "region")
+        self.origin = tuple(origin) if origin is not None else spawnPoint(worldDir)
+        if lock:
+            # a server still running this world notices the lock changed and stops saving it
+            with open(os.path.join(worldDir, "session.lock"), "wb") as f:
+                f.write(struct.pack(">q", int(time.time() * 1000)))
+        self.regions = {}
+        self.chunks = {}
+        self.created = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _region(self, rx, rz, create=False):
+        region = self.regions.get((rx, rz))
+        if region is None:
+            path = os.path.join(self.regionDir, "r.%d.%d.mca" % (rx, rz))
+            if not create and not os.path.exists(path):
+                return None
+            os.makedirs(self.regionDir, exist_ok=True)
+            region = self.regions[(rx, rz)] = Region(path, create=True)
+        return region
+
+    def _chunk(self, cx, cz, create=False):
+        chunk = self.chunks.get((cx, cz))
+        if chunk is None:
+            region = self._region(cx >> 5, cz >> 5, create)
+            root = region.readChunk(cx & 31, cz & 31) if region is not None else None
+            if root is not None:
+                chunk = _Chunk(root, cx, cz)
+            elif create:
+                chunk = _Chunk.create(cx, cz)
+                self.created += 1
+            else:
+                return None
+            self.chunks[(cx, cz)] = chunk
+        return chunk
+
+    def setBlock(self, *args):
+        """Set block (x,y,z,id,[data])"""
+        args = intFloor(args)
+        x, y, z, id = args[:4]
+        data = args[4] if len(args) > 4 else 0
+        self.setBlocks(x, y, z, x, y, z, id, data)
+
+    def setBlocks(self, *args):
+        """Set a cuboid of blocks (x0,y0,z0,x1,y1,z1,id,[data])"""
+        args = intFloor(args)
+        ox, oy, oz = self.origin
+        x0, x1 = sorted((args[0] + ox, args[3] + ox))
+        y0, y1 = sorted((args[1] + oy, args[4] + oy))
+        z0, z1 = sorted((args[2] + oz, args[5] + oz))
+        id = args[6] & 0xfff
+        data = (args[7] if len(args) > 7 else 0) & 15
+        y0, y1 = max(y0, 0), min(y1, WORLD_HEIGHT - 1)
+        if y0 > y1:
+            return
+        for cx in range(x0 >> 4, (x1 >> 4) + 1):
+            for cz in range(z0 >> 4, (z1 >> 4) + 1):
+                self._chunk(cx, cz, create=True).fill(max(x0, cx * 16) & 15, y0, max(z0, cz * 16) & 15,
+                                                      min(x1, cx * 16 + 15) & 15, y1, min(z1, cz * 16 + 15) & 15,
+                                                      id, data)
+
+    def getBlockWithData(self, *args):
+        """Get block with data (x,y,z) => Block"""
+        x, y, z = intFloor(args)[:3]
+        x, y, z = x + self.origin[0], y + self.origin[1], z + self.origin[2]
+        chunk = self._chunk(x >> 4, z >> 4)
+        if chunk is None or not 0 <= y < WORLD_HEIGHT:
+            return Block(0, 0)
+        return Block(*chunk.get(x & 15, y, z & 15))
+
+    def getBlock(self, *args):
+        """Get block (x,y,z) => id:int"""
+        return self.getBlockWithData(*args).id
+
+    def _relight(self, chunks):
+        """
+        Block light of the written sections, flooded from their light
+        sources. The light also spreads to the other sections of the
+        written chunks, where it can only brighten them.
+        """
+        light = {} # (section x, y, z) => (light of each block, light lost entering each block)
+        for chunk in chunks:
+            for sy, section in chunk.sections.items():
+                values = bytearray(4096) if sy in chunk.touched else _unpackNibbles(section["BlockLight"])
+                light[(chunk.x, sy, chunk.z)] = (values, section["Blocks"].translate(_LIGHT_COST))
+        buckets = [[] for _ in range(16)]
+        for chunk in chunks:
+            for sy in chunk.touched:
+                blocks = chunk.sections[sy]["Blocks"]
+                for id, level in LIGHT_EMISSION.items():
+                    i = blocks.find(id)
+                    while i >= 0:
+                        buckets[level].append((chunk.x * 16 + (i & 15), sy * 16 + (i >> 8), chunk.z * 16 + (i >> 4 & 15)))
+                        i = blocks.find(id, i + 1)
+        # the brightest lights first: each block is lit once, at its final level
+        for level in range(15, 0, -1):
+            for x, y, z in buckets[level]:
+                entry = light.get((x >> 4, y >> 4, z >> 4))
+                if entry is None:
+                    continue
+                values = entry[0]
+                i = (y & 15) << 8 | (z & 15) << 4 | (x & 15)
+                if values[i] >= level:
+                    continue
+                values[i] = level
+                if level == 1:
+                    continue
+                for nx, ny, nz in ((x+1, y, z), (x-1, y, z), (x, y+1, z), (x, y-1, z), (x, y, z+1), (x, y, z-1)):
+                    entry = light.get((nx >> 4, ny >> 4, nz >> 4))
+                    if entry is None:
+                        continue # outside the written chunks, or in a section that does not exist
+                    j = (ny & 15) << 8 | (nz & 15) << 4 | (nx & 15)
+                    next = level - entry[1][j]
+                    if next > 0 and entry[0][j] < next:
+                        buckets[next].append((nx, ny, nz))
+        for chunk in chunks:
+            for sy, section in chunk.sections.items():
+                section["BlockLight"][:] = _packNibbles(light[(chunk.x, sy, chunk.z)][0])
+
+    def save(self):
+        """Writes the modified chunks in their region files => number of chunks written"""
+        chunks = [chunk for chunk in self.chunks.values() if chunk.boxes]
+        for chunk in chunks:
+            chunk.forget()
+            chunk.updateHeightMap()
+            chunk.updateSkyLight()
+        self._relight(chunks)
+        for chunk in chunks:
+            chunk.level["Sections"].sort(key=lambda section: section["Y"])
+            self._region(chunk.x >> 5, chunk.z >> 5, create=True).writeChunk(chunk.x & 31, chunk.z & 31, chunk.root)
+            chunk.boxes = []
+            chunk.touched = set()
+        return len(chunks)
+
+    def close(self):
+        """Closes the region files, without saving"""
+        for region in self.regions.values():
+            region.close()
+        self.regions = {}
+        self.chunks = {}
+
+class MappedRegion:
+    """A region file r.X.Z.mca mapped in memory, read only"""
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size >= 2 * SECTOR else None
+        self.locations = _HEADER.unpack_from(self.map, 0) if self.map is not None else (0,) * 1024
+
+    def hasChunk(self, x, z):
+        """Is the chunk x, z (0..31 inside the region) stored?"""
+        return self.locations[x + z * REGION_CHUNKS] != 0
+
+    def readChunk(self, x, z):
+        """Chunk x, z (0..31 inside the region) => root Compound, or None if it was never generated"""
+        location = self.locations[x + z * REGION_CHUNKS]
+        if not location:
+            return None
+        start = (location >> 8) * SECTOR
+        return _decodeChunk(self.map[start:start + (location & 255) * SECTOR], self.path)
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+        self.file.close()
+
+def _sectionIds(section):
+    """Block ids of a section => uint16 array [y, x, z]"""
+    ids = numpy.frombuffer(section["Blocks"], numpy.uint8).astype(numpy.uint16)
+    add = section.get("Add")
+    if add is not None:
+        add = numpy.frombuffer(add, numpy.uint8)
+        ids |= numpy.stack((add & 15, add >> 4), axis=1).reshape(4096).astype(numpy.uint16) << 8
+    return ids.reshape(16, 16, 16).transpose(0, 2, 1) # stored y, z, x
+
+class AnvilReader:
+    """
+    Block ids of a world, read from its region files mapped in memory.
+    origin: absolute position of the mcpi (0, 0, 0), the spawn point of
+    the world by default, like RaspberryJuice. The ids of the last
+    maxChunks chunks read are kept in memory.
+    """
+    def __init__(self, worldDir, origin=None, maxChunks=1024):
+        _requireNumpy()
+        self.regionDir = os.path.join(worldDir, "region")
+        self.origin = tuple(origin) if origin is not None else spawnPoint(worldDir)
+        self.maxChunks = maxChunks
+        self.regions = {}
+        self.chunks = OrderedDict()
+        self.decoded = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _sections(self, cx, cz):
+        """Ids of the sections of a chunk => {section height: uint16 array [y, x, z]}, None if not generated"""
+        key = (cx, cz)
+        if key in self.chunks:
+            self.chunks.move_to_end(key)
+            return self.chunks[key]
+        rx, rz = cx >> 5, cz >> 5
+        if (rx, rz) not in self.regions:
+            path = os.path.join(self.regionDir, "r.%d.%d.mca" % (rx, rz))
+            self.regions[(rx, rz)] = MappedRegion(path) if os.path.exists(path) else None
+        region = self.regions[(rx, rz)]
+        root = region.readChunk(cx & 31, cz & 31) if region is not None else None
+        sections = None
+        if root is not None:
+            self.decoded += 1
+            sections = {section["Y"]: _sectionIds(section) for section in root["Level"]["Sections"]}
+        self.chunks[key] = sections
+        if len(self.chunks) > self.maxChunks:
+            self.chunks.popitem(last=False)
+        return sections
+
+    def blocks(self, *args):
+        """
+        Block ids of a cuboid (x0,y0,z0,x1,y1,z1) => uint16 array [y, x, z],
+        in the order of world.getBlocks. Not generated chunks read as air.
+        """
+        x0, y0, z0, x1, y1, z1 = intFloor(args)[:6]
+        x0, x1 = sorted((x0, x1))
+        y0, y1 = sorted((y0, y1))
+        z0, z1 = sorted((z0, z1))
+        ox, oy, oz = self.origin
+        x0, y0, z0, x1, y1, z1 = x0 + ox, y0 + oy, z0 + oz, x1 + ox, y1 + oy, z1 + oz
+        result = numpy.zeros((y1 - y0 + 1, x1 - x0 + 1, z1 - z0 + 1), numpy.uint16)
+        for cx in range(x0 >> 4, (x1 >> 4) + 1):
+            xa, xb = max(x0, cx * 16), min(x1, cx * 16 + 15)
+            for cz in range(z0 >> 4, (z1 >> 4) + 1):
+                sections = self._sections(cx, cz)
+                if not sections:
+                    continue
+                za, zb = max(z0, cz * 16), min(z1, cz * 16 + 15)
+                for sy in range(max(y0, 0) >> 4, (min(y1, WORLD_HEIGHT - 1) >> 4) + 1):
+                    ids = sections.get(sy)
+                    if ids is None:
+                        continue
+                    ya, yb = max(y0, sy * 16), min(y1, sy * 16 + 15)
+                    result[ya - y0:yb - y0 + 1, xa - x0:xb - x0 + 1, za - z0:zb - z0 + 1] = \
+                        ids[ya & 15:(yb & 15) + 1, xa & 15:(xb & 15) + 1, za & 15:(zb & 15) + 1]
+        return result
+
+    def getBlock(self, *args):
+        """Get block (x,y,z) => id:int"""
+        x, y, z = intFloor(args)[:3]
+        return int(self.blocks(x, y, z, x, y, z)[0, 0, 0])
+
+    def findSolidVolume(self, size, near, radius=32, margin=1, maxOpen=0):
+        """
+        Nearest volume of size (dx, dy, dz) made of solid blocks only, with
+        a shell of margin solid blocks around it, so that nothing carved in
+        it opens on a cave, a liquid or the surface. Its centre is at most
+        radius blocks from near (x, y, z) along each axis.
+        maxOpen: number of other blocks (air, liquids, plants...) tolerated
+        in the volume and its shell
+        => (x0, y0, z0) lowest corner of the volume, or None
+        """
+        dx, dy, dz = size
+        nx, ny, nz = intFloor(near)[:3]
+        # the cuboid holding every candidate volume and its shell
+        x0, x1 = nx - radius - dx // 2 - margin, nx + radius + dx - dx // 2 + margin
+        z0, z1 = nz - radius - dz // 2 - margin, nz + radius + dz - dz // 2 + margin
+        y0 = max(ny - radius - dy // 2 - margin, -self.origin[1])
+        y1 = min(ny + radius + dy - dy // 2 + margin, WORLD_HEIGHT - 1 - self.origin[1])
+        wy, wx, wz = dy + 2 * margin, dx + 2 * margin, dz + 2 * margin
+        if y1 - y0 + 1 < wy:
+            return None
+        solid = numpy.zeros(4096, bool)
+        solid[1:] = True
+        for id, opacity in LIGHT_OPACITY.items():
+            solid[id] = opacity == 255
+        solid[[8, 9, 10, 11]] = False # liquids
+        other = (~solid[self.blocks(x0, y0, z0, x1, y1, z1)]).astype(numpy.int32)
+        # summed volume table: number of other blocks of any cuboid in 8 reads
+        table = numpy.zeros((other.shape[0] + 1, other.shape[1] + 1, other.shape[2] + 1), numpy.int32)
+        table[1:, 1:, 1:] = other.cumsum(0).cumsum(1).cumsum(2)
+        counts = (table[wy:, wx:, wz:] - table[:-wy, wx:, wz:] - table[wy:, :-wx, wz:] - table[wy:, wx:, :-wz]
+                  + table[:-wy, :-wx, wz:] + table[:-wy, wx:, :-wz] + table[wy:, :-wx, :-wz] - table[:-wy, :-wx, :-wz])
+        iy, ix, iz = numpy.nonzero(counts <= maxOpen)
+        if not len(iy):
+            return None
+        cornerX, cornerY, cornerZ = x0 + margin + ix, y0 + margin + iy, z0 + margin + iz
+        distance = ((cornerX + dx // 2 - nx) ** 2 + (cornerY + dy // 2 - ny) ** 2 + (cornerZ + dz // 2 - nz) ** 2)
+        best = int(numpy.argmin(distance))
+        return (int(cornerX[best]), int(cornerY[best]), int(cornerZ[best]))
+
+    def close(self):
+        """Unmaps the region files"""
+        for region in self.regions.values():
+            if region is not None:
+                region.close()
+        self.regions = {}
+        self.chunks = OrderedDict()
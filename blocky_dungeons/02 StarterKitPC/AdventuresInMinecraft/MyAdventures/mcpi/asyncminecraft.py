@@ -0,0 +1,359 @@
+import asyncio
+import sys
+from collections import deque
+from .connection import RequestError
+from .minecraft import intFloor
+from .parsing import (parseFloatVec3, parseIntVec3, parseBlock, parseBlocks, parseEntities,
+                      parseBlockHits, parseChatPosts, parseProjectileHits, parseEntityTypes)
+from .util import flatten, flatten_parameters_to_bytestring
+
+""" asyncio version of the Minecraft PI api
+
+    Every command is a coroutine, so one process can build, track players,
+    post chat messages and poll events at the same time without threads.
+    Commands are written as soon as they are called and the replies are
+    matched to the requests in order by a single reader task, so many
+    queries can be in flight on the same socket.
+
+    Example:
+        async def main():
+            mc = await AsyncMinecraft.create()
+            await mc.setBlock(0, 0, 0, block.STONE)
+            pos, blockId = await asyncio.gather(mc.player.getTilePos(),
+                                                mc.getBlock(0, 0, 0))
+            await mc.close()
+"""
+
+class AsyncConnection:
+    """asyncio connection to a Minecraft Pi game"""
+    RequestFailed = "Fail"
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.lastSent = b""
+        self.pending = deque()
+        self.readerTask = asyncio.get_running_loop().create_task(self._readReplies())
+
+    @staticmethod
+    async def open(address="localhost", port=4711):
+        reader, writer = await asyncio.open_connection(address, port)
+        return AsyncConnection(reader, writer)
+
+    def _encode(self, f, *data):
+        return b"".join([f, b"(", flatten_parameters_to_bytestring(data), b")", b"\n"])
+
+    async def send(self, f, *data):
+        """Sends data. The socket is only waited for when its buffer is full"""
+        s = self._encode(f, *data)
+        self.lastSent = s
+        self.writer.write(s)
+        await self.writer.drain()
+
+    async def sendReceive(self, f, *data):
+        """Sends data and waits for the reply"""
+        s = self._encode(f, *data)
+        self.lastSent = s
+        reply = asyncio.get_running_loop().create_future()
+        self.pending.append((reply, s))
+        self.writer.write(s)
+        await self.writer.drain()
+        return await reply
+
+    async def _readReplies(self):
+        """Reads the replies and gives them to the requests in order"""
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                s = line.decode("UTF-8").rstrip("\n")
+                if not self.pending:
+                    e =  "Drained Data: <%s>\n"%s.strip()
+                    e += "Last Message: <%s>\n"%self.lastSent.strip()
+                    sys.stderr.write(e)
+                    continue
+                reply, sent = self.pending.popleft()
+                if reply.cancelled():
+                    continue
+                if s == AsyncConnection.RequestFailed:
+                    reply.set_exception(RequestError("%s failed"%sent.strip()))
+                else:
+                    reply.set_result(s)
+        finally:
+            while self.pending:
+                reply, sent = self.pending.popleft()
+                if not reply.done():
+                    reply.set_exception(RequestError("Connection closed while waiting a reply to %s"%sent.strip()))
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+        self.readerTask.cancel()
+
+
+class AsyncCmdPositioner:
+    """Methods for setting and getting positions"""
+    def __init__(self, connection, packagePrefix):
+        self.conn = connection
+        self.pkg = packagePrefix
+
+    async def getPos(self, id):
+        """Get entity position (entityId:int) => Vec3"""
+        return parseFloatVec3(await self.conn.sendReceive(self.pkg + b".getPos", id))
+
+    async def setPos(self, id, *args):
+        """Set entity position (entityId:int, x,y,z)"""
+        await self.conn.send(self.pkg + b".setPos", id, args)
+
+    async def getTilePos(self, id):
+        """Get entity tile position (entityId:int) => Vec3"""
+        return parseIntVec3(await self.conn.sendReceive(self.pkg + b".getTile", id))
+
+    async def setTilePos(self, id, *args):
+        """Set entity tile position (entityId:int) => Vec3"""
+        await self.conn.send(self.pkg + b".setTile", id, intFloor(*args))
+
+    async def setDirection(self, id, *args):
+        """Set entity direction (entityId:int, x,y,z)"""
+        await self.conn.send(self.pkg + b".setDirection", id, args)
+
+    async def getDirection(self, id):
+        """Get entity direction (entityId:int) => Vec3"""
+        return parseFloatVec3(await self.conn.sendReceive(self.pkg + b".getDirection", id))
+
+    async def setRotation(self, id, yaw):
+        """Set entity rotation (entityId:int, yaw)"""
+        await self.conn.send(self.pkg + b".setRotation", id, yaw)
+
+    async def getRotation(self, id):
+        """get entity rotation (entityId:int) => float"""
+        return float(await self.conn.sendReceive(self.pkg + b".getRotation", id))
+
+    async def setPitch(self, id, pitch):
+        """Set entity pitch (entityId:int, pitch)"""
+        await self.conn.send(self.pkg + b".setPitch", id, pitch)
+
+    async def getPitch(self, id):
+        """get entity pitch (entityId:int) => float"""
+        return float(await self.conn.sendReceive(self.pkg + b".getPitch", id))
+
+    async def setting(self, setting, status):
+        """Set a player setting (setting, status). keys: autojump"""
+        await self.conn.send(self.pkg + b".setting", setting, 1 if bool(status) else 0)
+
+class AsyncCmdEntity(AsyncCmdPositioner):
+    """Methods for entities"""
+    def __init__(self, connection):
+        AsyncCmdPositioner.__init__(self, connection, b"entity")
+
+    async def getName(self, id):
+        """Get the list name of the player with entity id => [name:str]"""
+        return await self.conn.sendReceive(b"entity.getName", id)
+
+    async def getEntities(self, id, distance=10, typeId=-1):
+        """Return a list of entities near entity (playerEntityId:int, distanceFromPlayerInBlocks:int, typeId:int) => [[entityId:int,entityTypeId:int,entityTypeName:str,posX:float,posY:float,posZ:float]]"""
+        return parseEntities(await self.conn.sendReceive(b"entity.getEntities", id, distance, typeId))
+
+    async def removeEntities(self, id, distance=10, typeId=-1):
+        """Remove entities all entities near entity (playerEntityId:int, distanceFromPlayerInBlocks:int, typeId:int, ) => (removedEntitiesCount:int)"""
+        return int(await self.conn.sendReceive(b"entity.removeEntities", id, distance, typeId))
+
+    async def pollBlockHits(self, *args):
+        """Only triggered by sword => [BlockEvent]"""
+        return parseBlockHits(await self.conn.sendReceive(b"entity.events.block.hits", intFloor(args)))
+
+    async def pollChatPosts(self, *args):
+        """Triggered by posts to chat => [ChatEvent]"""
+        return parseChatPosts(await self.conn.sendReceive(b"entity.events.chat.posts", intFloor(args)))
+
+    async def pollProjectileHits(self, *args):
+        """Only triggered by projectiles => [BlockEvent]"""
+        return parseProjectileHits(await self.conn.sendReceive(b"entity.events.projectile.hits", intFloor(args)))
+
+    async def clearEvents(self, *args):
+        """Clear the entities events"""
+        await self.conn.send(b"entity.events.clear", intFloor(args))
+
+class AsyncCmdPlayer(AsyncCmdPositioner):
+    """Methods for the host (Raspberry Pi) player"""
+    def __init__(self, connection):
+        AsyncCmdPositioner.__init__(self, connection, b"player")
+
+    async def getPos(self):
+        return await AsyncCmdPositioner.getPos(self, [])
+    async def setPos(self, *args):
+        return await AsyncCmdPositioner.setPos(self, [], args)
+    async def getTilePos(self):
+        return await AsyncCmdPositioner.getTilePos(self, [])
+    async def setTilePos(self, *args):
+        return await AsyncCmdPositioner.setTilePos(self, [], args)
+    async def setDirection(self, *args):
+        return await AsyncCmdPositioner.setDirection(self, [], args)
+    async def getDirection(self):
+        return await AsyncCmdPositioner.getDirection(self, [])
+    async def setRotation(self, yaw):
+        return await AsyncCmdPositioner.setRotation(self, [], yaw)
+    async def getRotation(self):
+        return await AsyncCmdPositioner.getRotation(self, [])
+    async def setPitch(self, pitch):
+        return await AsyncCmdPositioner.setPitch(self, [], pitch)
+    async def getPitch(self):
+        return await AsyncCmdPositioner.getPitch(self, [])
+
+    async def getEntities(self, distance=10, typeId=-1):
+        """Return a list of entities near entity (distanceFromPlayerInBlocks:int, typeId:int) => [[entityId:int,entityTypeId:int,entityTypeName:str,posX:float,posY:float,posZ:float]]"""
+        return parseEntities(await self.conn.sendReceive(b"player.getEntities", distance, typeId))
+
+    async def removeEntities(self, distance=10, typeId=-1):
+        """Remove entities all entities near entity (distanceFromPlayerInBlocks:int, typeId:int, ) => (removedEntitiesCount:int)"""
+        return int(await self.conn.sendReceive(b"player.removeEntities", distance, typeId))
+
+    async def pollBlockHits(self):
+        """Only triggered by sword => [BlockEvent]"""
+        return parseBlockHits(await self.conn.sendReceive(b"player.events.block.hits"))
+
+    async def pollChatPosts(self):
+        """Triggered by posts to chat => [ChatEvent]"""
+        return parseChatPosts(await self.conn.sendReceive(b"player.events.chat.posts"))
+
+    async def pollProjectileHits(self):
+        """Only triggered by projectiles => [BlockEvent]"""
+        return parseProjectileHits(await self.conn.sendReceive(b"player.events.projectile.hits"))
+
+    async def clearEvents(self):
+        """Clear the players events"""
+        await self.conn.send(b"player.events.clear")
+
+class AsyncCmdCamera:
+    def __init__(self, connection):
+        self.conn = connection
+
+    async def setNormal(self, *args):
+        """Set camera mode to normal Minecraft view ([entityId])"""
+        await self.conn.send(b"camera.mode.setNormal", args)
+
+    async def setFixed(self):
+        """Set camera mode to fixed view"""
+        await self.conn.send(b"camera.mode.setFixed")
+
+    async def setFollow(self, *args):
+        """Set camera mode to follow an entity ([entityId])"""
+        await self.conn.send(b"camera.mode.setFollow", args)
+
+    async def setPos(self, *args):
+        """Set camera entity position (x,y,z)"""
+        await self.conn.send(b"camera.setPos", args)
+
+class AsyncCmdEvents:
+    """Events"""
+    def __init__(self, connection):
+        self.conn = connection
+
+    async def clearAll(self):
+        """Clear all old events"""
+        await self.conn.send(b"events.clear")
+
+    async def pollBlockHits(self):
+        """Only triggered by sword => [BlockEvent]"""
+        return parseBlockHits(await self.conn.sendReceive(b"events.block.hits"))
+
+    async def pollChatPosts(self):
+        """Triggered by posts to chat => [ChatEvent]"""
+        return parseChatPosts(await self.conn.sendReceive(b"events.chat.posts"))
+
+    async def pollProjectileHits(self):
+        """Only triggered by projectiles => [BlockEvent]"""
+        return parseProjectileHits(await self.conn.sendReceive(b"events.projectile.hits"))
+
+class AsyncMinecraft:
+    """asyncio version of Minecraft: every method is a coroutine"""
+    def __init__(self, connection):
+        self.conn = connection
+
+        self.camera = AsyncCmdCamera(connection)
+        self.entity = AsyncCmdEntity(connection)
+        self.player = AsyncCmdPlayer(connection)
+        self.events = AsyncCmdEvents(connection)
+
+    async def getBlock(self, *args):
+        """Get block (x,y,z) => id:int"""
+        return int(await self.conn.sendReceive(b"world.getBlock", intFloor(args)))
+
+    async def getBlockWithData(self, *args):
+        """Get block with data (x,y,z) => Block"""
+        return parseBlock(await self.conn.sendReceive(b"world.getBlockWithData", intFloor(args)))
+
+    async def getBlocks(self, *args):
+        """Get a cuboid of blocks (x0,y0,z0,x1,y1,z1) => [id:int]"""
+        return parseBlocks(await self.conn.sendReceive(b"world.getBlocks", intFloor(args)))
+
+    async def setBlock(self, *args):
+        """Set block (x,y,z,id,[data])"""
+        await self.conn.send(b"world.setBlock", intFloor(args))
+
+    async def setBlocks(self, *args):
+        """Set a cuboid of blocks (x0,y0,z0,x1,y1,z1,id,[data])"""
+        await self.conn.send(b"world.setBlocks", intFloor(args))
+
+    async def setSign(self, *args):
+        """Set a sign (x,y,z,id,data,[line1,line2,line3,line4])"""
+        flatargs = list(flatten(args))
+        lines = [flatarg.replace(",",";").replace(")","]").replace("(","[") for flatarg in flatargs[5:]]
+        await self.conn.send(b"world.setSign", intFloor(flatargs[0:5]) + lines)
+
+    async def spawnEntity(self, *args):
+        """Spawn entity (x,y,z,id)"""
+        return int(await self.conn.sendReceive(b"world.spawnEntity", args))
+
+    async def getHeight(self, *args):
+        """Get the height of the world (x,z) => int"""
+        return int(await self.conn.sendReceive(b"world.getHeight", intFloor(args)))
+
+    async def getPlayerEntityIds(self):
+        """Get the entity ids of the connected players => [id:int]"""
+        ids = await self.conn.sendReceive(b"world.getPlayerIds")
+        return list(map(int, ids.split("|")))
+
+    async def getPlayerEntityId(self, name):
+        """Get the entity id of the named player => [id:int]"""
+        return int(await self.conn.sendReceive(b"world.getPlayerId", name))
+
+    async def saveCheckpoint(self):
+        """Save a checkpoint that can be used for restoring the world"""
+        await self.conn.send(b"world.checkpoint.save")
+
+    async def restoreCheckpoint(self):
+        """Restore the world state to the checkpoint"""
+        await self.conn.send(b"world.checkpoint.restore")
+
+    async def postToChat(self, msg):
+        """Post a message to the game chat"""
+        await self.conn.send(b"chat.post", msg)
+
+    async def setting(self, setting, status):
+        """Set a world setting (setting, status). keys: world_immutable, nametags_visible"""
+        await self.conn.send(b"world.setting", setting, 1 if bool(status) else 0)
+
+    async def getEntityTypes(self):
+        """Return a list of Entity objects representing all the entity types in Minecraft"""
+        return parseEntityTypes(await self.conn.sendReceive(b"world.getEntityTypes"))
+
+    async def getEntities(self, typeId=-1):
+        """Return a list of all currently loaded entities (EntityType:int) => [[entityId:int,entityTypeId:int,entityTypeName:str,posX:float,posY:float,posZ:float]]"""
+        return parseEntities(await self.conn.sendReceive(b"world.getEntities", typeId))
+
+    async def removeEntity(self, id):
+        """Remove entity by id (entityId:int) => (removedEntitiesCount:int)"""
+        return int(await self.conn.sendReceive(b"world.removeEntity", int(id)))
+
+    async def removeEntities(self, typeId=-1):
+        """Remove entities all currently loaded Entities by type (typeId:int) => (removedEntitiesCount:int)"""
+        return int(await self.conn.sendReceive(b"world.removeEntities", typeId))
+
+    async def close(self):
+        await self.conn.close()
+
+    @staticmethod
+    async def create(address = "localhost", port = 4711):
+        return AsyncMinecraft(await AsyncConnection.open(address, port))
@@ -0,0 +1,259 @@
+import array
+from collections import OrderedDict
+from .minecraft import Minecraft, intFloor
+from .block import Block
+from .parsing import parseBlocks
+from .util import flatten
+
+""" Client-side mirror of the blocks of the world
+
+    CachedMinecraft remembers every block written through setBlock and
+    setBlocks, so reading back a block the program placed itself needs no
+    round trip. Blocks it never wrote are fetched one chunk at a time with
+    a single world.getBlocks. Chunks are evicted in least recently used
+    order, so the memory used stays bounded (about 16 KB per chunk).
+
+    The mirror assumes this client is the only one changing the blocks it
+    reads. Call invalidate() after anything else may have changed them.
+
+    Example:
+        mc = CachedMinecraft(Connection("localhost", 4711))
+        mc.setBlocks(0, 60, 0, 10, 70, 10, block.STONE)
+        mc.getBlock(5, 65, 5)    # answered from memory
+"""
+
+CHUNK_SIZE = 16
+CHUNK_VOLUME = CHUNK_SIZE ** 3
+WORLD_HEIGHT = 256
+
+UNKNOWN = 0
+ID_KNOWN = 1
+DATA_KNOWN = 2
+
+class Chunk:
+    """
+    16x16x16 blocks, indexed ((y*16)+x)*16+z like the world.getBlocks replies.
+    state tells for each block whether its id and its data are known.
+    """
+    __slots__ = ("ids", "data", "state")
+
+    def __init__(self):
+        self.ids = array.array("H", bytes(2 * CHUNK_VOLUME))
+        self.data = bytearray(CHUNK_VOLUME)
+        self.state = bytearray(CHUNK_VOLUME)
+
+    def merge(self, ids):
+        """Fills the unknown ids with the reply of a world.getBlocks"""
+        state = self.state
+        if not any(state):
+            self.ids = array.array("H", ids)
+            self.state = bytearray(b"\x01" * CHUNK_VOLUME)
+            return
+        for i, id in enumerate(ids):
+            if state[i] == UNKNOWN:
+                self.ids[i] = id
+                state[i] = ID_KNOWN
+
+def _index(x, y, z):
+    return ((y & 15) << 8) | ((x & 15) << 4) | (z & 15)
+
+class CachedMinecraft(Minecraft):
+    """Minecraft answering getBlock and getBlockWithData from a local mirror when it can"""
+    def __init__(self, connection, maxChunks=1024):
+        Minecraft.__init__(self, connection)
+        self.maxChunks = maxChunks
+        self.chunks = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.fetches = 0
+
+    def _chunk(self, key, create=False):
+        chunk = self.chunks.get(key)
+        if chunk is not None:
+            self.chunks.move_to_end(key)
+        elif create:
+            chunk = self.chunks[key] = Chunk()
+            if len(self.chunks) > self.maxChunks:
+                self.chunks.popitem(last=False)
+        return chunk
+
+    def _known(self, x, y, z, state=ID_KNOWN):
+        """Cached block => Block, or None if it has to be asked to the server"""
+        chunk = self._chunk((x >> 4, y >> 4, z >> 4))
+        if chunk is None:
+            return None
+        i = _index(x, y, z)
+        if chunk.state[i] < state:
+            return None
+        return Block(chunk.ids[i], chunk.data[i])
+
+    def _fill(self, keys):
+        """Fetches the ids of whole chunks, all the requests in flight at once"""
+        replies = []
+        for key in keys:
+            x0, y0, z0 = key[0] * CHUNK_SIZE, key[1] * CHUNK_SIZE, key[2] * CHUNK_SIZE
+            replies.append((key, self.conn.sendReceiveAsync(b"world.getBlocks", x0, y0, z0,
+                            x0 + CHUNK_SIZE - 1, y0 + CHUNK_SIZE - 1, z0 + CHUNK_SIZE - 1, parse=parseBlocks)))
+        self.fetches += len(replies)
+        for key, reply in replies:
+            ids = reply.result()
+            if len(ids) == CHUNK_VOLUME:
+                self._chunk(key, create=True).merge(ids)
+
+    def _missingChunks(self, coords, state):
+        keys = OrderedDict()
+        for x, y, z in coords:
+            if 0 <= y < WORLD_HEIGHT and self._known(x, y, z, state) is None:
+                keys[(x >> 4, y >> 4, z >> 4)] = True
+        return list(keys)
+
+    def _store(self, x0, y0, z0, x1, y1, z1, id, data, state):
+        """Writes a cuboid in the mirror"""
+        x0, x1 = sorted((x0, x1))
+        y0, y1 = sorted((y0, y1))
+        z0, z1 = sorted((z0, z1))
+        y0, y1 = max(y0, 0), min(y1, WORLD_HEIGHT - 1)
+        for cy in range(y0 >> 4, (y1 >> 4) + 1):
+            for cx in range(x0 >> 4, (x1 >> 4) + 1):
+                for cz in range(z0 >> 4, (z1 >> 4) + 1):
+                    chunk = self._chunk((cx, cy, cz), create=state != UNKNOWN)
+                    if chunk is None:
+                        continue
+                    za, zb = max(z0, cz * CHUNK_SIZE) & 15, min(z1, cz * CHUNK_SIZE + 15) & 15
+                    n = zb - za + 1
+                    idFill = array.array("H", [id]) * n
+                    dataFill = bytes((data,)) * n
+                    stateFill = bytes((state,)) * n
+                    for y in range(max(y0, cy * CHUNK_SIZE), min(y1, cy * CHUNK_SIZE + 15) + 1):
+                        for x in range(max(x0, cx * CHUNK_SIZE), min(x1, cx * CHUNK_SIZE + 15) + 1):
+                            i = _index(x, y, 0) + za
+                            chunk.ids[i:i + n] = idFill
+                            chunk.data[i:i + n] = dataFill
+                            chunk.state[i:i + n] = stateFill
+
+    def getBlock(self, *args):
+        """Get block (x,y,z) => id:int, from the mirror when known"""
+        x, y, z = intFloor(args)[:3]
+        if not 0 <= y < WORLD_HEIGHT:
+            return Minecraft.getBlock(self, x, y, z)
+        cached = self._known(x, y, z)
+        if cached is None:
+            self.misses += 1
+            self._fill([(x >> 4, y >> 4, z >> 4)])
+            cached = self._known(x, y, z)
+            if cached is None:
+                return Minecraft.getBlock(self, x, y, z)
+        else:
+            self.hits += 1
+        return cached.id
+
+    def getBlockWithData(self, *args):
+        """Get block with data (x,y,z) => Block, from the mirror when known"""
+        x, y, z = intFloor(args)[:3]
+        cached = self._known(x, y, z, DATA_KNOWN)
+        if cached is not None:
+            self.hits += 1
+            return cached
+        self.misses += 1
+        b = Minecraft.getBlockWithData(self, x, y, z)
+        if 0 <= y < WORLD_HEIGHT:
+            self._store(x, y, z, x, y, z, b.id, b.data, DATA_KNOWN)
+        return b
+
+    def batchGetBlocks(self, coords):
+        """Get many blocks ([(x,y,z)]) => [id:int], the unknown chunks fetched all at once"""
+        coords = [intFloor(pos)[:3] for pos in coords]
+        self._fill(self._missingChunks(coords, ID_KNOWN))
+        result = [self._known(*pos) for pos in coords]
+        missing = [i for i, cached in enumerate(result) if cached is None]
+        self.hits += len(coords) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            # out of the world, or evicted by a batch larger than the cache
+            for i, id in zip(missing, Minecraft.batchGetBlocks(self, [coords[i] for i in missing])):
+                result[i] = Block(id)
+        return [cached.id for cached in result]
+
+    def batchGetBlocksWithData(self, coords):
+        """Get many blocks with data ([(x,y,z)]) => [Block], only the unknown ones asked to the server"""
+        coords = [intFloor(pos)[:3] for pos in coords]
+        result = [self._known(x, y, z, DATA_KNOWN) for x, y, z in coords]
+        missing = [i for i, cached in enumerate(result) if cached is None]
+        self.hits += len(coords) - len(missing)
+        self.misses += len(missing)
+        for i, b in zip(missing, Minecraft.batchGetBlocksWithData(self, [coords[i] for i in missing])):
+            result[i] = b
+            x, y, z = coords[i]
+            if 0 <= y < WORLD_HEIGHT:
+                self._store(x, y, z, x, y, z, b.id, b.data, DATA_KNOWN)
+        return result
+
+    def setBlock(self, *args):
+        """Set block (x,y,z,id,[data])"""
+        args = intFloor(args)
+        Minecraft.setBlock(self, args)
+        x, y, z, id = args[:4]
+        data = args[4] if len(args) > 4 else 0
+        self._store(x, y, z, x, y, z, id & 0xffff, data & 15, DATA_KNOWN)
+
+    def setBlocks(self, *args):
+        """Set a cuboid of blocks (x0,y0,z0,x1,y1,z1,id,[data])"""
+        args = intFloor(args)
+        Minecraft.setBlocks(self, args)
+        data = args[7] if len(args) > 7 else 0
+        self._store(*args[:6], args[6] & 0xffff, data & 15, DATA_KNOWN)
+
+    def setSign(self, *args):
+        Minecraft.setSign(self, *args)
+        x, y, z = intFloor(list(flatten(args))[:3])
+        self.invalidate(x, y, z, x, y, z)
+
+    def restoreCheckpoint(self):
+        Minecraft.restoreCheckpoint(self)
+        self.invalidate()
+
+    def knownBlocks(self, *args):
+        """
+        Blocks of a cuboid (x0,y0,z0,x1,y1,z1) known by the mirror, without
+        asking the server => [id*16+data, or -1 when unknown] in the order of
+        world.getBlocks (y, then x, then z). Used by mcpi.voxel.VoxelBuffer.
+        """
+        x0, y0, z0, x1, y1, z1 = intFloor(args)[:6]
+        x0, x1 = sorted((x0, x1))
+        y0, y1 = sorted((y0, y1))
+        z0, z1 = sorted((z0, z1))
+        width, depth = x1 - x0 + 1, z1 - z0 + 1
+        result = [-1] * ((y1 - y0 + 1) * width * depth)
+        ya, yb = max(y0, 0), min(y1, WORLD_HEIGHT - 1)
+        for cy in range(ya >> 4, (yb >> 4) + 1):
+            for cx in range(x0 >> 4, (x1 >> 4) + 1):
+                for cz in range(z0 >> 4, (z1 >> 4) + 1):
+                    chunk = self.chunks.get((cx, cy, cz))
+                    if chunk is None:
+                        continue
+                    za, zb = max(z0, cz * CHUNK_SIZE), min(z1, cz * CHUNK_SIZE + 15)
+                    n = zb - za + 1
+                    known = bytes((DATA_KNOWN,)) * n
+                    for y in range(max(ya, cy * CHUNK_SIZE), min(yb, cy * CHUNK_SIZE + 15) + 1):
+                        for x in range(max(x0, cx * CHUNK_SIZE), min(x1, cx * CHUNK_SIZE + 15) + 1):
+                            i = _index(x, y, za)
+                            o = ((y - y0) * width + x - x0) * depth + za - z0
+                            state = chunk.state[i:i + n]
+                            ids, data = chunk.ids[i:i + n], chunk.data[i:i + n]
+                            if state == known:
+                                result[o:o + n] = [id << 4 | d for id, d in zip(ids, data)]
+                            elif any(state):
+                                result[o:o + n] = [id << 4 | d if s == DATA_KNOWN else -1
+                                                   for id, d, s in zip(ids, data, state)]
+        return result
+
+    def invalidate(self, *args):
+        """Forgets a cuboid of blocks (x0,y0,z0,x1,y1,z1), or the whole mirror without arguments"""
+        if not args:
+            self.chunks.clear()
+            return
+        self._store(*intFloor(args)[:6], 0, 0, UNKNOWN)
+
+    def cacheStats(self):
+        """=> {hits, misses, fetches, chunks}"""
+        return {"hits": self.hits, "misses": self.misses, "fetches": self.fetches, "chunks": len(self.chunks)}
@@ -1,24 +1,106 @@
+import contextlib
 import socket
 import select
 import sys
+import threading
+import time
+from collections import deque
 from .util import flatten_parameters_to_bytestring
+from .stats import ConnectionStats
 
 """ @author: Aron Nieminen, Mojang AB"""
 
 class RequestError(Exception):
     pass
 
+class Reply:
+    """
+    Future for the reply of a command sent with Connection.sendReceiveAsync.
+
+    The replies are read in order by the connection the first time one
+    of them is asked for, so many requests can be in flight at once.
+    """
+    def __init__(self, connection, command, parse=None, name=None):
+        self.connection = connection
+        self.command = command
+        self.parse = parse
+        self.name = name
+        self.start = time.perf_counter()
+        self.finished = False
+        self.value = None
+        self.error = None
+
+    def done(self):
+        """True once the reply has been read from the socket"""
+        return self.finished
+
+    def result(self):
+        """Waits for the reply and returns it, parsed if a parser was given"""
+        if not self.finished:
+            self.connection.wait(self)
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+    def _resolve(self, s):
+        self.finished = True
+        if s == Connection.RequestFailed:
+            self.error = RequestError("%s failed"%self.command.strip())
+            return
+        try:
+            self.value = self.parse(s) if self.parse else s
+        except Exception as e:
+            self.error = e
+
 class Connection:
-    """Connection to a Minecraft Pi game"""
+    """
+    Connection to a Minecraft Pi game
+
+    A connection can be shared by several threads (a chat timeline running
+    while the world is built): each command, and each command with its
+    reply, is sent under self.lock.
+
+    In pipelined mode, commands without a reply are buffered and only sent
+    once flushSize bytes are waiting, when a reply is waited for, or when
+    flush() is called. There is no timer: a caller that stops writing must
+    call flush() (or setPipelined(False), close()) for its last commands
+    to reach the server.
+
+    Pipelining is chosen per thread: setPipelined() and the pipeline()
+    block only change the mode of the calling thread (pipelined, the
+    argument of the constructor, is the mode of the other threads). A
+    command sent by a thread that is not pipelined first sends the
+    commands buffered by the others, so a chat message posted while
+    another thread builds is never held back.
+
+    Example:
+        with mc.conn.pipeline():
+            for ...:
+                mc.setBlock(...)     # sent by packets, the last one when the block ends
+    """
     RequestFailed = "Fail"
 
-    def __init__(self, address, port):
+    def __init__(self, address, port, pipelined=False, flushSize=16384):
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.socket.connect((address, port))
         self.lastSent = ""
 
+        self.pipelined = pipelined # mode of the threads that never called setPipelined
+        self.threadMode = threading.local()
+        self.flushSize = flushSize
+        self.sendBuffer = bytearray()
+        self.readBuffer = bytearray()
+        self.pending = deque()
+        self.stats = None
+        self.lock = threading.RLock()
+
     def drain(self):
         """Drains the socket of incoming data"""
+        if self.readBuffer:
+            e =  "Drained Data: <%s>\n"%bytes(self.readBuffer).strip()
+            e += "Last Message: <%s>\n"%self.lastSent.strip()
+            sys.stderr.write(e)
+            self.readBuffer.clear()
         while True:
             readable, _, _ = select.select([self.socket], [], [], 0.0)
             if not readable:
@@ -37,26 +119,144 @@ class Connection:
         """
 
         s = b"".join([f, b"(", flatten_parameters_to_bytestring(data), b")", b"\n"])
-        self._send(s)
+        with self.lock:
+            if self.stats is not None:
+                self.stats.recordSend(f, len(s))
+            self._send(s)
 
     def _send(self, s):
         """
         The actual socket interaction from self.send, extracted for easier mocking
         and testing
         """
-        self.drain()
+        if self.isPipelined():
+            self.lastSent = s
+            self.sendBuffer += s
+            if len(self.sendBuffer) >= self.flushSize:
+                self.flush()
+            return
+        if self.sendBuffer:
+            self.flush() # commands pipelined by another thread go first
+
+        if not self.pending:
+            self.drain()
         self.lastSent = s
 
         self.socket.sendall(s)
 
+    def flush(self):
+        """
+        Sends every command waiting in the pipeline with a single sendall.
+        Stray replies are only checked once per flush instead of once per command.
+        """
+        with self.lock:
+            if not self.sendBuffer:
+                return
+            if not self.pending:
+                self.drain()
+            self.socket.sendall(self.sendBuffer)
+            self.sendBuffer.clear()
+
+    def isPipelined(self):
+        """True if the commands of the calling thread are pipelined"""
+        return getattr(self.threadMode, "pipelined", self.pipelined)
+
+    def setPipelined(self, pipelined):
+        """
+        Enables or disables the pipelined write mode of the calling thread.
+        When disabled, the commands still waiting in the pipeline are sent.
+        """
+        with self.lock:
+            if not pipelined:
+                self.flush()
+            self.threadMode.pipelined = pipelined
+
+    @contextlib.contextmanager
+    def pipeline(self):
+        """Pipelines the commands of the calling thread inside a with block, then sends them"""
+        previous = self.isPipelined()
+        self.setPipelined(True)
+        try:
+            yield self
+        finally:
+            self.setPipelined(previous)
+
     def receive(self):
         """Receives data. Note that the trailing newline '\n' is trimmed"""
-        s = self.socket.makefile("r").readline().rstrip("\n")
+        with self.lock:
+            self.wait()
+            s = self.readline().decode("UTF-8")
         if s == Connection.RequestFailed:
             raise RequestError("%s failed"%self.lastSent.strip())
         return s
 
+    def readline(self):
+        """
+        Reads one line from the socket, without its trailing newline.
+        All the replies share the same read buffer, so several lines
+        received in a single recv are all kept for the next calls.
+        """
+        buffer = self.readBuffer
+        start = 0
+        while True:
+            end = buffer.find(b"\n", start)
+            if end >= 0:
+                line = bytes(buffer[:end])
+                del buffer[:end + 1]
+                return line
+            start = len(buffer)
+            data = self.socket.recv(65536)
+            if not data:
+                raise RequestError("Connection closed while waiting a reply to %s"%self.lastSent.strip())
+            buffer += data
+
     def sendReceive(self, *data):
         """Sends and receive data"""
-        self.send(*data)
-        return self.receive()
+        with self.lock:
+            if self.stats is None:
+                self.send(*data)
+                return self.receive()
+            start = time.perf_counter()
+            self.send(*data)
+            s = self.receive()
+        self.stats.recordReply(data[0], len(s.encode("UTF-8")) + 1, time.perf_counter() - start)
+        return s
+
+    def sendReceiveAsync(self, *data, parse=None):
+        """
+        Sends data without waiting for the reply => Reply
+
+        The server answers in order, so the returned Reply is filled
+        when the replies sent before it have been read.
+        """
+        with self.lock:
+            self.send(*data)
+            reply = Reply(self, self.lastSent, parse, data[0])
+            self.pending.append(reply)
+        return reply
+
+    def wait(self, reply=None):
+        """Reads the pending replies, up to the given one or all of them"""
+        with self.lock:
+            self.flush()
+            while self.pending:
+                if reply is not None and reply.finished:
+                    break # read by another thread meanwhile
+                pending = self.pending.popleft()
+                line = self.readline()
+                if self.stats is not None:
+                    self.stats.recordReply(pending.name, len(line) + 1, time.perf_counter() - pending.start)
+                pending._resolve(line.decode("UTF-8"))
+                if pending is reply:
+                    break
+
+    def enableStats(self, stats=None):
+        """Starts recording per-command statistics => ConnectionStats"""
+        self.stats = stats if stats is not None else ConnectionStats()
+        return self.stats
+
+    def close(self):
+        """Sends the pending commands and closes the socket"""
+        with self.lock:
+            self.flush()
+            self.socket.close()
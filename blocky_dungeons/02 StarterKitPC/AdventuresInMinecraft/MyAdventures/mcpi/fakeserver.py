@@ -0,0 +1,295 @@
+import argparse
+import socketserver
+import sys
+import threading
+import time
+
+""" In-process stand-in for a RaspberryJuice server
+
+    FakeServer speaks the line protocol used by mcpi.minecraft over a local
+    TCP port and keeps the blocks in a chunked World. It needs neither
+    Bukkit nor Java, so programs can be benchmarked and tried on a headless
+    machine. An optional latency is added before every reply.
+
+    Example:
+        with FakeServer(port=0, latency=0.002) as server:
+            mc = Minecraft.create("localhost", server.port)
+            mc.setBlock(0, 70, 0, block.STONE)
+
+    Run standalone with: python -m mcpi.fakeserver [--port 4711] [--latency 0.002]
+"""
+
+WORLD_HEIGHT = 256
+CHUNK_SIZE = 16
+
+class World:
+    """
+    Voxel world stored by chunks of 16x16 columns.
+
+    Each chunk keeps two bytearrays (ids and data) where the blocks of a
+    column are contiguous, so a setBlocks fills one slice per column. Chunks
+    are created flat on first access: bedrock, stone, dirt, then grass at
+    groundLevel.
+    """
+    def __init__(self, groundLevel=63):
+        self.groundLevel = groundLevel
+        column = bytearray(WORLD_HEIGHT)
+        column[0] = 7
+        column[1:groundLevel - 3] = b"\x01" * (groundLevel - 4)
+        column[groundLevel - 3:groundLevel] = b"\x03" * 3
+        column[groundLevel] = 2
+        self.templateIds = bytes(column) * (CHUNK_SIZE * CHUNK_SIZE)
+        self.chunks = {}
+        self.lock = threading.Lock()
+
+    def _chunk(self, x, z):
+        key = (x >> 4, z >> 4)
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            chunk = self.chunks[key] = (bytearray(self.templateIds), bytearray(len(self.templateIds)))
+        return chunk
+
+    @staticmethod
+    def _column(x, z):
+        return ((x & 15) << 4 | (z & 15)) * WORLD_HEIGHT
+
+    def getBlockWithData(self, x, y, z):
+        if not 0 <= y < WORLD_HEIGHT:
+            return 0, 0
+        ids, data = self._chunk(x, z)
+        i = self._column(x, z) + y
+        return ids[i], data[i]
+
+    def getBlock(self, x, y, z):
+        return self.getBlockWithData(x, y, z)[0]
+
+    def setBlock(self, x, y, z, id, data=0):
+        self.setBlocks(x, y, z, x, y, z, id, data)
+
+    def setBlocks(self, x0, y0, z0, x1, y1, z1, id, data=0):
+        x0, x1 = sorted((x0, x1))
+        y0, y1 = sorted((y0, y1))
+        z0, z1 = sorted((z0, z1))
+        y0, y1 = max(y0, 0), min(y1, WORLD_HEIGHT - 1)
+        if y0 > y1:
+            return
+        n = y1 - y0 + 1
+        idFill = bytes((id & 255,)) * n
+        dataFill = bytes((data & 15,)) * n
+        with self.lock:
+            for x in range(x0, x1 + 1):
+                for z in range(z0, z1 + 1):
+                    ids, datas = self._chunk(x, z)
+                    i = self._column(x, z) + y0
+                    ids[i:i + n] = idFill
+                    datas[i:i + n] = dataFill
+
+    def getBlocks(self, x0, y0, z0, x1, y1, z1):
+        """Block ids of a cuboid, in the RaspberryJuice order (y, then x, then z)"""
+        x0, x1 = sorted((x0, x1))
+        y0, y1 = sorted((y0, y1))
+        z0, z1 = sorted((z0, z1))
+        return [self.getBlock(x, y, z)
+                for y in range(y0, y1 + 1)
+                for x in range(x0, x1 + 1)
+                for z in range(z0, z1 + 1)]
+
+    def getHeight(self, x, z):
+        """y of the highest block that is not air"""
+        ids, _ = self._chunk(x, z)
+        i = self._column(x, z)
+        column = ids[i:i + WORLD_HEIGHT].rstrip(b"\x00")
+        return max(len(column) - 1, 0)
+
+
+class FakeServer:
+    """Local TCP server answering the RaspberryJuice commands used by mcpi"""
+    PLAYER_ID = 1
+
+    def __init__(self, address="localhost", port=4711, latency=0.0, world=None, verbose=False):
+        self.world = world if world is not None else World()
+        self.latency = latency
+        self.verbose = verbose
+        self.playerPos = [0.5, float(self.world.groundLevel + 1), 0.5]
+        self.chat = []
+        self.commandCount = 0
+        self.nextEntityId = 100
+        self.server = socketserver.ThreadingTCPServer((address, port), self._handlerClass(), bind_and_activate=False)
+        self.server.allow_reuse_address = True
+        self.server.daemon_threads = True
+        self.server.server_bind()
+        self.server.server_activate()
+        self.port = self.server.server_address[1]
+        self.thread = None
+
+    def _handlerClass(self):
+        server = self
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    reply = server.execute(line.decode("UTF-8").rstrip("\r\n"))
+                    if reply is not None:
+                        if server.latency:
+                            time.sleep(server.latency)
+                        self.wfile.write(reply.encode("UTF-8") + b"\n")
+        return Handler
+
+    def start(self):
+        """Serves in a background thread"""
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def execute(self, line):
+        """Runs one command => reply line, or None for commands without reply"""
+        self.commandCount += 1
+        name, _, rest = line.partition("(")
+        rest = rest[:-1] if rest.endswith(")") else rest
+        if name == "chat.post":
+            self.chat.append(rest)
+            if self.verbose:
+                print("[chat]", rest)
+            return None
+        args = rest.split(",") if rest else []
+        handler = self.COMMANDS.get(name)
+        if handler is None:
+            sys.stderr.write("FakeServer: unknown command <%s>\n"%line)
+            return "Fail"
+        try:
+            return handler(self, args)
+        except (ValueError, IndexError):
+            sys.stderr.write("FakeServer: bad arguments <%s>\n"%line)
+            return "Fail"
+
+    # world
+
+    def _setBlock(self, args):
+        x, y, z, id = map(int, args[:4])
+        data = int(args[4]) if len(args) > 4 else 0
+        self.world.setBlock(x, y, z, id, data)
+
+    def _setBlocks(self, args):
+        coords = list(map(int, args[:7]))
+        data = int(args[7]) if len(args) > 7 else 0
+        self.world.setBlocks(*coords, data)
+
+    def _getBlock(self, args):
+        return str(self.world.getBlock(*map(int, args[:3])))
+
+    def _getBlockWithData(self, args):
+        return "%d,%d"%self.world.getBlockWithData(*map(int, args[:3]))
+
+    def _getBlocks(self, args):
+        return ",".join(map(str, self.world.getBlocks(*map(int, args[:6]))))
+
+    def _getHeight(self, args):
+        return str(self.world.getHeight(*map(int, args[:2])))
+
+    def _spawnEntity(self, args):
+        self.nextEntityId += 1
+        return str(self.nextEntityId)
+
+    # player and entities
+
+    def _getPos(self, args):
+        return "%s,%s,%s"%tuple(self.playerPos)
+
+    def _getTile(self, args):
+        return "%d,%d,%d"%tuple(int(v // 1) for v in self.playerPos)
+
+    # player.* commands have no entity id, entity.* commands start with one: the position is always last
+
+    def _setPos(self, args):
+        self.playerPos = [float(v) for v in args[-3:]]
+
+    def _setTile(self, args):
+        self.playerPos = [int(v) + 0.5 if i != 1 else float(int(v)) for i, v in enumerate(args[-3:])]
+
+    def _nothing(self, args):
+        return None
+
+    def _empty(self, args):
+        return ""
+
+    def _zero(self, args):
+        return "0"
+
+    def _playerIds(self, args):
+        return str(self.PLAYER_ID)
+
+    COMMANDS = {
+        "world.setBlock": _setBlock,
+        "world.setBlocks": _setBlocks,
+        "world.getBlock": _getBlock,
+        "world.getBlockWithData": _getBlockWithData,
+        "world.getBlocks": _getBlocks,
+        "world.getHeight": _getHeight,
+        "world.setSign": _setBlock,
+        "world.spawnEntity": _spawnEntity,
+        "world.getPlayerIds": _playerIds,
+        "world.getPlayerId": _playerIds,
+        "world.getEntities": _empty,
+        "world.getEntityTypes": _empty,
+        "world.removeEntity": _zero,
+        "world.removeEntities": _zero,
+        "world.setting": _nothing,
+        "world.checkpoint.save": _nothing,
+        "world.checkpoint.restore": _nothing,
+        "camera.mode.setNormal": _nothing,
+        "camera.mode.setFixed": _nothing,
+        "camera.mode.setFollow": _nothing,
+        "camera.setPos": _nothing,
+        "events.clear": _nothing,
+        "events.block.hits": _empty,
+        "events.chat.posts": _empty,
+        "events.projectile.hits": _empty,
+    }
+    for _pkg in ("player", "entity"):
+        COMMANDS.update({
+            _pkg + ".getPos": _getPos,
+            _pkg + ".getTile": _getTile,
+            _pkg + ".setPos": _setPos,
+            _pkg + ".setTile": _setTile,
+            _pkg + ".getDirection": lambda self, args: "0.0,0.0,1.0",
+            _pkg + ".getRotation": _zero,
+            _pkg + ".getPitch": _zero,
+            _pkg + ".setDirection": _nothing,
+            _pkg + ".setRotation": _nothing,
+            _pkg + ".setPitch": _nothing,
+            _pkg + ".setting": _nothing,
+            _pkg + ".getEntities": _empty,
+            _pkg + ".removeEntities": _zero,
+            _pkg + ".events.clear": _nothing,
+            _pkg + ".events.block.hits": _empty,
+            _pkg + ".events.chat.posts": _empty,
+            _pkg + ".events.projectile.hits": _empty,
+        })
+    COMMANDS["entity.getName"] = lambda self, args: "Player"
+    del _pkg
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for a RaspberryJuice server")
+    parser.add_argument("--address", default="localhost")
+    parser.add_argument("--port", type=int, default=4711)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added before every reply")
+    parser.add_argument("--verbose", action="store_true", help="print the chat messages")
+    args = parser.parse_args()
+    server = FakeServer(args.address, args.port, args.latency, verbose=args.verbose)
+    print("FakeServer listening on %s:%d"%(args.address, server.port))
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        server.server.server_close()
+
+if __name__ == "__main__":
+    main()
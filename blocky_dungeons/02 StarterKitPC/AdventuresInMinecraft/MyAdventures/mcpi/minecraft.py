@@ -1,10 +1,14 @@
 from .connection import Connection
+from .pool import ConnectionPool
 from .vec3 import Vec3
 from .event import BlockEvent, ChatEvent, ProjectileEvent
 from .entity import Entity
 from .block import Block
 import math
-from .util import flatten
+from .util import flatten, flatten_list
+from .parsing import (parseFloatVec3, parseIntVec3, parseBlock, parseBlocks, parseEntities,
+                      parseBlockHits, parseChatPosts, parseProjectileHits, parseEntityTypes,
+                      blocksArray, entitiesArray)
 
 """ Minecraft PI low level api v0.1_1
 
@@ -33,7 +37,7 @@ from .util import flatten
 """
 
 def intFloor(*args):
-    return [int(math.floor(x)) for x in flatten(args)]
+    return [x if type(x) is int else int(math.floor(x)) for x in flatten_list(args)]
 
 class CmdPositioner:
     """Methods for setting and getting positions"""
@@ -44,7 +48,11 @@ class CmdPositioner:
     def getPos(self, id):
         """Get entity position (entityId:int) => Vec3"""
         s = self.conn.sendReceive(self.pkg + b".getPos", id)
-        return Vec3(*list(map(float, s.split(","))))
+        return parseFloatVec3(s)
+
+    def getPosAsync(self, id):
+        """Get entity position without waiting (entityId:int) => Reply(Vec3)"""
+        return self.conn.sendReceiveAsync(self.pkg + b".getPos", id, parse=parseFloatVec3)
 
     def setPos(self, id, *args):
         """Set entity position (entityId:int, x,y,z)"""
@@ -53,7 +61,11 @@ class CmdPositioner:
     def getTilePos(self, id):
         """Get entity tile position (entityId:int) => Vec3"""
         s = self.conn.sendReceive(self.pkg + b".getTile", id)
-        return Vec3(*list(map(int, s.split(","))))
+        return parseIntVec3(s)
+
+    def getTilePosAsync(self, id):
+        """Get entity tile position without waiting (entityId:int) => Reply(Vec3)"""
+        return self.conn.sendReceiveAsync(self.pkg + b".getTile", id, parse=parseIntVec3)
 
     def setTilePos(self, id, *args):
         """Set entity tile position (entityId:int) => Vec3"""
@@ -103,8 +115,11 @@ class CmdEntity(CmdPositioner):
         """Return a list of entities near entity (playerEntityId:int, distanceFromPlayerInBlocks:int, typeId:int) => [[entityId:int,entityTypeId:int,entityTypeName:str,posX:float,posY:float,posZ:float]]"""
         """If distanceFromPlayerInBlocks:int is not specified then default 10 blocks will be used"""
         s = self.conn.sendReceive(b"entity.getEntities", id, distance, typeId)
-        entities = [e for e in s.split("|") if e]
-        return [ [int(n.split(",")[0]), int(n.split(",")[1]), n.split(",")[2], float(n.split(",")[3]), float(n.split(",")[4]), float(n.split(",")[5])] for n in entities]
+        return parseEntities(s)
+
+    def getEntitiesArray(self, id, distance=10, typeId=-1):
+        """Same as getEntities, decoded into a numpy structured array (see mcpi.parsing.ENTITY_DTYPE)"""
+        return entitiesArray(self.conn.sendReceive(b"entity.getEntities", id, distance, typeId))
 
     def removeEntities(self, id, distance=10, typeId=-1):
         """Remove entities all entities near entity (playerEntityId:int, distanceFromPlayerInBlocks:int, typeId:int, ) => (removedEntitiesCount:int)"""
@@ -114,30 +129,17 @@ class CmdEntity(CmdPositioner):
     def pollBlockHits(self, *args):
         """Only triggered by sword => [BlockEvent]"""
         s = self.conn.sendReceive(b"entity.events.block.hits", intFloor(args))
-        events = [e for e in s.split("|") if e]
-        return [BlockEvent.Hit(*list(map(int, e.split(",")))) for e in events]
+        return parseBlockHits(s)
 
     def pollChatPosts(self, *args):
         """Triggered by posts to chat => [ChatEvent]"""
         s = self.conn.sendReceive(b"entity.events.chat.posts", intFloor(args))
-        events = [e for e in s.split("|") if e]
-        return [ChatEvent.Post(int(e[:e.find(",")]), e[e.find(",") + 1:]) for e in events]
+        return parseChatPosts(s)
     
     def pollProjectileHits(self, *args):
         """Only triggered by projectiles => [BlockEvent]"""
         s = self.conn.sendReceive(b"entity.events.projectile.hits", intFloor(args))
-        events = [e for e in s.split("|") if e]
-        results = []
-        for e in events:
-            info = e.split(",")
-            results.append(ProjectileEvent.Hit(
-                int(info[0]), 
-                int(info[1]), 
-                int(info[2]), 
-                int(info[3]), 
-                info[4],
-                info[5]))
-        return results
+        return parseProjectileHits(s)
 
     def clearEvents(self, *args):
         """Clear the entities events"""
@@ -153,8 +155,12 @@ class CmdPlayer(CmdPositioner):
         return CmdPositioner.getPos(self, [])
     def setPos(self, *args):
         return CmdPositioner.setPos(self, [], args)
+    def getPosAsync(self):
+        return CmdPositioner.getPosAsync(self, [])
     def getTilePos(self):
         return CmdPositioner.getTilePos(self, [])
+    def getTilePosAsync(self):
+        return CmdPositioner.getTilePosAsync(self, [])
     def setTilePos(self, *args):
         return CmdPositioner.setTilePos(self, [], args)
     def setDirection(self, *args):
@@ -174,8 +180,11 @@ class CmdPlayer(CmdPositioner):
         """Return a list of entities near entity (distanceFromPlayerInBlocks:int, typeId:int) => [[entityId:int,entityTypeId:int,entityTypeName:str,posX:float,posY:float,posZ:float]]"""
         """If distanceFromPlayerInBlocks:int is not specified then default 10 blocks will be used"""
         s = self.conn.sendReceive(b"player.getEntities", distance, typeId)
-        entities = [e for e in s.split("|") if e]
-        return [ [int(n.split(",")[0]), int(n.split(",")[1]), n.split(",")[2], float(n.split(",")[3]), float(n.split(",")[4]), float(n.split(",")[5])] for n in entities]
+        return parseEntities(s)
+
+    def getEntitiesArray(self, distance=10, typeId=-1):
+        """Same as getEntities, decoded into a numpy structured array (see mcpi.parsing.ENTITY_DTYPE)"""
+        return entitiesArray(self.conn.sendReceive(b"player.getEntities", distance, typeId))
 
     def removeEntities(self, distance=10, typeId=-1):
         """Remove entities all entities near entity (distanceFromPlayerInBlocks:int, typeId:int, ) => (removedEntitiesCount:int)"""
@@ -185,30 +194,17 @@ class CmdPlayer(CmdPositioner):
     def pollBlockHits(self):
         """Only triggered by sword => [BlockEvent]"""
         s = self.conn.sendReceive(b"player.events.block.hits")
-        events = [e for e in s.split("|") if e]
-        return [BlockEvent.Hit(*list(map(int, e.split(",")))) for e in events]
+        return parseBlockHits(s)
 
     def pollChatPosts(self):
         """Triggered by posts to chat => [ChatEvent]"""
         s = self.conn.sendReceive(b"player.events.chat.posts")
-        events = [e for e in s.split("|") if e]
-        return [ChatEvent.Post(int(e[:e.find(",")]), e[e.find(",") + 1:]) for e in events]
+        return parseChatPosts(s)
     
     def pollProjectileHits(self):
         """Only triggered by projectiles => [BlockEvent]"""
         s = self.conn.sendReceive(b"player.events.projectile.hits")
-        events = [e for e in s.split("|") if e]
-        results = []
-        for e in events:
-            info = e.split(",")
-            results.append(ProjectileEvent.Hit(
-                int(info[0]), 
-                int(info[1]), 
-                int(info[2]), 
-                int(info[3]), 
-                info[4],
-                info[5]))
-        return results
+        return parseProjectileHits(s)
 
     def clearEvents(self):
         """Clear the players events"""
@@ -247,30 +243,17 @@ class CmdEvents:
     def pollBlockHits(self):
         """Only triggered by sword => [BlockEvent]"""
         s = self.conn.sendReceive(b"events.block.hits")
-        events = [e for e in s.split("|") if e]
-        return [BlockEvent.Hit(*list(map(int, e.split(",")))) for e in events]
+        return parseBlockHits(s)
 
     def pollChatPosts(self):
         """Triggered by posts to chat => [ChatEvent]"""
         s = self.conn.sendReceive(b"events.chat.posts")
-        events = [e for e in s.split("|") if e]
-        return [ChatEvent.Post(int(e[:e.find(",")]), e[e.find(",") + 1:]) for e in events]
+        return parseChatPosts(s)
     
     def pollProjectileHits(self):
         """Only triggered by projectiles => [BlockEvent]"""
         s = self.conn.sendReceive(b"events.projectile.hits")
-        events = [e for e in s.split("|") if e]
-        results = []
-        for e in events:
-            info = e.split(",")
-            results.append(ProjectileEvent.Hit(
-                int(info[0]), 
-                int(info[1]), 
-                int(info[2]), 
-                int(info[3]), 
-                info[4],
-                info[5]))
-        return results
+        return parseProjectileHits(s)
 
 class Minecraft:
     """The main class to interact with a running instance of Minecraft Pi."""
@@ -289,13 +272,36 @@ class Minecraft:
     def getBlockWithData(self, *args):
         """Get block with data (x,y,z) => Block"""
         ans = self.conn.sendReceive(b"world.getBlockWithData", intFloor(args))
-        return Block(*list(map(int, ans.split(","))))
+        return parseBlock(ans)
+
+    def getBlockAsync(self, *args):
+        """Get block without waiting for the reply (x,y,z) => Reply(id:int)"""
+        return self.conn.sendReceiveAsync(b"world.getBlock", intFloor(args), parse=int)
+
+    def getBlockWithDataAsync(self, *args):
+        """Get block with data without waiting for the reply (x,y,z) => Reply(Block)"""
+        return self.conn.sendReceiveAsync(b"world.getBlockWithData", intFloor(args), parse=parseBlock)
+
+    def batchGetBlocks(self, coords):
+        """Get many blocks with all the requests in flight at once ([(x,y,z)]) => [id:int]"""
+        replies = [self.getBlockAsync(pos) for pos in coords]
+        return [reply.result() for reply in replies]
+
+    def batchGetBlocksWithData(self, coords):
+        """Get many blocks with data with all the requests in flight at once ([(x,y,z)]) => [Block]"""
+        replies = [self.getBlockWithDataAsync(pos) for pos in coords]
+        return [reply.result() for reply in replies]
 
     def getBlocks(self, *args):
         """Get a cuboid of blocks (x0,y0,z0,x1,y1,z1) => [id:int]"""
         s = self.conn.sendReceive(b"world.getBlocks", intFloor(args))
         return map(int, s.split(","))
 
+    def getBlocksArray(self, *args):
+        """Get a cuboid of blocks (x0,y0,z0,x1,y1,z1) => numpy uint16 array shaped (dx,dy,dz)"""
+        coords = intFloor(args)
+        return blocksArray(self.conn.sendReceive(b"world.getBlocks", coords), *coords[:6])
+
     def setBlock(self, *args):
         """Set block (x,y,z,id,[data])"""
         self.conn.send(b"world.setBlock", intFloor(args))
@@ -326,6 +332,15 @@ class Minecraft:
         """Get the height of the world (x,z) => int"""
         return int(self.conn.sendReceive(b"world.getHeight", intFloor(args)))
 
+    def getHeightAsync(self, *args):
+        """Get the height of the world without waiting for the reply (x,z) => Reply(int)"""
+        return self.conn.sendReceiveAsync(b"world.getHeight", intFloor(args), parse=int)
+
+    def batchGetHeights(self, coords):
+        """Get many heights with all the requests in flight at once ([(x,z)]) => [int]"""
+        replies = [self.getHeightAsync(pos) for pos in coords]
+        return [reply.result() for reply in replies]
+
     def getPlayerEntityIds(self):
         """Get the entity ids of the connected players => [id:int]"""
         ids = self.conn.sendReceive(b"world.getPlayerIds")
@@ -354,14 +369,16 @@ class Minecraft:
     def getEntityTypes(self):
         """Return a list of Entity objects representing all the entity types in Minecraft"""  
         s = self.conn.sendReceive(b"world.getEntityTypes")
-        types = [t for t in s.split("|") if t]
-        return [Entity(int(e[:e.find(",")]), e[e.find(",") + 1:]) for e in types]
+        return parseEntityTypes(s)
     
     def getEntities(self, typeId=-1):
         """Return a list of all currently loaded entities (EntityType:int) => [[entityId:int,entityTypeId:int,entityTypeName:str,posX:float,posY:float,posZ:float]]"""
         s = self.conn.sendReceive(b"world.getEntities", typeId)
-        entities = [e for e in s.split("|") if e]
-        return [[int(n.split(",")[0]), int(n.split(",")[1]), n.split(",")[2], float(n.split(",")[3]), float(n.split(",")[4]), float(n.split(",")[5])] for n in entities]
+        return parseEntities(s)
+
+    def getEntitiesArray(self, typeId=-1):
+        """Same as getEntities, decoded into a numpy structured array (see mcpi.parsing.ENTITY_DTYPE)"""
+        return entitiesArray(self.conn.sendReceive(b"world.getEntities", typeId))
 
     def removeEntity(self, id):
         """Remove entity by id (entityId:int) => (removedEntitiesCount:int)"""
@@ -371,9 +388,22 @@ class Minecraft:
         """Remove entities all currently loaded Entities by type (typeId:int) => (removedEntitiesCount:int)"""
         return int(self.conn.sendReceive(b"world.removeEntities", typeId))
 
+    def enableStats(self):
+        """Starts recording per-command counts, bytes and latencies (see mcpi.stats) => ConnectionStats"""
+        return self.conn.enableStats()
+
+    def stats(self):
+        """Statistics recorded since enableStats() => ConnectionStats, or None if disabled"""
+        return self.conn.stats
+
+    @staticmethod
+    def create(address = "localhost", port = 4711, pipelined = False):
+        return Minecraft(Connection(address, port, pipelined))
+
     @staticmethod
-    def create(address = "localhost", port = 4711):
-        return Minecraft(Connection(address, port))
+    def createPool(address = "localhost", port = 4711, size = 4, pipelined = False):
+        """Minecraft using several connections to spread the block writes (see mcpi.pool)"""
+        return Minecraft(ConnectionPool(address, port, size, pipelined))
 
 
 if __name__ == "__main__":
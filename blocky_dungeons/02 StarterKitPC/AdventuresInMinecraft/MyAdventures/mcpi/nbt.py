@@ -0,0 +1,204 @@
+import array
+import gzip
+import struct
+import sys
+import zlib
+
+""" Named Binary Tag (NBT) encoding, as used by Minecraft 1.6.4 files
+
+    Tags are decoded to plain Python values: int, float, str, bytearray
+    (TAG_Byte_Array), array.array("i") (TAG_Int_Array), List and
+    Compound. Compound and List remember the tag type of their values, so
+    a file decoded then encoded again is unchanged.
+
+    Example:
+        level = readFile("world/level.dat")          # gzip compressed
+        spawn = level["Data"]["SpawnX"], level["Data"]["SpawnZ"]
+        level["Data"].set("raining", TAG_BYTE, 0)
+        writeFile("world/level.dat", level)
+
+    Chunks in region files (see mcpi.anvil) use loads/dumps on the
+    decompressed payload.
+"""
+
+TAG_END = 0
+TAG_BYTE = 1
+TAG_SHORT = 2
+TAG_INT = 3
+TAG_LONG = 4
+TAG_FLOAT = 5
+TAG_DOUBLE = 6
+TAG_BYTE_ARRAY = 7
+TAG_STRING = 8
+TAG_LIST = 9
+TAG_COMPOUND = 10
+TAG_INT_ARRAY = 11
+
+_SCALARS = {TAG_BYTE: struct.Struct(">b"), TAG_SHORT: struct.Struct(">h"), TAG_INT: struct.Struct(">i"),
+            TAG_LONG: struct.Struct(">q"), TAG_FLOAT: struct.Struct(">f"), TAG_DOUBLE: struct.Struct(">d")}
+_LENGTH = struct.Struct(">i")
+_NAME = struct.Struct(">H")
+_LIST = struct.Struct(">bi")
+
+class Compound(dict):
+    """TAG_Compound: a dict of named values, with the tag type of each one in types"""
+    def __init__(self, *args, **kwargs):
+        dict.__init__(self, *args, **kwargs)
+        self.types = {}
+
+    def set(self, name, tagType, value):
+        """Sets a value and its tag type"""
+        self.types[name] = tagType
+        dict.__setitem__(self, name, value)
+
+    def __setitem__(self, name, value):
+        if name not in self.types:
+            self.types[name] = _guessType(value)
+        dict.__setitem__(self, name, value)
+
+    def __delitem__(self, name):
+        dict.__delitem__(self, name)
+        del self.types[name]
+
+class List(list):
+    """TAG_List: a list of values of the same tag type"""
+    def __init__(self, tagType=TAG_END, values=()):
+        list.__init__(self, values)
+        self.type = tagType
+
+def _guessType(value):
+    if isinstance(value, Compound):
+        return TAG_COMPOUND
+    if isinstance(value, List):
+        return TAG_LIST
+    if isinstance(value, (bytes, bytearray)):
+        return TAG_BYTE_ARRAY
+    if isinstance(value, array.array):
+        return TAG_INT_ARRAY
+    if isinstance(value, str):
+        return TAG_STRING
+    if isinstance(value, float):
+        return TAG_DOUBLE
+    if isinstance(value, int):
+        return TAG_INT
+    raise TypeError("no NBT tag type for %r, use Compound.set" % (value,))
+
+class _Reader:
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+
+    def take(self, n):
+        start = self.pos
+        self.pos += n
+        return self.data[start:self.pos]
+
+    def unpack(self, fmt):
+        value = fmt.unpack_from(self.data, self.pos)
+        self.pos += fmt.size
+        return value
+
+    def string(self):
+        n, = self.unpack(_NAME)
+        return bytes(self.take(n)).decode("utf-8")
+
+    def value(self, tagType):
+        fmt = _SCALARS.get(tagType)
+        if fmt is not None:
+            return self.unpack(fmt)[0]
+        if tagType == TAG_BYTE_ARRAY:
+            n, = self.unpack(_LENGTH)
+            return bytearray(self.take(n))
+        if tagType == TAG_STRING:
+            return self.string()
+        if tagType == TAG_LIST:
+            itemType, n = self.unpack(_LIST)
+            return List(itemType, [self.value(itemType) for _ in range(n)])
+        if tagType == TAG_COMPOUND:
+            compound = Compound()
+            while True:
+                itemType = self.data[self.pos]
+                self.pos += 1
+                if itemType == TAG_END:
+                    return compound
+                name = self.string()
+                compound.set(name, itemType, self.value(itemType))
+        if tagType == TAG_INT_ARRAY:
+            n, = self.unpack(_LENGTH)
+            values = array.array("i", bytes(self.take(4 * n)))
+            if sys.byteorder == "little":
+                values.byteswap()
+            return values
+        raise ValueError("unknown NBT tag type %d" % tagType)
+
+def _writeString(out, s):
+    raw = s.encode("utf-8")
+    out.append(_NAME.pack(len(raw)))
+    out.append(raw)
+
+def _writeValue(out, tagType, value):
+    fmt = _SCALARS.get(tagType)
+    if fmt is not None:
+        out.append(fmt.pack(value))
+    elif tagType == TAG_BYTE_ARRAY:
+        out.append(_LENGTH.pack(len(value)))
+        out.append(bytes(value))
+    elif tagType == TAG_STRING:
+        _writeString(out, value)
+    elif tagType == TAG_LIST:
+        itemType = getattr(value, "type", TAG_END)
+        if value and itemType == TAG_END:
+            itemType = _guessType(value[0])
+        out.append(_LIST.pack(itemType, len(value)))
+        for item in value:
+            _writeValue(out, itemType, item)
+    elif tagType == TAG_COMPOUND:
+        types = getattr(value, "types", {})
+        for name, item in value.items():
+            itemType = types.get(name) or _guessType(item)
+            out.append(bytes((itemType,)))
+            _writeString(out, name)
+            _writeValue(out, itemType, item)
+        out.append(b"\x00")
+    elif tagType == TAG_INT_ARRAY:
+        values = array.array("i", value)
+        if sys.byteorder == "little":
+            values.byteswap()
+        out.append(_LENGTH.pack(len(values)))
+        out.append(values.tobytes())
+    else:
+        raise ValueError("unknown NBT tag type %d" % tagType)
+
+def loads(data):
+    """Uncompressed NBT => root Compound (its name in root.name)"""
+    reader = _Reader(memoryview(data))
+    tagType = reader.data[0]
+    reader.pos = 1
+    if tagType != TAG_COMPOUND:
+        raise ValueError("the root tag of an NBT file must be a compound")
+    name = reader.string()
+    root = reader.value(TAG_COMPOUND)
+    root.name = name
+    return root
+
+def dumps(root, name=None):
+    """Root Compound => uncompressed NBT"""
+    out = [bytes((TAG_COMPOUND,))]
+    _writeString(out, getattr(root, "name", "") if name is None else name)
+    _writeValue(out, TAG_COMPOUND, root)
+    return b"".join(out)
+
+def readFile(path):
+    """Reads a gzip (or zlib, or uncompressed) NBT file like level.dat => root Compound"""
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:2] == b"\x1f\x8b":
+        data = gzip.decompress(data)
+    elif data[:1] == b"\x78":
+        data = zlib.decompress(data)
+    return loads(data)
+
+def writeFile(path, root):
+    """Writes a root Compound as a gzip compressed NBT file"""
+    with open(path, "wb") as f:
+        f.write(gzip.compress(dumps(root)))
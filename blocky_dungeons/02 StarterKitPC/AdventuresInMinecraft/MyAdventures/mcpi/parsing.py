@@ -0,0 +1,82 @@
+from .vec3 import Vec3
+from .event import BlockEvent, ChatEvent, ProjectileEvent
+from .entity import Entity
+from .block import Block
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+""" Decoding of the server replies
+
+    Every reply is split once. The parse* functions build the objects
+    returned by mcpi.minecraft. blocksArray and entitiesArray decode large
+    replies (region scans, entity sweeps) straight into NumPy arrays
+    instead of one Python object per value. NumPy is only needed by those
+    two functions.
+"""
+
+ENTITY_DTYPE = [("id", "i4"), ("typeId", "i4"), ("typeName", "U32"),
+                ("x", "f8"), ("y", "f8"), ("z", "f8")]
+
+def _requireNumpy():
+    if numpy is None:
+        raise ImportError("numpy is required to decode replies into arrays")
+
+def parseFloatVec3(s):
+    return Vec3(*list(map(float, s.split(","))))
+
+def parseIntVec3(s):
+    return Vec3(*list(map(int, s.split(","))))
+
+def parseBlock(s):
+    return Block(*list(map(int, s.split(","))))
+
+def parseBlocks(s):
+    """Reply of world.getBlocks => [id:int]"""
+    return list(map(int, s.split(","))) if s else []
+
+def parseEntities(s):
+    """Reply of *.getEntities => [[entityId:int,entityTypeId:int,entityTypeName:str,posX:float,posY:float,posZ:float]]"""
+    entities = [e.split(",") for e in s.split("|") if e]
+    return [[int(n[0]), int(n[1]), n[2], float(n[3]), float(n[4]), float(n[5])] for n in entities]
+
+def parseBlockHits(s):
+    events = [e for e in s.split("|") if e]
+    return [BlockEvent.Hit(*list(map(int, e.split(",")))) for e in events]
+
+def parseChatPosts(s):
+    events = [e.split(",", 1) for e in s.split("|") if e]
+    return [ChatEvent.Post(int(e[0]), e[1]) for e in events]
+
+def parseProjectileHits(s):
+    events = [e.split(",") for e in s.split("|") if e]
+    return [ProjectileEvent.Hit(int(e[0]), int(e[1]), int(e[2]), int(e[3]), e[4], e[5]) for e in events]
+
+def parseEntityTypes(s):
+    types = [t.split(",", 1) for t in s.split("|") if t]
+    return [Entity(int(e[0]), e[1]) for e in types]
+
+def blocksArray(s, x0, y0, z0, x1, y1, z1):
+    """
+    Reply of world.getBlocks(x0,y0,z0,x1,y1,z1) => numpy uint16 array shaped (dx,dy,dz)
+
+    The array is indexed [x-min(x0,x1), y-min(y0,y1), z-min(z0,z1)].
+    """
+    _requireNumpy()
+    dx = abs(x1 - x0) + 1
+    dy = abs(y1 - y0) + 1
+    dz = abs(z1 - z0) + 1
+    ids = numpy.fromstring(s, dtype=numpy.uint16, sep=",") if s else numpy.zeros(0, numpy.uint16)
+    # RaspberryJuice sends the blocks y first, then x, then z
+    return numpy.ascontiguousarray(ids.reshape(dy, dx, dz).transpose(1, 0, 2))
+
+def entitiesArray(s):
+    """Reply of *.getEntities => numpy structured array of ENTITY_DTYPE"""
+    _requireNumpy()
+    fields = s.strip("|").replace("|", ",").split(",") if s.strip("|") else []
+    entities = numpy.empty(len(fields) // 6, dtype=ENTITY_DTYPE)
+    for i, (name, _) in enumerate(ENTITY_DTYPE):
+        entities[name] = fields[i::6]
+    return entities
@@ -0,0 +1,136 @@
+import contextlib
+import threading
+from .connection import Connection
+from .stats import ConnectionStats
+from .util import flatten
+
+""" Pool of connections to the same RaspberryJuice server
+
+    RaspberryJuice executes a limited number of commands per tick and per
+    session, so spreading independent block writes over several sessions
+    lets the server apply them in parallel.
+
+    A ConnectionPool can be used wherever a Connection is expected
+    (Minecraft(ConnectionPool(...)) or Minecraft.createPool()).
+    world.setBlock and world.setBlocks are routed by the columns (x,z) they
+    touch: a write touching columns that another session wrote since its
+    last confirmation goes to that same session, so the commands that touch
+    the same region keep their order. When a write overlaps the pending
+    writes of several sessions, those sessions are synchronized first (one
+    round trip each). The pending writes are kept as (x,z) rectangles
+    indexed by the chunks they touch, so a large setBlocks costs one entry
+    per chunk, not one per column. Queries synchronize every session with pending writes
+    before being sent, so they always see the result of the previous writes.
+    Every other command goes through the first connection, after the same
+    synchronization (a player teleported or a sign written only once the
+    blocks around them are placed), except chat.post which never waits.
+    The routing state is shared under a lock, so a pool can be used by
+    several threads.
+"""
+
+WRITE_COMMANDS = (b"world.setBlock", b"world.setBlocks")
+UNORDERED_COMMANDS = (b"chat.post",)
+
+class ConnectionPool:
+    """Several connections to a Minecraft Pi game used as one"""
+    def __init__(self, address, port, size=4, pipelined=False):
+        self.connections = [Connection(address, port, pipelined) for _ in range(size)]
+        self.primary = self.connections[0]
+        self.owners = {}                          # chunk (x>>4,z>>4) -> [(x0,z0,x1,z1,index of the session that wrote it)]
+        self.claims = [set() for _ in range(size)] # chunks written by each session since its last sync
+        self.next = 0
+        self.stats = None
+        self.lock = threading.RLock()
+
+    def send(self, f, *data):
+        if f in UNORDERED_COMMANDS:
+            self.primary.send(f, *data)
+            return
+        with self.lock:
+            if f in WRITE_COMMANDS:
+                self._sendWrite(f, data)
+                return
+            self._sync(None)
+            self.primary.send(f, *data)
+
+    def _sendWrite(self, f, data):
+        args = list(flatten(data))
+        if f == b"world.setBlock":
+            x0, z0 = x1, z1 = args[0], args[2]
+        else:
+            x0, x1 = sorted((args[0], args[3]))
+            z0, z1 = sorted((args[2], args[5]))
+        chunks = [(cx, cz) for cx in range(x0 >> 4, (x1 >> 4) + 1) for cz in range(z0 >> 4, (z1 >> 4) + 1)]
+
+        owners = {owner for chunk in chunks for bx0, bz0, bx1, bz1, owner in self.owners.get(chunk, ())
+                  if bx0 <= x1 and x0 <= bx1 and bz0 <= z1 and z0 <= bz1}
+        if not owners:
+            index = self.next
+            self.next = (self.next + 1) % len(self.connections)
+        else:
+            index = min(owners)
+            owners.discard(index)
+            if owners:
+                self.sync(owners)
+
+        box = (x0, z0, x1, z1, index)
+        for chunk in chunks:
+            self.owners.setdefault(chunk, []).append(box)
+        self.claims[index].update(chunks)
+        self.connections[index].send(f, args)
+
+    def sync(self, indexes=None):
+        """Waits until the server has applied every write sent on the given sessions (all by default)"""
+        with self.lock:
+            self._sync(indexes)
+
+    def _sync(self, indexes):
+        if indexes is None:
+            indexes = [i for i, claim in enumerate(self.claims) if claim]
+        replies = [self.connections[i].sendReceiveAsync(b"world.getHeight", 0, 0) for i in indexes]
+        for index, reply in zip(indexes, replies):
+            reply.result()
+            for chunk in self.claims[index]:
+                boxes = [box for box in self.owners[chunk] if box[4] != index]
+                if boxes:
+                    self.owners[chunk] = boxes
+                else:
+                    del self.owners[chunk]
+            self.claims[index].clear()
+
+    def sendReceive(self, *data):
+        with self.lock:
+            self.sync()
+            return self.primary.sendReceive(*data)
+
+    def sendReceiveAsync(self, *data, parse=None):
+        with self.lock:
+            self.sync()
+            return self.primary.sendReceiveAsync(*data, parse=parse)
+
+    def flush(self):
+        for connection in self.connections:
+            connection.flush()
+
+    def setPipelined(self, pipelined):
+        for connection in self.connections:
+            connection.setPipelined(pipelined)
+
+    @contextlib.contextmanager
+    def pipeline(self):
+        """Pipelines the commands of the calling thread on every session inside a with block"""
+        with contextlib.ExitStack() as stack:
+            for connection in self.connections:
+                stack.enter_context(connection.pipeline())
+            yield self
+
+    def enableStats(self, stats=None):
+        """Records the statistics of every session in the same ConnectionStats"""
+        self.stats = stats if stats is not None else ConnectionStats()
+        for connection in self.connections:
+            connection.enableStats(self.stats)
+        return self.stats
+
+    def close(self):
+        for connection in self.connections:
+            connection.close()
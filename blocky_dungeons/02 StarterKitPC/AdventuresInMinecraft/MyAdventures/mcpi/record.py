@@ -0,0 +1,182 @@
+import argparse
+import os
+import struct
+import time
+from .connection import Connection, Reply
+
+""" Wire-level record and replay of mcpi sessions
+
+    RecordingConnection logs every command sent and every reply received,
+    with its timestamp, to an append-only file. replay() sends a recorded
+    session again to a server, either as fast as possible or with the
+    original pacing, without running the program that produced it.
+
+    Record:  mc = Minecraft(RecordingConnection("session.rec", "localhost", 4711))
+    Replay:  python -m mcpi.record replay session.rec [--pacing]
+
+    File format: a header, then records made of a struct "<BdI"
+    (kind, seconds since the start of the session, payload length)
+    followed by the payload. Each connection starts with a SESSION record
+    holding "address:port". COMMAND and QUERY payloads are the exact bytes
+    sent (a QUERY waits for a reply), REPLY payloads the line received.
+"""
+
+MAGIC = b"MCPIREC1"
+RECORD = struct.Struct("<BdI")
+
+SESSION = 0
+COMMAND = 1
+QUERY = 2
+REPLY = 3
+
+KIND_NAMES = {SESSION: "session", COMMAND: "command", QUERY: "query", REPLY: "reply"}
+
+class RecordingConnection(Connection):
+    """Connection logging everything it sends and receives to a file"""
+    def __init__(self, path, address, port, pipelined=False, **kwargs):
+        Connection.__init__(self, address, port, pipelined, **kwargs)
+        self.recordFile = open(path, "ab")
+        if self.recordFile.tell() == 0:
+            self.recordFile.write(MAGIC)
+        self.recordStart = time.monotonic()
+        self.expectReply = False
+        self._record(SESSION, ("%s:%d"%(address, port)).encode("UTF-8"))
+
+    def _record(self, kind, payload):
+        self.recordFile.write(RECORD.pack(kind, time.monotonic() - self.recordStart, len(payload)))
+        self.recordFile.write(payload)
+
+    def _send(self, s):
+        self._record(QUERY if self.expectReply else COMMAND, s)
+        Connection._send(self, s)
+
+    def readline(self):
+        line = Connection.readline(self)
+        self._record(REPLY, line)
+        return line
+
+    def sendReceive(self, *data):
+        with self.lock:
+            self.expectReply = True
+            try:
+                return Connection.sendReceive(self, *data)
+            finally:
+                self.expectReply = False
+
+    def sendReceiveAsync(self, *data, parse=None):
+        with self.lock:
+            self.expectReply = True
+            try:
+                return Connection.sendReceiveAsync(self, *data, parse=parse)
+            finally:
+                self.expectReply = False
+
+    def close(self):
+        Connection.close(self)
+        self.recordFile.close()
+
+def readRecords(path):
+    """Yields the records of a file => (kind, timestamp, payload)"""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("%s is not an mcpi recording"%path)
+        while True:
+            header = f.read(RECORD.size)
+            if len(header) < RECORD.size:
+                return
+            kind, timestamp, size = RECORD.unpack(header)
+            yield kind, timestamp, f.read(size)
+
+class ReplayConnection(Connection):
+    """Connection sending already encoded commands"""
+    def sendRaw(self, s):
+        self._send(s)
+
+    def sendRawReceiveAsync(self, s):
+        self._send(s)
+        reply = Reply(self, s)
+        self.pending.append(reply)
+        return reply
+
+def replay(path, address="localhost", port=4711, pacing=False, speed=1.0, maxInFlight=1000):
+    """
+    Sends a recorded session again => {counter: value}
+
+    Without pacing, commands are pipelined and replies are only waited for
+    when maxInFlight queries are pending. With pacing, each command is sent
+    at its recorded time (divided by speed). Replies that differ from the
+    recording are counted as mismatches.
+    """
+    conn = ReplayConnection(address, port, pipelined=True)
+    expected = []
+    replies = []
+    counters = {"sessions": 0, "commands": 0, "queries": 0, "mismatches": 0}
+    start = time.monotonic()
+    sessionStart = start
+    for kind, timestamp, payload in readRecords(path):
+        if kind == SESSION:
+            counters["sessions"] += 1
+            sessionStart = time.monotonic()
+            continue
+        if kind == REPLY:
+            expected.append(payload.decode("UTF-8"))
+            continue
+        if pacing:
+            delay = sessionStart + timestamp / speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        if kind == QUERY:
+            counters["queries"] += 1
+            replies.append(conn.sendRawReceiveAsync(payload))
+            if len(conn.pending) >= maxInFlight:
+                conn.wait(conn.pending[0])
+        else:
+            counters["commands"] += 1
+            conn.sendRaw(payload)
+        if pacing:
+            conn.flush()
+    conn.wait()
+    counters["seconds"] = time.monotonic() - start
+    for reply, recorded in zip(replies, expected):
+        try:
+            value = reply.result()
+        except Exception:
+            value = Connection.RequestFailed
+        if value != recorded:
+            counters["mismatches"] += 1
+    conn.close()
+    return counters
+
+def summary(path):
+    """Counts the records of a file by kind and command => {name: count}"""
+    counts = {}
+    duration = 0.0
+    for kind, timestamp, payload in readRecords(path):
+        name = KIND_NAMES[kind]
+        if kind in (COMMAND, QUERY):
+            name = payload[:payload.find(b"(")].decode("UTF-8")
+        counts[name] = counts.get(name, 0) + 1
+        duration = max(duration, timestamp)
+    counts["duration (s)"] = round(duration, 3)
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay or inspect an mcpi recording")
+    parser.add_argument("action", choices=("replay", "info"))
+    parser.add_argument("path")
+    parser.add_argument("--address", default="localhost")
+    parser.add_argument("--port", type=int, default=4711)
+    parser.add_argument("--pacing", action="store_true", help="keep the recorded pacing instead of sending at full speed")
+    parser.add_argument("--speed", type=float, default=1.0, help="pacing speed factor")
+    args = parser.parse_args()
+    if not os.path.exists(args.path):
+        parser.error("%s does not exist"%args.path)
+    if args.action == "info":
+        result = summary(args.path)
+    else:
+        result = replay(args.path, args.address, args.port, args.pacing, args.speed)
+    for name, value in result.items():
+        print("%-24s %s"%(name, value))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import bisect
+import csv
+import io
+import json
+import threading
+
+""" Per-command statistics of a connection
+
+    Enabled with Minecraft.enableStats() (or Connection.enableStats()).
+    Every command counts its calls and the bytes it sent. Commands
+    waiting for a reply also count the bytes received and keep a
+    histogram of their round-trip latency. The counters are updated under
+    their own lock, so one ConnectionStats can be shared by the sessions
+    of a ConnectionPool.
+
+    Example:
+        stats = mc.enableStats()
+        ...
+        print(stats.toCSV())
+        stats.dump("stats.json")
+"""
+
+# upper bounds of the latency histogram buckets, in milliseconds (the last bucket has no bound)
+LATENCY_BUCKETS = (0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+class CommandStats:
+    """Counters of a single command"""
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.bytesSent = 0
+        self.replies = 0
+        self.bytesReceived = 0
+        self.latencyTotal = 0.0
+        self.latencyMax = 0.0
+        self.histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def asDict(self):
+        return {
+            "command": self.name,
+            "count": self.count,
+            "bytes_sent": self.bytesSent,
+            "replies": self.replies,
+            "bytes_received": self.bytesReceived,
+            "latency_mean_ms": self.latencyTotal / self.replies * 1000 if self.replies else 0.0,
+            "latency_max_ms": self.latencyMax * 1000,
+            "latency_histogram_ms": dict(zip(_bucketNames(), self.histogram)),
+        }
+
+class ConnectionStats:
+    """Statistics of every command sent through a connection"""
+    def __init__(self):
+        self.commands = {}
+        self.lock = threading.Lock()
+
+    def _command(self, name):
+        stats = self.commands.get(name)
+        if stats is None:
+            stats = self.commands[name] = CommandStats(name.decode("UTF-8"))
+        return stats
+
+    def recordSend(self, name, size):
+        with self.lock:
+            stats = self._command(name)
+            stats.count += 1
+            stats.bytesSent += size
+
+    def recordReply(self, name, size, latency):
+        bucket = bisect.bisect_left(LATENCY_BUCKETS, latency * 1000)
+        with self.lock:
+            stats = self._command(name)
+            stats.replies += 1
+            stats.bytesReceived += size
+            stats.latencyTotal += latency
+            stats.latencyMax = max(stats.latencyMax, latency)
+            stats.histogram[bucket] += 1
+
+    def reset(self):
+        with self.lock:
+            self.commands.clear()
+
+    def asDict(self):
+        """Commands sorted by bytes sent => {name: {counter: value}}"""
+        with self.lock:
+            ordered = sorted(self.commands.values(), key=lambda c: c.bytesSent, reverse=True)
+            return {c.name: c.asDict() for c in ordered}
+
+    def toJSON(self):
+        return json.dumps(self.asDict(), indent=2)
+
+    def toCSV(self):
+        output = io.StringIO()
+        writer = csv.writer(output)
+        buckets = _bucketNames()
+        writer.writerow(["command", "count", "bytes_sent", "replies", "bytes_received",
+                         "latency_mean_ms", "latency_max_ms"] + buckets)
+        for c in self.asDict().values():
+            writer.writerow([c["command"], c["count"], c["bytes_sent"], c["replies"], c["bytes_received"],
+                             "%.3f"%c["latency_mean_ms"], "%.3f"%c["latency_max_ms"]]
+                            + [c["latency_histogram_ms"][b] for b in buckets])
+        return output.getvalue()
+
+    def dump(self, path):
+        """Writes the statistics in a .csv file, or in JSON for any other extension"""
+        with open(path, "w", newline="") as f:
+            f.write(self.toCSV() if path.endswith(".csv") else self.toJSON())
+
+def _bucketNames():
+    return ["<=%g"%b for b in LATENCY_BUCKETS] + [">%g"%LATENCY_BUCKETS[-1]]
@@ -2,6 +2,8 @@ try:
     import collections.abc as collections
 except ImportError:
     import collections as collections
+from .block import Block
+from .vec3 import Vec3
 
 def flatten(l):
     for e in l:
@@ -9,12 +11,43 @@ def flatten(l):
             for ee in flatten(e): yield ee
         else: yield e
 
+def flatten_list(l, out=None):
+    """
+    Same result as list(flatten(l)), without generators.
+
+    The types sent on hot paths (int, float, str, list, tuple, Block, Vec3)
+    are recognized by their exact type before falling back to the slower
+    Iterable check.
+    """
+    if out is None:
+        out = []
+    append = out.append
+    for e in l:
+        t = type(e)
+        if t is int or t is float or t is str:
+            append(e)
+        elif t is list or t is tuple:
+            flatten_list(e, out)
+        elif t is Block:
+            append(e.id)
+            append(e.data)
+        elif t is Vec3:
+            append(e.x)
+            append(e.y)
+            append(e.z)
+        elif isinstance(e, collections.Iterable) and not isinstance(e, str):
+            flatten_list(e, out)
+        else:
+            append(e)
+    return out
+
 def flatten_parameters_to_bytestring(l):
-    return b",".join(map(_misc_to_bytes, flatten(l)))
+    # one encode for the whole line gives the same bytes as encoding each parameter
+    return ",".join(map(str, flatten_list(l))).encode("UTF-8")
 
 def _misc_to_bytes(m):
     """
-    Convert an arbitrary object into a string encoded as a UTF-8 series of bytes. 
+    Convert an arbitrary object into a string encoded as a UTF-8 series of bytes.
 
     See `Connection.send` for more details.
     """
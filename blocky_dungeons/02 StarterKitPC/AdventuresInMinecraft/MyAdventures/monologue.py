@@ -0,0 +1,54 @@
+'''
+Texte du monologue du Maître du Donjon de BLOCKY DUNGEONS.
+
+Chaque réplique est donnée avec le moment où elle est envoyée dans le chat,
+en secondes depuis le début du monologue. {donjon_name} est remplacé par le nom du donjon.
+Le monologue est joué par une Timeline (voir scheduler.py) sans bloquer le programme.
+'''
+
+EVIL_MONOLOGUE = (
+    (0, "(evil deep voice) Vous voila. pauvre mortel. enferme dans {donjon_name} ! Piege dans mon terrible donjon !"),
+    (7, "(evil Gandalf voice) Vous. n'en. sortirez. PAAAS !"),
+    (13.5, "(evil laugh) MUAHAHAHAHAHAHAHAHAHAHAHAHAHAHAHAHAHAHAH !"),
+    (28.5, "(evil deep voice) Et vous savez pourquoi vous etes enferme ici, entoure de dangers ?"),
+    (36.5, "Parce que c'est rigolo ! C'est fun. C'est amusant. les donjons et les aventuriers qui risquent leur vie."),
+    (43.5, "Amusez-vous bien MUAHAHAHAHAHA."),
+    (78.5, "Vous etes toujours vivant ??"),
+    (85.5, "D'ailleurs. vous savez ce qu'il y a de bien avec ce monde ?"),
+    (93.5, "Les aventuriers comme vous reapparaissent apres leur mort."),
+    (100, "Ce qui me permet de les tuer plein de fois et de pleins de facons differentes."),
+    (135, "Au fait. desole pour les salles vides hein."),
+    (141.5, "Il y a eu une greve des monstres recemment."),
+    (148, "Ils exigent des garanties lors de blessures ou mort causees par les pieges du donjon ..."),
+    (154.5, "Quand meme. les propres pieges de mon donjon ! Ils pourraient faire attention a ou ils marchent."),
+    (169.5, "Tiens. ca me fait penser que vous devez trouver les pieges un peu redondants."),
+    (176, "Je suis d'accord. J'ai eu pleeiinns d'idees tres amusantes. mais..."),
+    (182.5, "Vous etes arrives avant que je finisse."),
+    (189.5, "Dommage pour vous."),
+    (234.5, "Vous. Vous etes pas bien bavard hein ?"),
+    (241.5, "J'en ai connu des qui criaient a la moindre occasion."),
+    (251.5, "Enfin. vous au moins vous visitez. Ca fait plaisir de voir qu'on respecte mon travail."),
+    (258.5, "La plupart des autres se suicident ou meurent betement sans avoir vu la moitie des salles."),
+    (265, "Il y en a meme un qui est mort juste devant la sortie. Quel dommage MUAHAHAAHA."),
+    (273, "Euh... Je veux dire. non. bien sur que non il n'y a pas de sortie."),
+    (308, "Oh. je ne sais pas si vous avez ouvert un coffre ?"),
+    (314.5, "Vous etes decu hein ?"),
+    (321, "Vos collegues aventuriers ont tout pris."),
+    (327.5, "Ca coute cher de refournir le donjon a chaque fois."),
+    (334, "Et cette annee on est en budget limite."),
+    (341, "C'est bien triste."),
+    (381, "Zut. j'ai pas scale la pression dans tout le donjon..."), # mauvaise blague, désolé.
+    (387.5, "Certaines salles ont un peu plus de Pascales que les autres."),
+    (396.5, "Quoi ? Pourquoi vous faites cette tete ?"),
+    (403, "Vous vous appelez Pascale peut-etre ?"),
+    (411, "Je... euh... desole."),
+    (418, "Vous savez. j'ai pas de nom moi."),
+    (424.5, "Je suis juste le mechant du donjon."),
+    (431, "Personne ne me connais."),
+    (438, "Ceux qui connaissent l'existance du donjon me craignent et font de moi un monstre sanguinaire."),
+    (444.5, "Alors que je suis juste un demon."),
+    (451.5, "Les seuls comme vous avec qui je peux discuter un peu ne ressortent jamais."),
+    (459.5, "D'un autre cote. les pieges et les aventuriers coinces dans des donjon sont tellement amusants !"),
+    (467.5, "Le Maitre du Donjon s'amuse et amuse ses victimes... non je veux dire ses joueurs... au prix de sa solitude."),
+    (474.5, "C'est le seul à connaitre vraiment les regles. C'est lui qui les invente. Et il les subit."),
+)
@@ -0,0 +1,78 @@
+'''
+Cache sur disque des plans de donjon de BLOCKY DUNGEONS.
+
+Un plan ne dépend que de sa graine et de quelques paramètres de dungeons_settings.py.
+Une fois calculé, il est enregistré déjà regroupé en pavés (voir mcpi/voxel.py) et relatif à la
+salle d'apparition : reconstruire le même donjon, au même endroit ou ailleurs, n'a plus besoin
+ni de le planifier ni de le compiler. Les noms des étapes (qui contiennent le centre de leur salle)
+sont relatifs eux aussi.
+
+Fichier : un JSON {"version", "key", "steps": [[nom, délai, [x0, y0, z0, x1, y1, z1, id, data, ...]], ...]}
+'''
+
+import hashlib
+import json
+import os
+import re
+
+CACHE_VERSION = 3 # à augmenter dès que la génération des salles change
+
+POSITION = re.compile(r'\((-?\d+), (-?\d+), (-?\d+)\)') # un centre de salle dans le nom d'une étape
+
+
+def plan_key(seed, dungeon_size, room_size, order, palette):
+    """
+    Renvoie la clé d'un plan.
+    palette : blocs utilisés par le donjon (murs, sol, plafond, bois)
+    """
+    description = repr((CACHE_VERSION, seed, dungeon_size, room_size, order,
+                        tuple((b.id, b.data) for b in palette)))
+    return hashlib.sha1(description.encode('utf-8')).hexdigest()
+
+def plan_path(directory, key):
+    """Chemin du fichier d'un plan. Un dossier relatif l'est par rapport à ce fichier."""
+    if not os.path.isabs(directory):
+        directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), directory)
+    return os.path.join(directory, key + '.json')
+
+def move_name(name, dx, dy, dz):
+    """Renvoie le nom d'une étape dont les positions sont décalées de (dx, dy, dz)"""
+    def moved(match):
+        x, y, z = map(int, match.groups())
+        return str((x + dx, y + dy, z + dz))
+    return POSITION.sub(moved, name)
+
+def save_plan(directory, key, origin, steps):
+    """
+    Enregistre des étapes compilées (nom, pavés, délai avant leur envoi),
+    en coordonnées relatives à origin, le centre de la salle d'apparition.
+    """
+    ox, oy, oz = origin
+    data = []
+    for name, boxes, delay in steps:
+        flat = []
+        for x0, y0, z0, x1, y1, z1, id, block_data in boxes:
+            flat.extend((x0-ox, y0-oy, z0-oz, x1-ox, y1-oy, z1-oz, id, block_data))
+        data.append([move_name(name, -ox, -oy, -oz), delay, flat])
+    path = plan_path(directory, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'w') as f:
+        json.dump({'version': CACHE_VERSION, 'key': key, 'steps': data}, f, separators=(',', ':'))
+    os.replace(path + '.tmp', path) # un plan à moitié écrit n'est jamais relu
+
+def load_plan(directory, key, origin):
+    """Renvoie les étapes compilées d'un plan en cache, replacées autour de origin, ou None s'il n'existe pas"""
+    path = plan_path(directory, key)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        data = json.load(f)
+    if data.get('version') != CACHE_VERSION or data.get('key') != key:
+        return None
+    ox, oy, oz = origin
+    offset = (ox, oy, oz, ox, oy, oz, 0, 0)
+    steps = []
+    for name, delay, flat in data['steps']:
+        boxes = [tuple(v + o for v, o in zip(flat[i:i+8], offset)) for i in range(0, len(flat), 8)]
+        steps.append((move_name(name, ox, oy, oz), boxes, delay))
+    return steps
@@ -0,0 +1,151 @@
+'''
+Décorations préfabriquées de BLOCKY DUNGEONS.
+
+Chaque décoration (flambeau, pilier, cuve, chute de liquide) est dessinée une seule fois, autour
+de son point d'ancrage (0, 0, 0), puis regroupée en pavés (voir mcpi/voxel.py). La poser dans une
+salle revient à décaler ces pavés : aucun bloc n'est recalculé, quel que soit le nombre de décorations.
+
+Les rotations sont calculées une fois aussi, en remettant dans le bon sens les escaliers et les torches.
+
+Exemple :
+    get_prefab('pillar', 8).stamp(room.world, x, y, z)
+    get_prefab('pillar', 8, turns=1)     # le même pilier, tourné d'un quart de tour
+'''
+
+import functools
+import mcpi.block as block
+from mcpi.voxel import VoxelBuffer
+
+# directions, dans le sens d'un quart de tour (vu du dessus, de +x vers +z)
+DIRECTIONS = ('+x', '+z', '-x', '-z')
+OFFSETS = {'+x': (1, 0), '+z': (0, 1), '-x': (-1, 0), '-z': (0, -1)}
+OPPOSITE = {'+x': '-x', '-x': '+x', '+z': '-z', '-z': '+z'}
+
+# data d'un escalier qui monte vers une direction (+4 : escalier à l'envers)
+STAIRS_DATA = {'+x': 0, '-x': 1, '+z': 2, '-z': 3}
+STAIRS_UPSIDE_DOWN = 4
+# data d'une torche posée contre un mur, pointant vers une direction (5 : torche posée au sol)
+TORCH_DATA = {'+x': 1, '-x': 2, '+z': 3, '-z': 4}
+
+STAIRS_IDS = {b.id for b in (block.STAIRS_WOOD, block.STAIRS_COBBLESTONE, block.STAIRS_BRICK,
+                             block.STAIRS_STONE_BRICK, block.STAIRS_NETHER_BRICK, block.STAIRS_SANDSTONE)}
+TORCH_IDS = {block.TORCH.id, block.TORCH_REDSTONE.id, block.TORCH_REDSTONE.id - 1} # 75 : torche de redstone éteinte
+
+
+def _turn(direction, turns):
+    return DIRECTIONS[(DIRECTIONS.index(direction) + turns) % 4]
+
+def _rotation_table(data_of, turns, mask=15):
+    """data -> data après <turns> quarts de tour, pour un bloc orienté par data_of"""
+    table = list(range(16))
+    for direction, data in data_of.items():
+        for flags in range(0, 16, mask + 1):
+            table[data | flags] = data_of[_turn(direction, turns)] | flags
+    return table
+
+# tables de rotation, calculées une fois : ROTATIONS[quarts de tour][famille de blocs][data]
+ROTATIONS = [{'stairs': _rotation_table(STAIRS_DATA, turns, mask=3), 'torch': _rotation_table(TORCH_DATA, turns)}
+             for turns in range(4)]
+
+
+class Prefab:
+    '''
+    Décoration compilée : pavés (x0, y0, z0, x1, y1, z1, id, data) relatifs à son point d'ancrage.
+    '''
+    __slots__ = ('name', 'boxes')
+
+    def __init__(self, name, boxes):
+        self.name = name
+        self.boxes = tuple(boxes)
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def rotated(self, turns):
+        """Renvoie la décoration tournée de <turns> quarts de tour autour de l'axe vertical de son ancrage"""
+        turns %= 4
+        stairs = ROTATIONS[turns]['stairs']
+        torch = ROTATIONS[turns]['torch']
+        boxes = []
+        for x0, y0, z0, x1, y1, z1, id, data in self.boxes:
+            for _ in range(turns):
+                x0, z0, x1, z1 = -z0, x0, -z1, x1 # (x, z) -> (-z, x) : +x devient +z
+            if id in STAIRS_IDS:
+                data = stairs[data]
+            elif id in TORCH_IDS:
+                data = torch[data]
+            boxes.append((min(x0, x1), y0, min(z0, z1), max(x0, x1), y1, max(z0, z1), id, data))
+        return Prefab(self.name, boxes)
+
+    def stamp(self, buffer, x, y, z):
+        """Pose la décoration en (x, y, z) dans un VoxelBuffer, en une seule fois"""
+        buffer.ops.extend((x0+x, y0+y, z0+z, x1+x, y1+y, z1+z, id, data)
+                          for x0, y0, z0, x1, y1, z1, id, data in self.boxes)
+
+
+PREFABS = {} # nom -> fonction qui dessine la décoration dans un VoxelBuffer, selon ses paramètres
+
+def prefab(name):
+    """Décorateur : enregistre une fonction de dessin de décoration sous un nom"""
+    def register(draw):
+        PREFABS[name] = draw
+        return draw
+    return register
+
+@functools.lru_cache(maxsize=None)
+def get_prefab(name, *params, turns=0):
+    """Renvoie la décoration <name> compilée pour ces paramètres, calculée au premier appel seulement"""
+    if turns % 4:
+        return get_prefab(name, *params).rotated(turns)
+    buffer = VoxelBuffer()
+    PREFABS[name](buffer, *params)
+    return Prefab(name, buffer.compile())
+
+
+def ground_safe(world, y):
+    """Zone de blocs servant de base aux objets potentiellement générés au dessus des lacs"""
+    world.setBlocks(-1, y, -1, 1, y, 1, block.STONE_BRICK)
+    world.setBlocks(-1, y-10, -1, 1, y-1, 1, block.MOSS_STONE)
+
+def stairs_ring(world, y, stairs, upside_down=False):
+    """Quatre escaliers autour de l'ancrage, montant vers lui"""
+    for direction in DIRECTIONS:
+        dx, dz = OFFSETS[direction]
+        world.setBlock(dx, y, dz, stairs.id, STAIRS_DATA[OPPOSITE[direction]] | (STAIRS_UPSIDE_DOWN if upside_down else 0))
+
+@prefab('fire')
+def draw_fire(world):
+    """pilier-flambeau avec du feu en haut"""
+    ground_safe(world, -1)
+    stairs_ring(world, 0, block.STAIRS_COBBLESTONE)
+    world.setBlock(0, 1, 0, block.STONE_BRICK, 3)
+    world.setBlock(0, 2, 0, block.NETHERRACK)
+    stairs_ring(world, 2, block.STAIRS_COBBLESTONE, upside_down=True)
+    world.setBlock(0, 3, 0, block.FIRE)
+
+@prefab('pillar')
+def draw_pillar(world, height):
+    """pilier de soutien du sol au plafond d'une salle de hauteur <height>"""
+    ground_safe(world, -1)
+    stairs_ring(world, 0, block.STAIRS_SANDSTONE)
+    world.setBlocks(0, 1, 0, 0, height-2, 0, block.NETHER_BRICK)
+    for direction in DIRECTIONS:
+        dx, dz = OFFSETS[direction]
+        world.setBlock(dx, height//2, dz, block.TORCH.id, TORCH_DATA[direction])
+    stairs_ring(world, height-2, block.STAIRS_SANDSTONE, upside_down=True)
+
+@prefab('cuve')
+def draw_cuve(world, liquid):
+    """cuve de liquide"""
+    ground_safe(world, -1)
+    stairs_ring(world, 0, block.STAIRS_COBBLESTONE)
+    world.setBlock(0, 0, 0, liquid)
+    world.setBlock(0, -1, 0, block.GLOWSTONE_BLOCK)
+
+@prefab('fall')
+def draw_fall(world, height, liquid, frozen):
+    """chute de liquide depuis le plafond d'une salle de hauteur <height>, gelée sur toute sa hauteur si <frozen>"""
+    world.setBlocks(0, -1, 0, 0, height-1, 0, block.AIR)
+    world.setBlock(0, height-1, 0, liquid)
+    if frozen:
+        world.setBlocks(0, -11, 0, 0, height-1, 0, liquid)
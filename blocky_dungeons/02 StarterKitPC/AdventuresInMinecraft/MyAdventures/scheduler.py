@@ -0,0 +1,116 @@
+'''
+Actions différées de BLOCKY DUNGEONS.
+
+Certaines étapes de construction doivent attendre avant d'être envoyées (la lave doit couler avant
+que le plafond soit refermé). Au lieu de bloquer tout le programme avec time.sleep, l'étape est
+confiée à une roue temporelle (TimerWheel) et la construction des autres salles continue.
+Le Builder fait tourner la roue entre deux étapes, puis attend la dernière action à la fin.
+
+Exemple :
+    wheel = TimerWheel()
+    wheel.schedule(1.5, lambda: print('1.5 s plus tard'))
+    ...                 # autre travail, en appelant wheel.advance() de temps en temps
+    wheel.run()         # attend et lance les actions restantes
+
+Une Timeline joue une suite d'actions datées (le monologue du Maître du Donjon) sur un fil d'exécution
+à part : le programme principal continue pendant ce temps, sur la même connexion au serveur.
+'''
+
+import threading
+import time
+
+
+class TimerWheel:
+    '''
+    Roue temporelle : les actions sont rangées dans la case du tic où elles doivent être lancées.
+    Avancer la roue ne parcourt que les cases des tics écoulés, quel que soit le nombre d'actions en attente.
+
+    INPUTS
+    - tick : durée d'une case, en secondes (précision des délais)
+    - slots : nombre de cases. Une action plus lointaine que slots*tick fait plusieurs tours de roue.
+    - clock, sleep : horloge et attente utilisées (time.monotonic et time.sleep par défaut)
+    '''
+    def __init__(self, tick=0.05, slots=64, clock=None, sleep=None):
+        self.tick = tick
+        self.slots = [[] for _ in range(slots)]
+        self.clock = clock or time.monotonic
+        self.sleep = sleep or time.sleep
+        self.start = self.clock()
+        self.current = 0 # prochain tic à traiter
+        self.pending = 0
+        self.count = 0 # numéro d'ordre : deux actions du même tic sont lancées dans l'ordre où elles ont été prévues
+
+    def __len__(self):
+        return self.pending
+
+    def _now(self):
+        """Tic en cours"""
+        return int((self.clock() - self.start) / self.tick)
+
+    def schedule(self, delay, action):
+        """Lance action() dans <delay> secondes (au plus tôt, au premier advance() qui suit)"""
+        due = max(self.current, -int(-(self.clock() - self.start + delay) // self.tick))
+        self.slots[due % len(self.slots)].append((due, self.count, action))
+        self.count += 1
+        self.pending += 1
+
+    def advance(self):
+        """Lance les actions arrivées à échéance. Renvoie le nombre d'actions lancées."""
+        now = self._now()
+        if not self.pending:
+            self.current = now + 1
+            return 0
+        done = 0
+        while self.current <= now and self.pending:
+            slot = self.slots[self.current % len(self.slots)]
+            due = sorted(entry for entry in slot if entry[0] <= self.current)
+            if due:
+                slot[:] = [entry for entry in slot if entry[0] > self.current]
+                self.pending -= len(due)
+                for _, _, action in due:
+                    action()
+                done += len(due)
+            self.current += 1
+        return done
+
+    def next_due(self):
+        """Délai en secondes avant la prochaine action, ou None s'il n'y en a plus"""
+        if not self.pending:
+            return None
+        due = min(entry[0] for slot in self.slots for entry in slot)
+        return max(0.0, due * self.tick - (self.clock() - self.start))
+
+    def run(self):
+        """Attend et lance toutes les actions restantes, y compris celles qu'elles prévoient"""
+        while self.pending:
+            self.sleep(self.next_due())
+            self.advance()
+
+
+class Timeline(threading.Thread):
+    '''
+    Joue des événements (moment en secondes depuis le début, valeur) en appelant action(valeur)
+    au bon moment, sur un fil d'exécution à part.
+
+    Le programme ne se termine qu'une fois la Timeline finie, sauf si daemon=True.
+    stop() l'interrompt avant la fin.
+    '''
+    def __init__(self, events, action, daemon=False):
+        threading.Thread.__init__(self, name='Timeline', daemon=daemon)
+        self.events = list(events)
+        self.action = action
+        self.stopped = threading.Event()
+
+    def run(self):
+        # l'attente est interrompue dès que stop() est appelé
+        wheel = TimerWheel(tick=0.1, slots=512, sleep=self.stopped.wait)
+        for offset, value in self.events:
+            wheel.schedule(offset, lambda value=value: self.action(value))
+        while len(wheel) and not self.stopped.is_set():
+            wheel.sleep(wheel.next_due())
+            if not self.stopped.is_set():
+                wheel.advance()
+
+    def stop(self):
+        """Interrompt la Timeline : les événements pas encore joués ne le seront pas"""
+        self.stopped.set()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the programs and mcpi are imported from MyAdventures, as when they are run
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,67 @@
+import os
+
+import pytest
+
+from mcpi import nbt
+from mcpi.anvil import AnvilWorld, AnvilReader
+
+numpy = pytest.importorskip("numpy")
+
+SPAWN = (500, 64, -20) # near the border of the regions r.0.* and r.1.*
+
+# cuboids crossing chunk and region borders, overlapping, some with data, the last one digging air
+WRITES = [
+    (-20, -4, -20, 20, 4, 20, 1, 0),
+    (5, 0, 14, 30, 10, 40, 98, 2),
+    (-3, 6, -3, 3, 6, 3, 35, 14),
+    (11, 3, 11, 11, 3, 11, 89, 0),
+    (-10, 1, -10, 10, 3, 10, 0, 0),
+]
+
+@pytest.fixture
+def world_dir(tmp_path):
+    level = nbt.Compound()
+    data = nbt.Compound()
+    data["SpawnX"], data["SpawnY"], data["SpawnZ"] = SPAWN
+    level["Data"] = data
+    nbt.writeFile(str(tmp_path / "level.dat"), level)
+    return str(tmp_path)
+
+def expected_ids(box):
+    """Ids of box (x0,y0,z0,x1,y1,z1) after WRITES, in an empty world => array [y, x, z]"""
+    x0, y0, z0, x1, y1, z1 = box
+    ids = numpy.zeros((y1 - y0 + 1, x1 - x0 + 1, z1 - z0 + 1), numpy.uint16)
+    for wx0, wy0, wz0, wx1, wy1, wz1, id, _ in WRITES:
+        ids[max(wy0, y0) - y0:min(wy1, y1) - y0 + 1,
+            max(wx0, x0) - x0:min(wx1, x1) - x0 + 1,
+            max(wz0, z0) - z0:min(wz1, z1) - z0 + 1] = id
+    return ids
+
+def test_write_then_read(world_dir):
+    with AnvilWorld(world_dir) as world:
+        for write in WRITES:
+            world.setBlocks(*write)
+        assert world.save() > 0
+    assert os.path.exists(os.path.join(world_dir, "region", "r.0.-1.mca"))
+    assert os.path.exists(os.path.join(world_dir, "region", "r.1.0.mca"))
+
+    box = (-25, -6, -25, 35, 12, 45)
+    with AnvilReader(world_dir) as reader:
+        assert (reader.blocks(*box) == expected_ids(box)).all()
+        assert reader.getBlock(11, 3, 11) == 89
+
+    # the data values are kept too, and the world can be written again
+    with AnvilWorld(world_dir) as world:
+        assert world.created == 0
+        block = world.getBlockWithData(0, 2, 0)
+        assert (block.id, block.data) == (0, 0)
+        block = world.getBlockWithData(20, 5, 30)
+        assert (block.id, block.data) == (98, 2)
+        block = world.getBlockWithData(-3, 6, -3)
+        assert (block.id, block.data) == (35, 14)
+
+def test_unsaved_writes_are_dropped(world_dir):
+    with AnvilWorld(world_dir) as world:
+        world.setBlocks(0, 0, 0, 5, 5, 5, 1)
+    with AnvilReader(world_dir) as reader:
+        assert not reader.blocks(0, 0, 0, 5, 5, 5).any()
@@ -0,0 +1,76 @@
+import random
+
+import mcpi.block as block
+from mcpi.cache import CachedMinecraft, DATA_KNOWN, WORLD_HEIGHT
+from mcpi.connection import Connection
+from mcpi.fakeserver import FakeServer
+
+def cached(server, maxChunks=1024):
+    return CachedMinecraft(Connection("localhost", server.port), maxChunks)
+
+def test_written_blocks_need_no_round_trip():
+    with FakeServer(port=0) as server:
+        mc = cached(server)
+        mc.setBlocks(0, 60, 0, 20, 70, 20, block.WOOL.id, 4)
+        assert mc.getBlockWithData(10, 65, 20) == block.Block(block.WOOL.id, 4)
+        assert mc.getBlock(0, 60, 0) == block.WOOL.id
+        assert mc.cacheStats()["hits"] == 2 and mc.fetches == 0
+        # a block never written is fetched with its whole chunk
+        assert mc.getBlock(30, 50, 30) == server.world.getBlock(30, 50, 30)
+        assert mc.getBlock(31, 51, 29) == server.world.getBlock(31, 51, 29)
+        assert mc.fetches == 1 and mc.misses == 1
+        mc.conn.close()
+
+def test_least_recently_used_chunk_is_evicted():
+    with FakeServer(port=0) as server:
+        mc = cached(server, maxChunks=2)
+        mc.setBlock(0, 70, 0, block.STONE)
+        mc.setBlock(16, 70, 0, block.STONE)
+        mc.getBlock(0, 70, 0) # the chunk at x=0 is used again...
+        mc.setBlock(32, 70, 0, block.STONE) # ...so the one at x=16 is evicted
+        assert set(mc.chunks) == {(0, 4, 0), (2, 4, 0)}
+        assert mc.getBlock(16, 70, 0) == block.STONE.id # read back from the server
+        assert mc.fetches == 1
+        mc.conn.close()
+
+def test_invalidate_reads_the_server_again():
+    with FakeServer(port=0) as server:
+        mc = cached(server)
+        mc.setBlocks(0, 70, 0, 3, 70, 3, block.STONE)
+        mc.getHeight(0, 0) # the writes are applied
+        server.world.setBlock(1, 70, 1, block.GOLD_BLOCK.id) # changed by someone else
+        assert mc.getBlock(1, 70, 1) == block.STONE.id
+        mc.invalidate(1, 70, 1, 1, 70, 1)
+        assert mc.getBlock(1, 70, 1) == block.GOLD_BLOCK.id
+        assert mc.getBlock(2, 70, 2) == block.STONE.id
+        mc.invalidate()
+        assert not mc.chunks
+        mc.conn.close()
+
+def expected_known(mc, x0, y0, z0, x1, y1, z1):
+    """knownBlocks, block by block"""
+    result = []
+    for y in range(y0, y1 + 1):
+        for x in range(x0, x1 + 1):
+            for z in range(z0, z1 + 1):
+                known = mc._known(x, y, z, DATA_KNOWN) if 0 <= y < WORLD_HEIGHT else None
+                result.append(-1 if known is None else known.id << 4 | known.data)
+    return result
+
+def test_known_blocks_across_chunks():
+    with FakeServer(port=0) as server:
+        mc = cached(server)
+        rng = random.Random(5)
+        for _ in range(40):
+            x0, y0, z0 = rng.randint(-40, 40), rng.randint(-5, 260), rng.randint(-40, 40)
+            mc.setBlocks(x0, y0, z0, x0 + rng.randint(0, 20), y0 + rng.randint(0, 5), z0 + rng.randint(0, 20),
+                         rng.randint(1, 100), rng.randint(0, 15))
+        mc.invalidate(-10, 0, -10, 10, 255, 10)
+        mc.batchGetBlocks([(50, 60, 50)]) # ids known, data unknown
+        box = (-45, -3, -45, 65, 262, 65)
+        expected = expected_known(mc, *box)
+        assert -1 in expected and len(set(expected)) > 10
+        assert mc.knownBlocks(*box) == expected
+        assert mc.knownBlocks(65, 262, 65, -45, -3, -45) == expected
+        assert mc.knownBlocks(0, 300, 0, 3, 310, 3) == [-1] * 176
+        mc.conn.close()
@@ -0,0 +1,143 @@
+import contextlib
+import socket
+import threading
+import time
+
+import pytest
+
+import mcpi.block as block
+from mcpi.connection import Connection, RequestError
+from mcpi.fakeserver import FakeServer
+from mcpi.minecraft import Minecraft
+
+def waitFor(condition, timeout=2.0):
+    end = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > end:
+            return False
+        time.sleep(0.01)
+    return True
+
+@contextlib.contextmanager
+def scripted(replies, requests, hangUp=False):
+    """
+    Connection to a server that waits for `requests` command lines, then
+    sends each chunk of `replies` separately => (connection, received lines)
+    """
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(("localhost", 0))
+    listener.listen(1)
+    received = []
+
+    def serve():
+        sock, _ = listener.accept()
+        with sock:
+            data = b""
+            while data.count(b"\n") < requests:
+                data += sock.recv(4096)
+            received.extend(data.splitlines())
+            for chunk in replies:
+                sock.sendall(chunk)
+                time.sleep(0.02)
+            if not hangUp:
+                sock.recv(1) # until the client closes
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    connection = Connection("localhost", listener.getsockname()[1])
+    try:
+        yield connection, received
+    finally:
+        connection.close()
+        thread.join(2)
+        listener.close()
+
+def test_pipeline_is_per_thread():
+    with FakeServer(port=0) as server:
+        mc = Minecraft.create("localhost", server.port)
+        inside = threading.Event()
+        release = threading.Event()
+        modes = []
+
+        def builder():
+            with mc.conn.pipeline():
+                mc.setBlock(0, 70, 0, block.STONE)
+                inside.set()
+                release.wait(5)
+                modes.append(mc.conn.isPipelined())
+            modes.append(mc.conn.isPipelined())
+
+        thread = threading.Thread(target=builder)
+        thread.start()
+        inside.wait(5)
+        assert not mc.conn.isPipelined()
+        # the block waits in the pipeline of the builder thread...
+        time.sleep(0.1)
+        assert server.world.getBlock(0, 70, 0) == 0
+        # ...until another thread sends a command, which is not held back
+        mc.postToChat("hello")
+        assert waitFor(lambda: server.chat == ["hello"])
+        assert server.world.getBlock(0, 70, 0) == block.STONE.id
+        mc.conn.setPipelined(False) # only for this thread
+        release.set()
+        thread.join()
+        assert modes == [True, False] # turning pipelining off in this thread did not change the builder's
+        mc.conn.close()
+
+def test_pipeline_sends_on_exit():
+    with FakeServer(port=0) as server:
+        mc = Minecraft.create("localhost", server.port)
+        with mc.conn.pipeline():
+            for x in range(10):
+                mc.setBlock(x, 70, 0, block.STONE)
+            assert len(mc.conn.sendBuffer) > 0
+        assert not mc.conn.sendBuffer
+        assert waitFor(lambda: server.world.getBlock(9, 70, 0) == block.STONE.id)
+        mc.conn.close()
+
+def test_replies_share_one_read_buffer():
+    # a reply split over two recv, then two replies in a single recv
+    with scripted([b"1", b"2\n3", b"\n4\nFail\n5\n"], 5) as (connection, received):
+        for x in range(5):
+            connection.send(b"world.getBlock", x, 0, 0)
+        assert connection.receive() == "12"
+        assert connection.receive() == "3"
+        assert connection.receive() == "4"
+        with pytest.raises(RequestError):
+            connection.receive()
+        assert connection.receive() == "5"
+        assert not connection.readBuffer
+        assert received[0] == b"world.getBlock(0,0,0)"
+
+def test_closed_connection_raises():
+    with scripted([b"1\n2"], 1, hangUp=True) as (connection, _):
+        connection.send(b"world.getHeight", 0, 0)
+        assert connection.receive() == "1"
+        with pytest.raises(RequestError):
+            connection.receive()
+
+def test_replies_resolve_in_order():
+    with scripted([b"1\n", b"Fail\n", b"x\n3\n"], 4) as (connection, received):
+        replies = [connection.sendReceiveAsync(b"world.getBlock", x, 0, 0, parse=int) for x in range(4)]
+        assert not any(reply.done() for reply in replies)
+        assert replies[3].result() == 3 # reads every reply before it
+        assert all(reply.done() for reply in replies)
+        assert replies[0].result() == 1
+        with pytest.raises(RequestError):
+            replies[1].result()
+        with pytest.raises(ValueError): # the parse error belongs to its reply only
+            replies[2].result()
+        assert not connection.pending
+
+def test_batched_queries_are_all_in_flight():
+    with FakeServer(port=0) as server:
+        mc = Minecraft.create("localhost", server.port)
+        mc.setBlocks(0, 70, 0, 9, 70, 0, block.STONE)
+        replies = [mc.getBlockAsync(x, 70, 0) for x in range(20)]
+        assert len(mc.conn.pending) == 20 # sent without waiting for a reply
+        assert [reply.result() for reply in replies] == [block.STONE.id] * 10 + [block.AIR.id] * 10
+        assert mc.batchGetBlocks([(x, 70, 0) for x in range(9, 12)]) == [block.STONE.id, 0, 0]
+        height = mc.getHeightAsync(0, 0)
+        assert mc.getBlockWithDataAsync(0, 70, 0).result() == block.STONE
+        assert height.done() and height.result() == 70
+        mc.conn.close()
@@ -0,0 +1,65 @@
+import pytest
+
+import dungeon_save
+from blocky_dungeon_v1 import DungeonPlan
+from mcpi.voxel import VoxelBuffer
+
+@pytest.fixture(scope='module')
+def plan():
+    plan = DungeonPlan(10, 70, -20, 10, seed=3)
+    plan.generate()
+    return plan
+
+def compiled_steps(plan):
+    buffer = VoxelBuffer()
+    steps = []
+    for name, ops, delay in plan.steps:
+        buffer.ops = list(ops)
+        steps.append((buffer.compile(), delay))
+    return steps
+
+def test_rooms_round_trip(plan, tmp_path):
+    path = str(tmp_path / 'arene.bdsave')
+    dungeon_save.save_dungeon(path, plan)
+    saved = dungeon_save.load_dungeon(path)
+    assert saved.origin == (10, 70, -20)
+    assert saved.seed == 3
+    assert len(saved.rooms) == len(plan.rooms)
+    for room, saved_room in zip(plan.rooms, saved.rooms):
+        assert saved_room.center == room.center
+        assert (saved_room.width, saved_room.height, saved_room.depth) == (room.width, room.height, room.depth)
+        assert (saved_room.type, saved_room.theme, saved_room.level) == (room.type, room.theme, room.level)
+        if room.tags == 'special':
+            assert saved_room.tags == 'special'
+        else:
+            assert sorted(saved_room.tags) == sorted(room.tags)
+        assert sorted(saved_room.doors) == sorted(room.generation_points)
+        assert saved_room.entrance == room.pos_entrance
+
+def test_boxes_round_trip(plan, tmp_path):
+    path = str(tmp_path / 'arene.bdsave')
+    dungeon_save.save_dungeon(path, plan)
+    saved = dungeon_save.load_dungeon(path)
+    expected = compiled_steps(plan)
+    assert [(boxes, delay) for _, boxes, delay in saved.steps_at()] == expected
+    # replaced around another origin, every box moves by the same offset
+    moved = saved.steps_at((110, 70, 80))
+    for (_, boxes, _), (original, _) in zip(moved, expected):
+        assert boxes == [(x0+100, y0, z0+100, x1+100, y1, z1+100, id, data)
+                         for x0, y0, z0, x1, y1, z1, id, data in original]
+
+def test_without_voxels(plan, tmp_path):
+    path = str(tmp_path / 'arene.bdsave')
+    dungeon_save.save_dungeon(path, plan, seed=-5, voxels=False)
+    saved = dungeon_save.load_dungeon(path)
+    assert saved.seed == -5
+    assert saved.steps is None
+    assert len(saved.rooms) == len(plan.rooms)
+    with pytest.raises(ValueError):
+        saved.steps_at()
+
+def test_not_a_save(tmp_path):
+    path = tmp_path / 'autre.bdsave'
+    path.write_bytes(b'\0' * dungeon_save.HEADER.size)
+    with pytest.raises(ValueError):
+        dungeon_save.load_dungeon(str(path))
@@ -0,0 +1,31 @@
+import contextlib
+import io
+
+from blocky_dungeon_v1 import EndlessDungeon, ROOM_SIZE
+from mcpi.fakeserver import FakeServer
+from mcpi.minecraft import Minecraft
+
+SPAWN = (0, 63, 0)
+
+def walk(mc, positions):
+    """Endless dungeon of seed 0 updated at each position => EndlessDungeon"""
+    dungeon = EndlessDungeon(mc, *SPAWN, seed=0, distance=1, evict_distance=2)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for position in positions:
+            dungeon.update([position])
+    mc.getHeight(0, 0) # every write is applied once this reply comes back
+    return dungeon
+
+def test_evicted_room_is_rebuilt_identically():
+    x, y, z = SPAWN
+    away = [(x + i * ROOM_SIZE, y, z) for i in range(8)]
+    with FakeServer(port=0) as fresh, FakeServer(port=0) as travelled:
+        dungeon = walk(Minecraft.create("localhost", fresh.port), [SPAWN])
+        box = dungeon.boxes[SPAWN]
+        dungeon = walk(Minecraft.create("localhost", travelled.port), away + away[::-1])
+        assert dungeon.boxes[SPAWN] == box
+        assert SPAWN in dungeon.built
+        x0, y0, z0, x1, y1, z1 = box
+        voxels = [(x, y, z) for y in range(y0, y1 + 1) for x in range(x0, x1 + 1) for z in range(z0, z1 + 1)]
+        different = [v for v in voxels if fresh.world.getBlockWithData(*v) != travelled.world.getBlockWithData(*v)]
+        assert different == []
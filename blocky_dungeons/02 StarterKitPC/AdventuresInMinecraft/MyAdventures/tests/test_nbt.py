@@ -0,0 +1,58 @@
+import array
+import gzip
+import os
+
+import pytest
+
+from mcpi import nbt
+
+LEVEL = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                     "Bukkit", "world", "level.dat")
+
+def sample():
+    """A root Compound using every tag type"""
+    root = nbt.Compound()
+    root.name = "Level"
+    root.set("byte", nbt.TAG_BYTE, -3)
+    root.set("short", nbt.TAG_SHORT, 1234)
+    root["int"] = -70000
+    root.set("long", nbt.TAG_LONG, 1 << 40)
+    root.set("float", nbt.TAG_FLOAT, 0.5)
+    root["double"] = 3.25
+    root["bytes"] = bytearray(range(256))
+    root["ints"] = array.array("i", [0, -1, 1 << 30])
+    root["string"] = "Blocky Dungeons é"
+    root["empty"] = nbt.List()
+    root["positions"] = nbt.List(nbt.TAG_DOUBLE, [1.5, -2.0, 64.0])
+    entity = nbt.Compound()
+    entity["id"] = "Zombie"
+    entity.set("Health", nbt.TAG_SHORT, 20)
+    root["entities"] = nbt.List(nbt.TAG_COMPOUND, [entity])
+    return root
+
+def test_dumps_loads_round_trip():
+    root = sample()
+    data = nbt.dumps(root)
+    loaded = nbt.loads(data)
+    assert loaded == root
+    assert loaded.name == "Level"
+    assert loaded.types == root.types
+    assert loaded["positions"].type == nbt.TAG_DOUBLE
+    assert loaded["entities"][0].types["Health"] == nbt.TAG_SHORT
+    assert nbt.dumps(loaded) == data
+
+def test_file_round_trip(tmp_path):
+    path = str(tmp_path / "level.dat")
+    nbt.writeFile(path, sample())
+    assert nbt.readFile(path) == sample()
+
+def test_level_dat_unchanged():
+    if not os.path.exists(LEVEL):
+        pytest.skip("no Bukkit world")
+    with open(LEVEL, "rb") as f:
+        data = gzip.decompress(f.read())
+    assert nbt.dumps(nbt.loads(data)) == data
+
+def test_root_must_be_compound():
+    with pytest.raises(ValueError):
+        nbt.loads(b"\x08\x00\x00\x00\x00")
@@ -0,0 +1,108 @@
+import contextlib
+import io
+import random
+import sys
+
+import pytest
+
+import blocky_dungeon_v1
+from blocky_dungeon_v1 import DungeonPlan, Frontier, Room, RoomGrid
+
+class Place:
+    def __init__(self, x, z):
+        self.center = (x, 63, z)
+
+def plan(size, seed, order='dfs'):
+    with contextlib.redirect_stdout(io.StringIO()):
+        plan = DungeonPlan(0, 63, 0, size, seed=seed, order=order)
+        plan.generate()
+    return plan
+
+def test_frontier_orders():
+    places = [Place(30, 0), Place(0, 10), Place(-20, -20), Place(0, -10)]
+    popped = {}
+    for order in Frontier.ORDERS:
+        frontier = Frontier(order, (0, 63, 0))
+        for place in places:
+            frontier.push([place, 0, None])
+        popped[order] = [places.index(frontier.pop()[0]) for _ in places]
+        assert not frontier
+    assert popped == {'dfs': [3, 2, 1, 0], 'bfs': [0, 1, 2, 3], 'nearest': [1, 3, 2, 0]}
+    with pytest.raises(ValueError):
+        Frontier('random', (0, 63, 0))
+
+def distance(entry):
+    x, _, z = entry[0].center
+    return x * x + z * z
+
+def test_nearest_room_is_explored_first(monkeypatch):
+    farther = [] # rooms explored while a room nearer the spawn room was waiting
+    pop = Frontier.pop
+    def checked_pop(frontier):
+        waiting = [item[2] if frontier.order == 'nearest' else item for item in frontier.entries]
+        entry = pop(frontier)
+        farther.append(any(distance(other) < distance(entry) for other in waiting))
+        return entry
+    monkeypatch.setattr(blocky_dungeon_v1.Frontier, 'pop', checked_pop)
+    nearest = plan(40, 2, 'nearest')
+    assert len(nearest.rooms) > 40 and not any(farther)
+    farther.clear()
+    plan(40, 2, 'dfs')
+    assert any(farther)
+
+@pytest.mark.parametrize('order', Frontier.ORDERS)
+def test_same_seed_same_dungeon(order):
+    first, second = plan(10, 7, order), plan(10, 7, order)
+    assert [room.center for room in first.rooms] == [room.center for room in second.rooms]
+    assert first.steps == second.steps
+
+def test_deep_dungeon_needs_no_recursion():
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(120)
+    try:
+        deep = plan(300, 2)
+    finally:
+        sys.setrecursionlimit(limit)
+    assert len(deep.rooms) > 120
+
+def overlap(a, b):
+    return all(a[i] <= b[i + 3] and b[i] <= a[i + 3] for i in range(3))
+
+def test_room_grid():
+    grid = RoomGrid(cell_size=10)
+    big, small = Place(0, 0), Place(30, 0)
+    grid.add(big, (-12, 50, -12, 12, 70, 12))   # several cells
+    grid.add(small, (28, 60, -2, 32, 64, 2))
+    assert len(grid) == 2
+    assert grid.overlapping((12, 70, 12, 20, 80, 20)) == [big] # corner shared
+    assert grid.overlapping((10, 71, 0, 40, 80, 0)) == []      # above both
+    assert grid.overlapping((-5, 60, 0, 29, 60, 0)) == [big, small]
+    assert grid.rooms_at(30, 62, 1) == [small]
+    assert grid.is_free((13, 50, -12, 27, 70, 12))
+    grid.remove(big, (-12, 50, -12, 12, 70, 12))
+    assert len(grid) == 1 and grid.rooms_at(0, 60, 0) == []
+    assert all(small in [room for _, room in entries] for entries in grid.cells.values())
+
+def test_rooms_never_overlap():
+    dungeon = plan(40, 3)
+    for i, room in enumerate(dungeon.rooms):
+        box = Room.box(room.center, room.width, room.height, room.depth)
+        assert not any(overlap(box, other.bounds()) for other in dungeon.rooms[:i])
+
+def test_block_at_matches_a_scan_of_every_step():
+    dungeon = plan(10, 3)
+    rng = random.Random(1)
+    def scanned(x, y, z):
+        for _, ops, _ in reversed(dungeon.steps):
+            for x0, y0, z0, x1, y1, z1, id, _ in reversed(ops):
+                if x0 <= x <= x1 and y0 <= y <= y1 and z0 <= z <= z1:
+                    return id
+        return None
+    found = 0
+    for room in dungeon.rooms:
+        x0, y0, z0, x1, y1, z1 = room.bounds()
+        for _ in range(50):
+            point = rng.randint(x0, x1), rng.randint(y0, y1), rng.randint(z0, z1)
+            assert dungeon.block_at(*point) == scanned(*point)
+            found += scanned(*point) is not None
+    assert found > 100
@@ -0,0 +1,49 @@
+import contextlib
+import io
+import json
+import os
+
+import blocky_dungeon_v1
+import plan_cache
+from blocky_dungeon_v1 import DungeonPlan, load_or_plan
+from mcpi.voxel import VoxelBuffer
+
+def planned(x, y, z, seed):
+    """Étapes compilées d'un donjon planifié sans cache"""
+    plan = DungeonPlan(x, y, z, 6, seed=seed)
+    plan.generate()
+    buffer = VoxelBuffer()
+    steps = []
+    for name, ops, delay in plan.steps:
+        buffer.ops = list(ops)
+        steps.append((name, buffer.compile(), delay))
+    return steps
+
+def test_cached_plan_moves_with_its_origin(tmp_path, monkeypatch):
+    monkeypatch.setattr(blocky_dungeon_v1, 'PLAN_CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(blocky_dungeon_v1, 'DUNGEON_SIZE', 6)
+    monkeypatch.setattr(blocky_dungeon_v1, 'DUNGEON_ORDER', 'dfs')
+    with contextlib.redirect_stdout(io.StringIO()) as out:
+        first, _ = load_or_plan(0, 63, 0, 4)
+        assert 'plan cache' not in out.getvalue()
+        assert len(os.listdir(tmp_path)) == 1
+        moved, compiled = load_or_plan(200, 70, -50, 4)
+        assert 'plan cache' in out.getvalue()
+    assert compiled
+    assert first == planned(0, 63, 0, 4)
+    # names and boxes are those of the dungeon planned at the new origin
+    assert moved == planned(200, 70, -50, 4)
+    assert moved[0][0] == 'spawn room (200, 70, -50)'
+
+def test_stale_plan_is_ignored(tmp_path):
+    steps = [('spawn room (5, 60, 5)', [(0, 59, 0, 10, 59, 10, 1, 0)], 0)]
+    plan_cache.save_plan(str(tmp_path), 'abc', (5, 60, 5), steps)
+    with open(plan_cache.plan_path(str(tmp_path), 'abc')) as f:
+        data = json.load(f)
+    assert data['steps'][0][0] == 'spawn room (0, 0, 0)'
+    assert plan_cache.load_plan(str(tmp_path), 'abc', (5, 60, 5)) == steps
+    data['version'] = plan_cache.CACHE_VERSION - 1
+    with open(plan_cache.plan_path(str(tmp_path), 'abc'), 'w') as f:
+        json.dump(data, f)
+    assert plan_cache.load_plan(str(tmp_path), 'abc', (5, 60, 5)) is None
+    assert plan_cache.load_plan(str(tmp_path), 'other', (5, 60, 5)) is None
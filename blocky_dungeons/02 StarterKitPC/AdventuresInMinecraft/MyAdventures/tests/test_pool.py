@@ -0,0 +1,57 @@
+import contextlib
+import io
+
+import mcpi.block as block
+from blocky_dungeon_v1 import Builder, DungeonPlan
+from mcpi.fakeserver import FakeServer
+from mcpi.minecraft import Minecraft
+
+def build(mc, seed):
+    with contextlib.redirect_stdout(io.StringIO()):
+        plan = DungeonPlan(0, 63, 0, 8, seed=seed)
+        plan.generate()
+        with mc.conn.pipeline():
+            Builder(mc).build(plan)
+    mc.getHeight(0, 0) # a query waits for every session
+
+def test_pooled_build_matches_single_connection():
+    with FakeServer(port=0) as single, FakeServer(port=0) as pooled:
+        build(Minecraft.create("localhost", single.port), 1)
+        mc = Minecraft.createPool("localhost", pooled.port, size=4)
+        build(mc, 1)
+        mc.conn.close()
+        assert pooled.world.chunks == single.world.chunks
+
+def test_writes_to_the_same_columns_share_a_session():
+    with FakeServer(port=0) as server:
+        mc = Minecraft.createPool("localhost", server.port, size=4)
+        pool = mc.conn
+        mc.setBlocks(0, 70, 0, 40, 70, 40, block.STONE)
+        mc.setBlocks(100, 70, 100, 101, 70, 101, block.STONE) # elsewhere: next session
+        mc.setBlock(20, 71, 20, block.GOLD_BLOCK)
+        assert [bool(claim) for claim in pool.claims] == [True, True, False, False]
+        # a large write is kept once per chunk, not once per column
+        assert len(pool.owners) == 9 + 1
+        assert all(len(boxes) <= 2 for boxes in pool.owners.values())
+        mc.conn.close()
+
+def test_read_after_writes_sees_them():
+    with FakeServer(port=0, latency=0.001) as server:
+        mc = Minecraft.createPool("localhost", server.port, size=4)
+        for i in range(40):
+            mc.setBlocks(i * 3, 70, 0, i * 3 + 1, 75, 1, block.STONE)
+        mc.setBlock(60, 80, 0, block.GOLD_BLOCK)       # same columns as a write on another session
+        assert mc.getBlock(60, 80, 0) == block.GOLD_BLOCK.id
+        assert mc.getBlock(117, 75, 1) == block.STONE.id
+        assert not any(mc.conn.claims) and not mc.conn.owners
+        mc.conn.close()
+
+def test_chat_does_not_wait_for_writes():
+    with FakeServer(port=0) as server:
+        mc = Minecraft.createPool("localhost", server.port, size=2)
+        mc.setBlocks(0, 70, 0, 5, 70, 5, block.STONE)
+        mc.postToChat("hello")
+        assert any(mc.conn.claims) # no synchronization
+        mc.player.setPos(0, 71, 0)
+        assert not any(mc.conn.claims) # the player moves once the blocks are placed
+        mc.conn.close()
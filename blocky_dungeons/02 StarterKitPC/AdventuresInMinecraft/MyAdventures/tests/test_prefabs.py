@@ -0,0 +1,66 @@
+import mcpi.block as block
+import prefabs
+from prefabs import Prefab, get_prefab
+from mcpi.voxel import VoxelBuffer
+
+def voxels(boxes):
+    """Writes the boxes block by block, in order => {(x,y,z): (id, data)}"""
+    world = {}
+    for x0, y0, z0, x1, y1, z1, id, data in boxes:
+        for y in range(y0, y1 + 1):
+            for x in range(x0, x1 + 1):
+                for z in range(z0, z1 + 1):
+                    world[(x, y, z)] = (id, data)
+    return world
+
+STAIRS = block.STAIRS_WOOD.id
+
+SAMPLE = Prefab('sample', [
+    (1, 0, -1, 3, 0, 0, block.STONE.id, 0),
+    (1, 1, 0, 1, 1, 0, STAIRS, prefabs.STAIRS_DATA['+x']),
+    (2, 1, 0, 2, 1, 0, STAIRS, prefabs.STAIRS_DATA['-z'] | prefabs.STAIRS_UPSIDE_DOWN),
+    (3, 1, 0, 3, 1, 0, block.TORCH.id, prefabs.TORCH_DATA['+x']),
+    (0, 2, 0, 0, 2, 0, block.TORCH.id, 5), # on the ground: no direction
+    (-2, 0, 3, -1, 4, 5, block.WOOL.id, 14),
+])
+
+def test_quarter_turn():
+    turned = voxels(SAMPLE.rotated(1).boxes)
+    # (x, z) -> (-z, x)
+    assert turned == {(-z, y, x): value for (x, y, z), value in voxels(SAMPLE.boxes).items()
+                      if value[0] not in (STAIRS, block.TORCH.id)} | {
+        (0, 1, 1): (STAIRS, prefabs.STAIRS_DATA['+z']),
+        (0, 1, 2): (STAIRS, prefabs.STAIRS_DATA['+x'] | prefabs.STAIRS_UPSIDE_DOWN),
+        (0, 1, 3): (block.TORCH.id, prefabs.TORCH_DATA['+z']),
+        (0, 2, 0): (block.TORCH.id, 5),
+    }
+
+def test_four_turns_give_the_prefab_back():
+    for turns in range(4):
+        prefab = SAMPLE
+        for _ in range(4):
+            prefab = prefab.rotated(turns)
+        assert voxels(prefab.boxes) == voxels(SAMPLE.boxes)
+    assert voxels(SAMPLE.rotated(3).boxes) == voxels(SAMPLE.rotated(1).rotated(1).rotated(1).boxes)
+    assert voxels(SAMPLE.rotated(-1).boxes) == voxels(SAMPLE.rotated(3).boxes)
+
+def test_symmetric_pillar_is_unchanged_by_a_turn():
+    pillar = get_prefab('pillar', 8)
+    assert voxels(get_prefab('pillar', 8, turns=1).boxes) == voxels(pillar.boxes)
+    torches = [value for value in voxels(pillar.boxes).values() if value[0] == block.TORCH.id]
+    assert sorted(data for _, data in torches) == [1, 2, 3, 4] # each torch faces away from the pillar
+
+def test_prefabs_are_compiled_once():
+    assert get_prefab('fire') is get_prefab('fire')
+    assert get_prefab('pillar', 8, turns=2) is get_prefab('pillar', 8, turns=2)
+    assert get_prefab('pillar', 8) is not get_prefab('pillar', 9)
+
+def test_stamp_matches_drawing_in_place():
+    for name, params in (('fire', ()), ('pillar', (8,)), ('cuve', (block.LAVA,)), ('fall', (7, block.WATER, True))):
+        drawn = VoxelBuffer()
+        prefabs.PREFABS[name](drawn, *params)
+        stamped = VoxelBuffer()
+        prefab = get_prefab(name, *params)
+        prefab.stamp(stamped, 100, 64, -30)
+        assert len(prefab) <= len(drawn.ops)
+        assert voxels(stamped.ops) == {(x + 100, y + 64, z - 30): value for (x, y, z), value in voxels(drawn.ops).items()}
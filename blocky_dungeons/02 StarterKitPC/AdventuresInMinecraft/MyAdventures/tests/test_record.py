@@ -0,0 +1,46 @@
+import pytest
+
+import mcpi.block as block
+from mcpi import record
+from mcpi.fakeserver import FakeServer
+from mcpi.minecraft import Minecraft
+
+def session(path, port):
+    mc = Minecraft(record.RecordingConnection(path, "localhost", port))
+    mc.setBlocks(0, 64, 0, 9, 68, 9, block.STONE)
+    mc.setBlock(5, 69, 5, block.WOOL.id, 3)
+    assert mc.getHeight(5, 5) == 69
+    assert mc.batchGetBlocks([(0, 64, 0), (5, 69, 5), (20, 70, 20)]) == [block.STONE.id, block.WOOL.id, 0]
+    mc.conn.close()
+
+def test_replay_rebuilds_the_same_world(tmp_path):
+    path = str(tmp_path / "session.rec")
+    with FakeServer(port=0) as recorded:
+        session(path, recorded.port)
+    counts = record.summary(path)
+    assert counts["session"] == 1
+    assert (counts["world.setBlocks"], counts["world.setBlock"]) == (1, 1)
+    assert (counts["world.getHeight"], counts["world.getBlock"], counts["reply"]) == (1, 3, 4)
+
+    with FakeServer(port=0) as replayed:
+        # the session ends with queries: once they are answered, every write is applied
+        counters = record.replay(path, "localhost", replayed.port, maxInFlight=2)
+        assert replayed.world.chunks == recorded.world.chunks
+    assert counters["mismatches"] == 0
+    assert (counters["sessions"], counters["commands"], counters["queries"]) == (1, 2, 4)
+
+def test_replay_counts_mismatches(tmp_path):
+    path = str(tmp_path / "session.rec")
+    with FakeServer(port=0) as recorded:
+        session(path, recorded.port)
+    with FakeServer(port=0) as other:
+        other.world.setBlock(20, 70, 20, block.GOLD_BLOCK.id) # was air when recorded
+        other.world.setBlocks(5, 70, 5, 5, 80, 5, block.STONE.id) # higher ground
+        counters = record.replay(path, "localhost", other.port, pacing=True, speed=100)
+    assert counters["mismatches"] == 2
+
+def test_not_a_recording(tmp_path):
+    path = tmp_path / "other.rec"
+    path.write_bytes(b"NOTMCPI!")
+    with pytest.raises(ValueError):
+        list(record.readRecords(str(path)))
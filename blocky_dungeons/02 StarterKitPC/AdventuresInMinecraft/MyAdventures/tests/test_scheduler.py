@@ -0,0 +1,104 @@
+import time
+
+from blocky_dungeon_v1 import evil_monologue
+from mcpi.fakeserver import FakeServer
+from mcpi.minecraft import Minecraft
+from monologue import EVIL_MONOLOGUE
+from scheduler import TimerWheel, Timeline
+
+class Clock:
+    """Horloge manuelle : sleep() avance le temps sans attendre"""
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+def wheel(**kwargs):
+    clock = Clock()
+    return TimerWheel(clock=clock, sleep=clock.sleep, **kwargs), clock
+
+def test_actions_run_when_due():
+    timers, clock = wheel(tick=0.05, slots=8)
+    fired = []
+    timers.schedule(1.5, lambda: fired.append(('lava', clock.now)))
+    timers.schedule(0.1, lambda: fired.append(('a', clock.now)))
+    timers.schedule(0.1, lambda: fired.append(('b', clock.now))) # same tick: scheduling order
+    timers.schedule(3.0, lambda: fired.append(('far', clock.now))) # several turns of the wheel
+    assert timers.advance() == 0 and len(timers) == 4
+    clock.now += 0.09
+    assert timers.advance() == 0
+    assert abs(timers.next_due() - 0.01) < 1e-9
+    clock.now += 0.01
+    assert timers.advance() == 2
+    assert [name for name, _ in fired] == ['a', 'b']
+    clock.now += 1.39
+    assert timers.advance() == 0 # 10 ms early, and the wheel has turned several times
+    timers.run()
+    assert [name for name, _ in fired] == ['a', 'b', 'lava', 'far']
+    assert [round(at - 100, 6) for _, at in fired] == [0.1, 0.1, 1.5, 3.0]
+    assert timers.next_due() is None and len(timers) == 0
+
+def test_run_waits_for_actions_scheduled_by_actions():
+    timers, clock = wheel()
+    fired = []
+    def seal(depth):
+        fired.append(round(clock.now - 100, 6))
+        if depth:
+            timers.schedule(1.5, lambda: seal(depth - 1))
+    timers.schedule(1.5, lambda: seal(2))
+    timers.run()
+    assert fired == [1.5, 3.0, 4.5]
+
+def test_late_advance_runs_every_overdue_action_in_order():
+    timers, clock = wheel(tick=0.05, slots=4)
+    fired = []
+    for delay in (0.7, 0.05, 0.3, 0.3):
+        timers.schedule(delay, lambda delay=delay: fired.append(delay))
+    clock.now += 10 # the builder was busy
+    assert timers.advance() == 4
+    assert fired == [0.05, 0.3, 0.3, 0.7]
+
+def test_timeline_plays_events_in_order():
+    played = []
+    start = time.monotonic()
+    timeline = Timeline([(0.3, 'c'), (0, 'a'), (0.15, 'b')], lambda value: played.append((value, time.monotonic() - start)))
+    timeline.start()
+    timeline.join(2)
+    assert [value for value, _ in played] == ['a', 'b', 'c']
+    for (_, at), offset in zip(played, (0, 0.15, 0.3)):
+        assert offset - 0.01 <= at < offset + 0.2
+
+def test_stopped_timeline_plays_nothing_more():
+    played = []
+    timeline = Timeline([(0, 'first'), (30, 'later')], played.append)
+    timeline.start()
+    time.sleep(0.2)
+    start = time.monotonic()
+    timeline.stop()
+    timeline.join(2)
+    assert not timeline.is_alive() and time.monotonic() - start < 1
+    assert played == ['first']
+
+def test_monologue_table():
+    offsets = [offset for offset, _ in EVIL_MONOLOGUE]
+    assert offsets == sorted(offsets) and len(set(offsets)) == len(offsets)
+    for _, message in EVIL_MONOLOGUE:
+        message.format(donjon_name='Donjon') # no other placeholder
+
+def test_monologue_runs_in_the_background():
+    with FakeServer(port=0) as server:
+        mc = Minecraft.create("localhost", server.port)
+        start = time.monotonic()
+        timeline = evil_monologue(mc, 'le Donjon de Test')
+        assert time.monotonic() - start < 0.5
+        deadline = time.monotonic() + 2
+        while not server.chat and time.monotonic() < deadline:
+            time.sleep(0.01)
+        timeline.stop()
+        timeline.join(2)
+        assert len(server.chat) == 1 and 'le Donjon de Test' in server.chat[0]
+        mc.conn.close()
@@ -0,0 +1,59 @@
+import csv
+import json
+import threading
+
+import mcpi.block as block
+from mcpi.fakeserver import FakeServer
+from mcpi.minecraft import Minecraft
+from mcpi.stats import ConnectionStats
+
+def test_commands_are_counted():
+    with FakeServer(port=0) as server:
+        mc = Minecraft.create("localhost", server.port)
+        stats = mc.enableStats()
+        for x in range(3):
+            mc.setBlock(x, 70, 0, block.STONE)
+        assert mc.getBlock(0, 70, 0) == block.STONE.id
+        assert mc.getBlock(5, 70, 0) == block.AIR.id
+        mc.conn.close()
+    counters = stats.asDict()
+    assert list(counters) == ["world.setBlock", "world.getBlock"] # by bytes sent
+    setBlock, getBlock = counters["world.setBlock"], counters["world.getBlock"]
+    assert (setBlock["count"], setBlock["replies"]) == (3, 0)
+    assert setBlock["bytes_sent"] == 3 * len(b"world.setBlock(0,70,0,1,0)\n") # the data of block.STONE is sent too
+    assert (getBlock["count"], getBlock["replies"]) == (2, 2)
+    assert getBlock["bytes_received"] == len(b"1\n") + len(b"0\n")
+    assert sum(getBlock["latency_histogram_ms"].values()) == 2
+    assert 0 < getBlock["latency_mean_ms"] <= getBlock["latency_max_ms"]
+
+def test_dump(tmp_path):
+    stats = ConnectionStats()
+    stats.recordSend(b"world.getHeight", 20)
+    stats.recordReply(b"world.getHeight", 3, 0.0015) # 1.5 ms
+    stats.dump(str(tmp_path / "stats.json"))
+    with open(tmp_path / "stats.json") as f:
+        counters = json.load(f)["world.getHeight"]
+    assert counters["latency_histogram_ms"]["<=2"] == 1
+    stats.dump(str(tmp_path / "stats.csv"))
+    with open(tmp_path / "stats.csv", newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert rows[0]["command"] == "world.getHeight"
+    assert (rows[0]["count"], rows[0]["bytes_sent"], rows[0]["latency_mean_ms"]) == ("1", "20", "1.500")
+
+def test_shared_by_threads():
+    stats = ConnectionStats()
+    def record():
+        for _ in range(2000):
+            stats.recordSend(b"world.setBlock", 10)
+            stats.recordReply(b"world.getBlock", 2, 0.001)
+    threads = [threading.Thread(target=record) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    counters = stats.asDict()
+    assert counters["world.setBlock"]["count"] == 16000
+    assert counters["world.setBlock"]["bytes_sent"] == 160000
+    assert counters["world.getBlock"]["replies"] == 16000
+    stats.reset()
+    assert stats.asDict() == {}
@@ -0,0 +1,67 @@
+import contextlib
+import io
+import random
+import time
+
+from blocky_dungeon_v1 import Builder, DungeonPlan, Streamer, ROOM_SIZE
+from mcpi.fakeserver import FakeServer
+from mcpi.minecraft import Minecraft
+
+SPAWN = (0, 63, 0)
+
+def plan(seed=2):
+    """Small dungeon without lavafall, whose sealing steps would wait 1.5 s each"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        plan = DungeonPlan(*SPAWN, 6, seed=seed)
+        plan.generate()
+    assert not any(delay for _, _, delay in plan.steps)
+    return plan
+
+def waitFor(condition, timeout=5.0):
+    end = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > end:
+            return False
+        time.sleep(0.02)
+    return True
+
+def test_rooms_streamed_in_any_order_match_a_full_build():
+    dungeon = plan()
+    with FakeServer(port=0) as full, FakeServer(port=0) as streamed:
+        mc = Minecraft.create("localhost", full.port)
+        with contextlib.redirect_stdout(io.StringIO()):
+            Builder(mc).build(dungeon)
+        mc.getHeight(0, 0)
+        mc = Minecraft.create("localhost", streamed.port)
+        streamer = Streamer(mc, dungeon, distance=0)
+        rooms = list(dungeon.rooms)
+        random.Random(4).shuffle(rooms)
+        with contextlib.redirect_stdout(io.StringIO()):
+            for room in rooms:
+                assert streamer.build_near(*room.center) == 1
+                assert streamer.build_near(*room.center) == 0 # already built
+        mc.getHeight(0, 0)
+        assert len(streamer.built) == len(dungeon.rooms)
+        assert streamed.world.chunks == full.world.chunks
+
+def test_rooms_near_the_player_are_built_first():
+    dungeon = plan()
+    far = max(dungeon.rooms, key=lambda room: abs(room.center[0]) + abs(room.center[2]))
+    with FakeServer(port=0) as server:
+        mc = Minecraft.create("localhost", server.port)
+        mc.player.setTilePos(*SPAWN)
+        streamer = Streamer(mc, dungeon, distance=1, min_interval=0.02, max_interval=0.1)
+        with contextlib.redirect_stdout(io.StringIO()):
+            streamer.start()
+            try:
+                assert waitFor(lambda: SPAWN in streamer.built)
+                time.sleep(0.3)
+                assert far.center not in streamer.built and len(streamer.built) < len(dungeon.rooms)
+                assert all(max(abs(x - SPAWN[0]), abs(z - SPAWN[2])) <= 2 * ROOM_SIZE for x, _, z in streamer.built)
+                mc.player.setTilePos(*far.center)
+                assert waitFor(lambda: far.center in streamer.built)
+            finally:
+                streamer.stop()
+                streamer.join(5)
+        assert not streamer.is_alive()
+        mc.conn.close()
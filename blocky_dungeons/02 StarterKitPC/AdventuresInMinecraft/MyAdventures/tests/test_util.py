@@ -0,0 +1,48 @@
+import enum
+import math
+
+import mcpi.block as block
+from mcpi.minecraft import intFloor
+from mcpi.util import flatten, flatten_list, flatten_parameters_to_bytestring
+from mcpi.vec3 import Vec3
+
+class Coords:
+    """An iterable that is neither a list nor a tuple"""
+    def __init__(self, *values):
+        self.values = values
+
+    def __iter__(self):
+        return iter(self.values)
+
+class Kind(enum.IntEnum):
+    STONE = 1
+
+class BigVec3(Vec3):
+    pass
+
+def arguments():
+    """Argument shapes sent by the programs (rebuilt for each use: a generator is read once)"""
+    return [
+        (10, 64, -3, 4, 0),
+        (Vec3(1.5, -2.25, 3), block.WOOL.id, 14),
+        (Vec3(0, 0, 0), Vec3(4, 5, 6), block.Block(35, 2)),
+        ([1, [2, (3, [4.5])]], "texte é", ()),
+        (Coords(1, Coords(2, 3)), range(4, 6), (x for x in (7, 8))),
+        (True, Kind.STONE, BigVec3(1, 2, 3), None),
+    ]
+
+def test_flatten_list_matches_flatten():
+    for args, same in zip(arguments(), arguments()):
+        assert flatten_list(args) == list(flatten(same))
+
+def test_encoded_line_unchanged():
+    for args, same in zip(arguments(), arguments()):
+        # the original encoder: one encode per parameter
+        expected = b",".join(str(m).encode("UTF-8") for m in flatten(same))
+        assert flatten_parameters_to_bytestring(args) == expected
+    assert flatten_parameters_to_bytestring((Vec3(1, 2.5, -3), block.WOOL, "é")) == "1,2.5,-3,35,0,é".encode("UTF-8")
+
+def test_int_floor():
+    assert intFloor(1, -1.5, 2.99, Vec3(-0.5, 3, 7.25)) == [1, -2, 2, -1, 3, 7]
+    assert all(type(x) is int for x in intFloor(1.0, 2, Kind.STONE))
+    assert intFloor([-1e-9]) == [math.floor(-1e-9)]
@@ -0,0 +1,107 @@
+import contextlib
+import io
+import random
+
+from blocky_dungeon_v1 import DungeonPlan
+from mcpi.fakeserver import FakeServer, World
+from mcpi.minecraft import Minecraft
+from mcpi.voxel import VoxelBuffer
+
+IDS = (1, 4, 5, 20, 98)
+
+def randomOps(rng, count=60, size=12):
+    """Random setBlock and setBlocks in a size**3 cube => [(x0,y0,z0,x1,y1,z1,id,data)]"""
+    ops = []
+    for _ in range(count):
+        x0, y0, z0 = (rng.randrange(size) for _ in range(3))
+        if rng.random() < 0.5:
+            x1, y1, z1 = x0, y0, z0
+        else:
+            x1, y1, z1 = (min(size - 1, v + rng.randrange(6)) for v in (x0, y0, z0))
+        ops.append((x0, y0, z0, x1, y1, z1, rng.choice(IDS), rng.randrange(3)))
+    return ops
+
+def cuboid(x0, y0, z0, x1, y1, z1):
+    """Voxels of a cuboid, in the order of world.getBlocks (y, then x, then z)"""
+    return [(x, y, z) for y in range(y0, y1 + 1) for x in range(x0, x1 + 1) for z in range(z0, z1 + 1)]
+
+def replay(ops, world=None):
+    """Writes the ops voxel by voxel, in order => {(x,y,z): id*16+data}"""
+    world = dict(world or {})
+    for op in ops:
+        for voxel in cuboid(*op[:6]):
+            world[voxel] = op[6] << 4 | op[7]
+    return world
+
+def knownFrom(world):
+    """known function of VoxelBuffer for a {(x,y,z): id*16+data} world"""
+    return lambda *box: [world.get(voxel, -1) for voxel in cuboid(*box)]
+
+def compiled(ops, hidden=(), known=None):
+    buffer = VoxelBuffer(known=known)
+    buffer.ops = list(ops)
+    return buffer.compile(hidden)
+
+def test_compile_matches_replay():
+    for seed in range(30):
+        ops = randomOps(random.Random(seed))
+        boxes = compiled(ops)
+        assert replay(boxes) == replay(ops)
+        assert len(boxes) <= len(ops)
+
+def test_compile_hidden():
+    for seed in range(30):
+        rng = random.Random(seed)
+        ops = randomOps(rng)
+        later = randomOps(rng, count=10)
+        # the hidden boxes are written afterwards: the final world is the same
+        assert replay(compiled(ops, hidden=later) + later) == replay(ops + later)
+    # nothing is left to write when everything is hidden
+    assert compiled(ops, hidden=ops) == []
+
+def test_compile_known():
+    for seed in range(30):
+        rng = random.Random(seed)
+        ops = randomOps(rng)
+        world = replay(randomOps(rng, count=20))
+        assert replay(compiled(ops, known=knownFrom(world)), world) == replay(ops, world)
+    # writes that change nothing are not sent
+    assert compiled(ops, known=knownFrom(replay(ops))) == []
+
+def test_flush_on_fake_server():
+    ops = [(x0 + 5, y0 + 70, z0 - 3, x1 + 5, y1 + 70, z1 - 3, id, data)
+           for x0, y0, z0, x1, y1, z1, id, data in randomOps(random.Random(1))]
+    expected = World()
+    for op in ops:
+        for x, y, z in cuboid(*op[:6]):
+            expected.setBlock(x, y, z, op[6], op[7])
+    with FakeServer(port=0) as server:
+        mc = Minecraft.create("localhost", server.port)
+        buffer = VoxelBuffer(mc)
+        buffer.ops = list(ops)
+        recorded, sent = buffer.flush()
+        mc.getHeight(0, 0) # every write is applied once this reply comes back
+        mc.conn.close()
+        assert sent < recorded
+        assert server.world.chunks == expected.chunks
+
+def test_compile_real_rooms():
+    with contextlib.redirect_stdout(io.StringIO()):
+        plan = DungeonPlan(0, 63, 0, 10, seed=0)
+        plan.generate()
+    recorded = sent = webs = 0
+    per_room = {}
+    for name, ops, delay in plan.steps:
+        buffer = VoxelBuffer()
+        buffer.ops = list(ops)
+        boxes = buffer.compile()
+        assert replay(boxes) == replay(ops)
+        recorded += len(ops)
+        sent += len(boxes)
+        webs += sum(1 for box in boxes if box[6] == 30)
+        per_room[name] = per_room.get(name, 0) + sum(1 for box in boxes if box[6] != 30)
+    # walls, floors and decorations: a few tens of commands per room
+    assert max(per_room.values()) <= 100
+    # the scattered cobwebs of the traps are most of what is left
+    assert webs >= (sent - webs) * 0.8
+    assert recorded / sent >= 1.3